@@ -0,0 +1,235 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tracemalloc
+from datetime import datetime as dt
+from time import perf_counter
+from typing import Callable, Dict
+
+import numpy as np
+
+from gym_recommendation import RecoEnv, RecoVecEnv
+from gym_recommendation.tests.dummy_data import SAMPLE_DIRECTORY, get_sample_data
+from gym_recommendation.utils import import_data
+
+BENCHMARK_DIRECTORY = os.path.dirname(os.path.realpath(__file__))
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--repeats',
+                    default=5,
+                    help="Number of timed repeats for each benchmark (best one is kept)",
+                    type=int)
+parser.add_argument('--warmups',
+                    default=1,
+                    help="Number of untimed runs before the timed repeats",
+                    type=int)
+parser.add_argument('--output',
+                    default=os.path.join(BENCHMARK_DIRECTORY, 'results.json'),
+                    help="Path of the JSON file to write results to",
+                    type=str)
+parser.add_argument('--baseline',
+                    default=os.path.join(BENCHMARK_DIRECTORY, 'baseline.json'),
+                    help="Path of the JSON file with the baseline results",
+                    type=str)
+parser.add_argument('--tolerance',
+                    default=0.25,
+                    help="Allowed relative regression against the baseline (0.25 = 25%%)",
+                    type=float)
+parser.add_argument('--save_baseline',
+                    action='store_true',
+                    help="Save the results as the new baseline instead of comparing")
+
+
+def measure(function: Callable[[], int], repeats: int, warmups: int) -> Dict[str, float]:
+    """
+    Time a function that returns the number of operations it performed.
+
+    :return: best and mean operations/sec over `repeats` timed runs
+    """
+    for _ in range(warmups):
+        function()
+    rates = list()
+    for _ in range(repeats):
+        start_time = perf_counter()
+        num_of_operations = function()
+        rates.append(num_of_operations / (perf_counter() - start_time))
+    return dict(best=max(rates), mean=float(np.mean(rates)))
+
+
+def measure_seconds(function: Callable[[], object], repeats: int,
+                    warmups: int) -> Dict[str, float]:
+    """
+    Time a function in seconds
+
+    :return: best and mean seconds over `repeats` timed runs
+    """
+    for _ in range(warmups):
+        function()
+    timings = list()
+    for _ in range(repeats):
+        start_time = perf_counter()
+        function()
+        timings.append(perf_counter() - start_time)
+    return dict(best=min(timings), mean=float(np.mean(timings)))
+
+
+def measure_peak_memory(function: Callable[[], object]) -> float:
+    """
+    Peak memory (in MB) allocated while calling a function, excluding the memory
+    that was already allocated before
+    """
+    tracemalloc.start()
+    result = function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return peak / 1e6
+
+
+def run_benchmarks(repeats: int, warmups: int) -> Dict[str, dict]:
+    """
+    Run every benchmark on the bundled sample data set
+
+    :return: results by benchmark name, each with the `value` to compare
+        against the baseline, its `unit` and whether `higher_is_better`
+    """
+    results = dict()
+
+    def add(name: str, value: float, unit: str, higher_is_better: bool) -> None:
+        results[name] = dict(value=value, unit=unit, higher_is_better=higher_is_better)
+        print(f"{name:<40} {value:>16,.2f} {unit}")
+
+    # loading data
+    def import_data_cold() -> None:
+        shutil.rmtree(os.path.join(SAMPLE_DIRECTORY, '.cache'), ignore_errors=True)
+        import_data(directory=SAMPLE_DIRECTORY)
+
+    add('import_data.no_cache', measure_seconds(
+        lambda: import_data(use_cache=False, directory=SAMPLE_DIRECTORY),
+        repeats=repeats, warmups=warmups)['best'] * 1e3, 'ms', False)
+    add('import_data.cold_cache', measure_seconds(
+        import_data_cold, repeats=repeats, warmups=warmups)['best'] * 1e3, 'ms', False)
+    add('import_data.warm_cache', measure_seconds(
+        lambda: import_data(directory=SAMPLE_DIRECTORY),
+        repeats=repeats, warmups=warmups)['best'] * 1e3, 'ms', False)
+
+    # constructing environments
+    kwargs = get_sample_data()
+    for label, env_kwargs in [('default', dict()), ('precompute', dict(precompute=True))]:
+        add(f'RecoEnv.__init__.{label}', measure_seconds(
+            lambda: RecoEnv(**kwargs, **env_kwargs),
+            repeats=repeats, warmups=warmups)['best'] * 1e3, 'ms', False)
+        add(f'RecoEnv.peak_memory.{label}', measure_peak_memory(
+            lambda: RecoEnv(**kwargs, **env_kwargs)), 'MB', False)
+
+    # stepping environments
+    num_of_steps = kwargs['data'].shape[0] - 1
+    for label, env_kwargs in [('default', dict()), ('precompute', dict(precompute=True))]:
+        env = RecoEnv(**kwargs, **env_kwargs)
+
+        def step() -> int:
+            env.reset()
+            for _ in range(num_of_steps):
+                env.step(0)
+            return num_of_steps
+
+        add(f'RecoEnv.step.{label}', measure(step, repeats=repeats,
+                                             warmups=warmups)['best'], 'steps/sec', True)
+
+        def get_observation() -> int:
+            for step_number in range(num_of_steps):
+                env._get_observation(step_number=step_number)
+            return num_of_steps
+
+        add(f'RecoEnv._get_observation.{label}', measure(
+            get_observation, repeats=repeats, warmups=warmups)['best'], 'calls/sec', True)
+
+    def reset() -> int:
+        for _ in range(1000):
+            env.reset()
+        return 1000
+
+    def get_reward() -> int:
+        for step_number in range(num_of_steps):
+            env._get_reward(action=2, step_number=step_number)
+        return num_of_steps
+
+    add('RecoEnv.reset', measure(reset, repeats=repeats,
+                                 warmups=warmups)['best'], 'resets/sec', True)
+    add('RecoEnv._get_reward', measure(get_reward, repeats=repeats,
+                                       warmups=warmups)['best'], 'calls/sec', True)
+
+    # vectorized environments
+    vec_env = RecoVecEnv(num_envs=64, **kwargs)
+    actions = np.zeros(vec_env.num_envs, dtype=np.int64)
+
+    def vec_step() -> int:
+        vec_env.reset()
+        for _ in range(1000):
+            vec_env.step(actions)
+        return 1000 * vec_env.num_envs
+
+    add('RecoVecEnv.step.64_envs', measure(vec_step, repeats=repeats,
+                                           warmups=warmups)['best'], 'steps/sec', True)
+    return results
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict],
+            tolerance: float) -> list:
+    """
+    Compare results against the baseline
+
+    :return: names of the benchmarks that regressed by more than `tolerance`
+    """
+    regressions = list()
+    print('*********************************')
+    for name, result in results.items():
+        if name not in baseline:
+            print(f"{name:<40} (no baseline)")
+            continue
+        value, baseline_value = result['value'], baseline[name]['value']
+        change = (value - baseline_value) / baseline_value
+        if not result['higher_is_better']:
+            change = -change
+        regressed = change < -tolerance
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<40} {change:+8.1%} {'REGRESSION' if regressed else ''}")
+    print('*********************************')
+    return regressions
+
+
+def main(kwargs: dict) -> int:
+    results = run_benchmarks(repeats=kwargs['repeats'], warmups=kwargs['warmups'])
+    report = dict(created=str(dt.now()),
+                  python=sys.version.split()[0],
+                  platform=platform.platform(),
+                  numpy=np.__version__,
+                  results=results)
+    with open(kwargs['output'], 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {kwargs['output']}")
+
+    if kwargs['save_baseline']:
+        shutil.copyfile(kwargs['output'], kwargs['baseline'])
+        print(f"Baseline saved to {kwargs['baseline']}")
+        return 0
+    if not os.path.exists(kwargs['baseline']):
+        print(f"No baseline found at {kwargs['baseline']}")
+        return 0
+    with open(kwargs['baseline']) as f:
+        baseline = json.load(f)['results']
+    regressions = compare(results=results, baseline=baseline,
+                          tolerance=kwargs['tolerance'])
+    if regressions:
+        print(f"Regressions: {regressions}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    print(f"Starting benchmark suite at {dt.now()}")
+    sys.exit(main(kwargs=vars(parser.parse_args())))
@@ -0,0 +1,75 @@
+import argparse
+import multiprocessing
+from datetime import datetime as dt
+from time import perf_counter
+from typing import Tuple
+
+import numpy as np
+
+from gym_recommendation import RemoteEnv
+from gym_recommendation.server import EnvServer
+from gym_recommendation.synthetic import generate_data_for_env
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--num_of_actors',
+                    default='1,2,4,8,16',
+                    help="Comma separated numbers of actor processes to time",
+                    type=str)
+parser.add_argument('--num_steps',
+                    default=5000,
+                    help="Number of steps per actor",
+                    type=int)
+parser.add_argument('--batch_window',
+                    default=0.001,
+                    help="Seconds the server waits for more step requests",
+                    type=float)
+parser.add_argument('--unix_socket',
+                    default=None,
+                    help="Path of a Unix socket to serve on instead of localhost TCP",
+                    type=str)
+user_args = vars(parser.parse_args())
+
+
+def run_actor(args: Tuple) -> np.ndarray:
+    """
+    Step a remote environment in an actor process
+
+    :return: latency of every step in seconds
+    """
+    address, num_steps = args
+    env = RemoteEnv(address=address)
+    env.reset()
+    latencies = np.zeros(num_steps)
+    for step_number in range(num_steps):
+        start_time = perf_counter()
+        env.step(step_number % 5)
+        latencies[step_number] = perf_counter() - start_time
+    env.close()
+    return latencies
+
+
+def main(kwargs: dict):
+    counts = [int(count) for count in kwargs['num_of_actors'].split(',')]
+    server = EnvServer(max_actors=max(counts), batch_window=kwargs['batch_window'],
+                       **generate_data_for_env())
+    address = server.start_in_background(**(dict(address=kwargs['unix_socket'])
+                                            if kwargs['unix_socket'] else dict()))
+    print('*********************************')
+    for num_of_actors in counts:
+        server.num_of_steps = server.num_of_batches = 0
+        with multiprocessing.Pool(processes=num_of_actors) as pool:
+            start_time = perf_counter()
+            latencies = np.concatenate(pool.map(
+                run_actor, [(address, kwargs['num_steps'])] * num_of_actors))
+            elapsed = perf_counter() - start_time
+        print(f"{num_of_actors:>3} actors | {latencies.shape[0] / elapsed:>10,.0f} steps/sec | "
+              f"latency p50 = {np.percentile(latencies, 50) * 1e6:7.1f} us | "
+              f"p99 = {np.percentile(latencies, 99) * 1e6:7.1f} us | "
+              f"mean batch = {server.get_mean_batch_size():5.1f}")
+    print('*********************************')
+    server.stop()
+
+
+if __name__ == "__main__":
+    print(f"Starting EnvServer benchmark at {dt.now()}")
+    main(kwargs=user_args)
@@ -0,0 +1,48 @@
+import argparse
+import os
+import shutil
+from datetime import datetime as dt
+
+from gym_recommendation.utils import CWD, download_data, import_data
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--repeats',
+                    default=5,
+                    help="Number of times to time each way of loading the data",
+                    type=int)
+user_args = vars(parser.parse_args())
+
+
+def time_import_data(use_cache: bool, clear_cache: bool) -> float:
+    """
+    Time one call to `import_data()` in milliseconds
+    """
+    if clear_cache:
+        shutil.rmtree(os.path.join(CWD, 'ml-100k', '.cache'), ignore_errors=True)
+    start_time = dt.now()
+    import_data(use_cache=use_cache)
+    return (dt.now() - start_time).total_seconds() * 1000.
+
+
+def main(kwargs: dict):
+    download_data()
+    repeats = kwargs['repeats']
+    results = dict()
+    results['read_csv (no cache)'] = [time_import_data(use_cache=False, clear_cache=False)
+                                      for _ in range(repeats)]
+    results['cold cache (parse + save)'] = [time_import_data(use_cache=True,
+                                                             clear_cache=True)
+                                            for _ in range(repeats)]
+    results['warm cache (memory-map)'] = [time_import_data(use_cache=True,
+                                                           clear_cache=False)
+                                          for _ in range(repeats)]
+    print('*********************************')
+    for label, timings in results.items():
+        print(f"{label:<28} best = {min(timings):8.2f} ms | "
+              f"mean = {sum(timings) / repeats:8.2f} ms")
+    print('*********************************')
+
+
+if __name__ == "__main__":
+    print(f"Starting import_data() benchmark at {dt.now()}")
+    main(kwargs=user_args)
@@ -0,0 +1,70 @@
+import argparse
+import os
+import tempfile
+from datetime import datetime as dt
+from time import perf_counter
+
+from gym_recommendation import RecoEnv
+from gym_recommendation.synthetic import generate_features
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--num_of_ratings',
+                    default=20000000,
+                    help="Number of synthetic ratings (e.g., 20000000 for ML 20M size)",
+                    type=int)
+parser.add_argument('--num_of_users',
+                    default=138493,
+                    help="Number of synthetic users",
+                    type=int)
+parser.add_argument('--num_of_movies',
+                    default=27278,
+                    help="Number of synthetic movies",
+                    type=int)
+parser.add_argument('--num_of_steps',
+                    default=100000,
+                    help="Number of environment steps to time",
+                    type=int)
+parser.add_argument('--directory',
+                    default=None,
+                    help="Directory for the memory-mapped features (default: temporary)",
+                    type=str)
+user_args = vars(parser.parse_args())
+
+
+def main(kwargs: dict):
+    with tempfile.TemporaryDirectory() as tmp_directory:
+        directory = kwargs['directory'] or os.path.join(tmp_directory, 'synthetic-features')
+        start_time = perf_counter()
+        features = generate_features(directory=directory,
+                                     num_of_ratings=kwargs['num_of_ratings'],
+                                     num_of_users=kwargs['num_of_users'],
+                                     num_of_movies=kwargs['num_of_movies'])
+        generate_seconds = perf_counter() - start_time
+
+        start_time = perf_counter()
+        env = RecoEnv(features=features)
+        init_seconds = perf_counter() - start_time
+
+        env.reset()
+        num_of_steps = min(kwargs['num_of_steps'], env.data.shape[0] - 1)
+        start_time = perf_counter()
+        for _ in range(num_of_steps):
+            env.step(0)
+        steps_per_second = num_of_steps / (perf_counter() - start_time)
+
+        memory_usage = env.get_memory_usage(include_shared=False)['total']
+        mapped_memory = env.get_memory_usage()['total']
+        print('*********************************')
+        print(f"{'generate_features()':<28} {generate_seconds:10.2f} sec "
+              f"({kwargs['num_of_ratings'] / generate_seconds:,.0f} ratings/sec)")
+        print(f"{'RecoEnv.__init__':<28} {init_seconds * 1e3:10.2f} ms")
+        print(f"{'RecoEnv.step':<28} {steps_per_second:10,.0f} steps/sec")
+        print(f"{'RecoEnv memory (private)':<28} {memory_usage / 1e6:10.2f} MB")
+        print(f"{'RecoEnv memory (mapped)':<28} {mapped_memory / 1e6:10.2f} MB")
+        print('*********************************')
+        del env, features
+
+
+if __name__ == "__main__":
+    print(f"Starting synthetic data benchmark at {dt.now()}")
+    main(kwargs=user_args)
@@ -0,0 +1,61 @@
+import argparse
+import os
+from datetime import datetime as dt
+
+import gym
+import numpy as np
+from stable_baselines.common.vec_env import SubprocVecEnv
+
+import gym_recommendation
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--num_envs',
+                    default=os.cpu_count(),
+                    help="Number of environments to step in parallel",
+                    type=int)
+parser.add_argument('--num_steps',
+                    default=int(1e4),
+                    help="Number of vectorized steps to time for each environment type",
+                    type=int)
+user_args = vars(parser.parse_args())
+
+
+def benchmark(envs, num_steps: int) -> float:
+    """
+    Step a vectorized environment with random actions and return steps/sec
+    (counting one step per environment).
+    """
+    actions = np.random.randint(envs.action_space.n, size=(num_steps, envs.num_envs))
+    envs.reset()
+    start_time = dt.now()
+    for step_number in range(num_steps):
+        envs.step(actions[step_number])
+    elapsed = (dt.now() - start_time).total_seconds()
+    return num_steps * envs.num_envs / elapsed
+
+
+def main(kwargs: dict):
+    num_envs = kwargs['num_envs']
+    num_steps = kwargs['num_steps']
+    data_kwargs = gym_recommendation.import_data_for_env()
+
+    envs = SubprocVecEnv([lambda: gym.make(gym_recommendation.RecoEnv.id, **data_kwargs)
+                          for _ in range(num_envs)])
+    subproc_rate = benchmark(envs=envs, num_steps=num_steps)
+    envs.close()
+
+    envs = gym_recommendation.RecoVecEnv(num_envs=num_envs, **data_kwargs)
+    reco_vec_rate = benchmark(envs=envs, num_steps=num_steps)
+    envs.close()
+
+    print('*********************************')
+    print(f"num_envs = {num_envs} | num_steps = {num_steps}")
+    print(f"SubprocVecEnv: {subproc_rate:,.2f} steps/sec")
+    print(f"RecoVecEnv:    {reco_vec_rate:,.2f} steps/sec")
+    print(f"Speed up:      {reco_vec_rate / subproc_rate:.1f}x")
+    print('*********************************')
+
+
+if __name__ == "__main__":
+    print(f"Starting vectorized environment benchmark at {dt.now()}")
+    main(kwargs=user_args)
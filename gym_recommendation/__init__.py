@@ -1,6 +1,42 @@
+import importlib
+from typing import Any, List
+
 from gym.envs.registration import register
-from gym_recommendation.envs.reco_env import RecoEnv
-from gym_recommendation.utils import import_data_for_env, evaluate
+from gym_recommendation.envs import Instrumentation, JsonLinesSink, LoggingSink, \
+    MetricsSink, RecoEnv, RemoteEnv, SlateEnv, StreamEnv, TensorBoardSink
+
+# Helpers that are imported on first use, so importing the environment (e.g., in
+# every SubprocVecEnv worker) does not pull in TensorFlow, stable_baselines or requests
+_LAZY_ATTRIBUTES = {
+    'RecoVecEnv': 'gym_recommendation.envs',
+    'import_data_for_env': 'gym_recommendation.utils',
+    'evaluate': 'gym_recommendation.utils',
+    'evaluate_batched': 'gym_recommendation.evaluation',
+    'evaluate_sharded': 'gym_recommendation.evaluation',
+    'iterate_transitions': 'gym_recommendation.transitions',
+    'export_transitions': 'gym_recommendation.transitions',
+    'load_transitions': 'gym_recommendation.transitions',
+    'import_features': 'gym_recommendation.datasets',
+    'import_shared_data_for_env': 'gym_recommendation.datasets',
+    'generate_data_for_env': 'gym_recommendation.synthetic',
+    'generate_features': 'gym_recommendation.synthetic',
+    'EnvServer': 'gym_recommendation.server',
+}
+
+
+def __getattr__(name: str) -> Any:
+    """
+    Import helpers lazily (PEP 562)
+    """
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(list(globals().keys()) + list(_LAZY_ATTRIBUTES.keys()))
 
 
 register(
@@ -9,3 +45,24 @@ register(
     max_episode_steps=1000000,
     nondeterministic=False
 )
+
+register(
+    id=SlateEnv.id,
+    entry_point='gym_recommendation.envs:SlateEnv',
+    max_episode_steps=1000000,
+    nondeterministic=False
+)
+
+register(
+    id=StreamEnv.id,
+    entry_point='gym_recommendation.envs:StreamEnv',
+    max_episode_steps=1000000,
+    nondeterministic=False
+)
+
+register(
+    id=RemoteEnv.id,
+    entry_point='gym_recommendation.envs:RemoteEnv',
+    max_episode_steps=1000000,
+    nondeterministic=False
+)
@@ -0,0 +1,199 @@
+import errno
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+# Version of the cache layout; bump to invalidate existing caches
+CACHE_VERSION = 1
+
+
+def get_file_checksum(file_path: str, chunk_size: int = 1 << 20) -> str:
+    """
+    SHA-256 checksum of a file, read in chunks
+    """
+    sha256 = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+@contextmanager
+def atomic_directory(directory: str, overwrite: bool = False) -> Iterator[str]:
+    """
+    Context manager yielding a temporary directory that is moved to `directory`
+    once the block completes, so readers never see a partially written directory.
+
+    If `directory` already exists, it is replaced when `overwrite` is True and
+    otherwise kept as is (e.g., another process finished writing it first).
+    The temporary directory is removed if the block raises an exception, which
+    is re-raised.
+    """
+    parent = os.path.dirname(os.path.abspath(directory))
+    os.makedirs(parent, exist_ok=True)
+    tmp_directory = tempfile.mkdtemp(dir=parent, prefix='.tmp-')
+    try:
+        yield tmp_directory
+    except BaseException:
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+        raise
+    try:
+        if overwrite and os.path.exists(directory):
+            shutil.rmtree(directory, ignore_errors=True)
+        os.replace(tmp_directory, directory)
+    except OSError as error:
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+        # only another process moving its directory into place first is tolerated
+        if error.errno not in (errno.EEXIST, errno.ENOTEMPTY) or \
+                not os.path.isdir(directory):
+            raise
+
+
+def get_cache_directory(file_path: str) -> str:
+    """
+    Directory holding the binary cache of `file_path`
+
+    Example:
+      `.../ml-100k/u.data` is cached in `.../ml-100k/.cache/u.data/`
+    """
+    return os.path.join(os.path.dirname(file_path), '.cache', os.path.basename(file_path))
+
+
+def read_csv_cached(file_path: str, **kwargs) -> pd.DataFrame:
+    """
+    Drop-in replacement for `pd.read_csv(file_path, **kwargs)` backed by a binary
+    columnar cache.
+
+    The first call parses the text file and saves every column as a typed `.npy`
+    file next to a manifest holding the size, modification time and checksum of
+    the source. Later calls memory-map those files instead of parsing the text
+    file again. The cache is rebuilt if the source file or the `read_csv` arguments
+    change (a modified timestamp alone only triggers a checksum comparison).
+
+    If the cache cannot be written (e.g., a read-only data directory), the parsed
+    DataFrame is returned without caching.
+    """
+    cache_directory = get_cache_directory(file_path=file_path)
+    manifest = _get_valid_manifest(file_path=file_path,
+                                   cache_directory=cache_directory,
+                                   kwargs=kwargs)
+    if manifest is None:
+        df = pd.read_csv(file_path, **kwargs)
+        try:
+            _save_cache(df=df, file_path=file_path,
+                        cache_directory=cache_directory, kwargs=kwargs)
+        except OSError as error:
+            print(f'Not caching {file_path}: {error}')
+        return df
+    return _load_cache(manifest=manifest, cache_directory=cache_directory)
+
+
+def _get_source_stats(file_path: str) -> Dict[str, int]:
+    """
+    Size and modification time of the source file
+    """
+    stats = os.stat(file_path)
+    return dict(size=stats.st_size, mtime_ns=stats.st_mtime_ns)
+
+
+def _get_valid_manifest(file_path: str, cache_directory: str,
+                        kwargs: dict) -> Optional[dict]:
+    """
+    Return the cache manifest, or None if the cache is missing or out of date
+    """
+    manifest_path = os.path.join(cache_directory, 'manifest.json')
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    if manifest.get('version') != CACHE_VERSION or \
+            manifest.get('kwargs') != _get_kwargs_key(kwargs=kwargs):
+        return None
+    stats = _get_source_stats(file_path=file_path)
+    if stats == manifest['source']:
+        return manifest
+    if stats['size'] != manifest['source']['size'] or \
+            get_file_checksum(file_path=file_path) != manifest['checksum']:
+        return None
+    # file was touched, but the contents are the same
+    manifest['source'] = stats
+    try:
+        _write_manifest(manifest=manifest, directory=cache_directory)
+    except OSError:
+        pass  # read-only cache, so the checksum is compared again next time
+    return manifest
+
+
+def _get_kwargs_key(kwargs: dict) -> str:
+    """
+    Serialize `read_csv` arguments to compare them with the cached ones
+    """
+    return json.dumps(kwargs, sort_keys=True, default=str)
+
+
+def _write_manifest(manifest: dict, directory: str) -> None:
+    """
+    Write the manifest file atomically
+    """
+    tmp_path = os.path.join(directory, f'manifest.json.{os.getpid()}')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, os.path.join(directory, 'manifest.json'))
+
+
+def _save_cache(df: pd.DataFrame, file_path: str, cache_directory: str,
+                kwargs: dict) -> None:
+    """
+    Save every column of `df` as a `.npy` file.
+
+    Numeric columns keep their dtype; text columns are stored as fixed-width
+    unicode arrays with a separate mask for missing values.
+    """
+    with atomic_directory(directory=cache_directory, overwrite=True) as tmp_directory:
+        columns = list()
+        for index, name in enumerate(df.columns):
+            series = df[name]
+            column = dict(name=name, dtype=str(series.dtype), text=False)
+            if series.dtype.kind in 'biuf':
+                values = series.values
+            else:
+                column['text'] = True
+                missing = series.isna().values
+                values = np.where(missing, '', series.values.astype(object)).astype(str)
+                np.save(os.path.join(tmp_directory, f'{index}.missing.npy'), missing)
+            np.save(os.path.join(tmp_directory, f'{index}.npy'), values)
+            columns.append(column)
+        manifest = dict(version=CACHE_VERSION,
+                        source=_get_source_stats(file_path=file_path),
+                        checksum=get_file_checksum(file_path=file_path),
+                        kwargs=_get_kwargs_key(kwargs=kwargs),
+                        columns=columns)
+        _write_manifest(manifest=manifest, directory=tmp_directory)
+
+
+def _load_cache(manifest: dict, cache_directory: str) -> pd.DataFrame:
+    """
+    Create a DataFrame from the cached columns.
+
+    Numeric columns are copy-on-write memory maps, so loading them does not read
+    or copy the data until it is used.
+    """
+    columns = dict()
+    for index, column in enumerate(manifest['columns']):
+        values = np.load(os.path.join(cache_directory, f'{index}.npy'), mmap_mode='c')
+        if column['text']:
+            missing = np.load(os.path.join(cache_directory, f'{index}.missing.npy'))
+            values = values.astype(object)
+            values[missing] = np.nan
+            columns[column['name']] = pd.Series(values, dtype=column['dtype'])
+        else:
+            # plain ndarray view of the memory map (i.e., no np.memmap subclass)
+            columns[column['name']] = values.view(np.ndarray)
+    return pd.DataFrame(columns, copy=False)
@@ -0,0 +1,348 @@
+import os
+from datetime import datetime as dt
+from typing import Dict, Iterator, Optional, Tuple, Type
+
+import numpy as np
+import pandas as pd
+
+from .cache import atomic_directory
+from .envs.features import DEFAULT_MEAN_RATING, RecoFeatures, get_user_tables
+from .utils import CWD, DATA_HEADER, ITEM_HEADER, convert_header_to_camel_case, \
+    download_data, import_data_for_env
+
+# Genres used for the movie genre features of every data set (i.e., ML 100k genres)
+GENRES = convert_header_to_camel_case(ITEM_HEADER)[5:]
+# Genre names of the larger data sets that are spelled differently in ML 100k;
+# other genres (e.g., IMAX in ML 10M and up) are not part of the features
+GENRE_ALIASES = {'(no genres listed)': 'unknown', 'Children': "Children's"}
+
+
+class MovieLensLoader(object):
+    """
+    Base class for reading a MovieLens data set in chunks.
+
+    Subclasses describe where the files of a data set are and how to parse them;
+    `build_features()` then streams the ratings into memory-mapped storage, so
+    no data set is ever held in memory as a whole DataFrame.
+    """
+    # Name of the data set (i.e., the zip file name on grouplens.org)
+    name = None
+    # Name of the directory created when extracting the zip file
+    directory = None
+    encoding = 'latin-1'
+
+    def __init__(self, data_directory: str = CWD):
+        """
+        Parameterized constructor
+
+        :param data_directory: directory the zip file is extracted into
+        """
+        self.data_directory = data_directory
+
+    def get_path(self, file_name: str) -> str:
+        """
+        Path to a file of the data set
+        """
+        return os.path.join(self.data_directory, self.directory, file_name)
+
+    def download(self) -> None:
+        """
+        Download the data set, unless it is already available
+        """
+        download_data(dataset=self.name, data_directory=self.data_directory)
+
+    def count_ratings(self) -> int:
+        """
+        Number of ratings in the data set (counted without parsing the file)
+        """
+        raise NotImplementedError
+
+    def read_ratings(self, chunksize: int) -> Iterator[pd.DataFrame]:
+        """
+        Read ratings in chunks with the columns of `DATA_HEADER`
+        """
+        raise NotImplementedError
+
+    def read_movies(self) -> pd.DataFrame:
+        """
+        Read movies with the columns `movie_id` and `genres` ('|' separated)
+        """
+        raise NotImplementedError
+
+    def read_users(self) -> Optional[pd.DataFrame]:
+        """
+        Read users with the columns `user_id`, `age`, `gender` and `occupation`,
+        or None if the data set has no user demographics
+        """
+        return None
+
+    def build_features(self, directory: str, chunksize: int = 1000000) -> None:
+        """
+        Stream the ratings into `directory` in the layout of `RecoFeatures.save()`.
+
+        Ratings are written chunk by chunk into a memory-mapped int32 array and the
+        per-user and per-item aggregates are accumulated along the way. Half-star
+        ratings are rounded up to whole stars (i.e., 0.5 -> 1 and 3.5 -> 4).
+        Data sets without user demographics get a single occupation and the
+        default (zero) age and gender features.
+        """
+        movie_genre = self._get_movie_genre_table(movies=self.read_movies())
+        users = self.read_users()
+        if users is None:
+            age_bucket = occupation_id = gender_id = np.zeros(1, dtype=np.uint8)
+            num_of_occupations = 1
+        else:
+            age_bucket, occupation_id, gender_id, num_of_occupations = \
+                get_user_tables(user=users)
+
+        num_of_ratings = self.count_ratings()
+        user_counts, user_sums = np.zeros(1, np.int64), np.zeros(1, np.float64)
+        movie_counts, movie_sums = np.zeros(1, np.int64), np.zeros(1, np.float64)
+        with atomic_directory(directory=directory) as tmp_directory:
+            data = np.lib.format.open_memmap(os.path.join(tmp_directory, 'data.npy'),
+                                             mode='w+', dtype=np.int32,
+                                             shape=(num_of_ratings, 4))
+            start = 0
+            for chunk in self.read_ratings(chunksize=chunksize):
+                values = chunk[convert_header_to_camel_case(DATA_HEADER)].values
+                ratings = np.clip(np.ceil(values[:, 2]), 1, 5)
+                end = start + values.shape[0]
+                data[start:end, [0, 1, 3]] = values[:, [0, 1, 3]]
+                data[start:end, 2] = ratings
+                user_counts, user_sums = _accumulate(user_counts, user_sums,
+                                                     ids=data[start:end, 0],
+                                                     ratings=ratings)
+                movie_counts, movie_sums = _accumulate(movie_counts, movie_sums,
+                                                       ids=data[start:end, 1],
+                                                       ratings=ratings)
+                start = end
+            if start != num_of_ratings:
+                raise ValueError(f'{self.name}: expected {num_of_ratings} ratings, '
+                                 f'but read {start}.')
+            data.flush()
+            del data
+
+            num_of_users = max(user_counts.shape[0], age_bucket.shape[0])
+            num_of_movies = max(movie_counts.shape[0], movie_genre.shape[0])
+            features = RecoFeatures(
+                data=None,
+                user_mean=_get_means(user_counts, user_sums, size=num_of_users),
+                movie_mean=_get_means(movie_counts, movie_sums, size=num_of_movies),
+                movie_genre=_pad(movie_genre, size=num_of_movies),
+                age_bucket=_pad(age_bucket, size=num_of_users),
+                occupation_id=_pad(occupation_id, size=num_of_users),
+                gender_id=_pad(gender_id, size=num_of_users),
+                num_of_occupations=num_of_occupations)
+            features.save_arrays(directory=tmp_directory)
+
+    @staticmethod
+    def _get_movie_genre_table(movies: pd.DataFrame) -> np.ndarray:
+        """
+        Convert '|' separated genre names into genre flags, indexed by movie_id
+        """
+        flags = movies['genres'].str.get_dummies(sep='|')
+        flags = flags.T.rename(index=GENRE_ALIASES).groupby(level=0).max().T
+        flags = flags.reindex(columns=GENRES, fill_value=0)
+        movie_ids = movies['movie_id'].values
+        movie_genre = np.zeros((int(movie_ids.max()) + 1, len(GENRES)), dtype=np.uint8)
+        movie_genre[movie_ids] = flags.values
+        return movie_genre
+
+    @staticmethod
+    def _count_lines(file_path: str, chunk_size: int = 1 << 24) -> int:
+        """
+        Count the lines of a text file without parsing it
+        """
+        num_of_lines = 0
+        last_byte = b'\n'
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                num_of_lines += chunk.count(b'\n')
+                last_byte = chunk[-1:]
+        return num_of_lines + (last_byte != b'\n')
+
+
+class MovieLens100K(MovieLensLoader):
+    """
+    MovieLens 100k, which is small enough to derive the features from DataFrames
+    (identical to `RecoFeatures.from_dataframes(**import_data_for_env())`)
+    """
+    name = 'ml-100k'
+    directory = 'ml-100k'
+
+    def build_features(self, directory: str, chunksize: int = 1000000) -> None:
+        features = RecoFeatures.from_dataframes(**import_data_for_env())
+        features.precompute_observations()
+        features.save(directory=directory)
+
+
+class MovieLens1M(MovieLensLoader):
+    """
+    MovieLens 1M: '::' delimited `.dat` files, including user demographics
+    """
+    name = 'ml-1m'
+    directory = 'ml-1m'
+
+    def count_ratings(self) -> int:
+        return self._count_lines(self.get_path('ratings.dat'))
+
+    def read_ratings(self, chunksize: int) -> Iterator[pd.DataFrame]:
+        # '::' is read as ':' with the C parser (much faster than a multi-character
+        # delimiter), which leaves empty columns in between the actual values
+        reader = pd.read_csv(self.get_path('ratings.dat'), sep=':', header=None,
+                             usecols=[0, 2, 4, 6], encoding=self.encoding,
+                             chunksize=chunksize)
+        for chunk in reader:
+            chunk.columns = convert_header_to_camel_case(DATA_HEADER)
+            yield chunk
+
+    def read_movies(self) -> pd.DataFrame:
+        return pd.read_csv(self.get_path('movies.dat'), sep='::', header=None,
+                           names=['movie_id', 'title', 'genres'],
+                           engine='python', encoding=self.encoding)
+
+    def read_users(self) -> Optional[pd.DataFrame]:
+        return pd.read_csv(self.get_path('users.dat'), sep='::', header=None,
+                           names=['user_id', 'gender', 'age', 'occupation', 'zip_code'],
+                           engine='python', encoding=self.encoding)
+
+
+class MovieLens10M(MovieLens1M):
+    """
+    MovieLens 10M: same file format as ML 1M, without user demographics
+    """
+    name = 'ml-10m'
+    directory = 'ml-10M100K'
+    encoding = 'utf-8'
+
+    def read_users(self) -> Optional[pd.DataFrame]:
+        return None
+
+
+class MovieLens20M(MovieLensLoader):
+    """
+    MovieLens 20M: comma separated `.csv` files with a header row,
+    without user demographics
+    """
+    name = 'ml-20m'
+    directory = 'ml-20m'
+    encoding = 'utf-8'
+
+    def count_ratings(self) -> int:
+        return self._count_lines(self.get_path('ratings.csv')) - 1
+
+    def read_ratings(self, chunksize: int) -> Iterator[pd.DataFrame]:
+        reader = pd.read_csv(self.get_path('ratings.csv'), encoding=self.encoding,
+                             dtype={'userId': np.int32, 'movieId': np.int32,
+                                    'rating': np.float32, 'timestamp': np.int64},
+                             chunksize=chunksize)
+        for chunk in reader:
+            chunk.columns = convert_header_to_camel_case(DATA_HEADER)
+            yield chunk
+
+    def read_movies(self) -> pd.DataFrame:
+        movies = pd.read_csv(self.get_path('movies.csv'), encoding=self.encoding)
+        return movies.rename(columns={'movieId': 'movie_id'})
+
+
+class MovieLens25M(MovieLens20M):
+    """
+    MovieLens 25M: same file format as ML 20M
+    """
+    name = 'ml-25m'
+    directory = 'ml-25m'
+
+
+# Loaders by data set name; register custom loaders with `register_loader()`
+LOADERS = dict()  # type: Dict[str, Type[MovieLensLoader]]
+
+
+def register_loader(loader: Type[MovieLensLoader]) -> None:
+    """
+    Make a data set loader available to `import_features()` by its name
+    """
+    LOADERS[loader.name] = loader
+
+
+for _loader in (MovieLens100K, MovieLens1M, MovieLens10M, MovieLens20M, MovieLens25M):
+    register_loader(_loader)
+
+
+def get_features_directory(dataset: str = 'ml-100k') -> str:
+    """
+    Directory of the memory-mapped features of a data set
+
+    Example:
+      `gym_recommendation/data/ml-100k-features/...`
+    """
+    return os.path.join(CWD, f'{dataset}-features')
+
+
+def import_features(dataset: str = 'ml-100k', chunksize: int = 1000000) -> RecoFeatures:
+    """
+    Helper function to load the features of a MovieLens data set as read-only
+    memory maps.
+
+    The first call downloads the data set and streams it into
+    `gym_recommendation/data/<dataset>-features/`; later calls only attach to
+    those files. Since every process that loads the same data set shares one copy
+    of it through the operating system's page cache, memory stays flat as the
+    number of workers grows, and a 25M rating episode only keeps the pages it
+    touches in memory.
+
+    :param dataset: name of the data set (see `LOADERS`)
+    :param chunksize: number of ratings to parse at a time
+    :return: memory-mapped lookup tables (see `RecoFeatures.load()`)
+    """
+    directory = get_features_directory(dataset=dataset)
+    if not os.path.exists(os.path.join(directory, 'meta.json')):
+        start_time = dt.now()
+        loader = LOADERS[dataset]()
+        loader.download()
+        loader.build_features(directory=directory, chunksize=chunksize)
+        elapsed = (dt.now() - start_time).total_seconds()
+        print(f'import_features() --> built {dataset} features in {elapsed:.2f} seconds.')
+    return RecoFeatures.load(directory=directory)
+
+
+def import_shared_data_for_env(dataset: str = 'ml-100k') -> Dict[str, RecoFeatures]:
+    """
+    Helper function to load a MovieLens data set once and share it between
+    processes (see `import_features()`).
+
+    :return: keyword arguments for `RecoEnv` or `RecoVecEnv`
+        (e.g., `gym.make(RecoEnv.id, **import_shared_data_for_env())`)
+    """
+    return dict(features=import_features(dataset=dataset))
+
+
+def _accumulate(counts: np.ndarray, sums: np.ndarray, ids: np.ndarray,
+                ratings: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Add a chunk of ratings to the running counts and sums, growing them as needed
+    """
+    size = max(counts.shape[0], int(ids.max()) + 1)
+    counts = _pad(counts, size=size)
+    sums = _pad(sums, size=size)
+    counts += np.bincount(ids, minlength=size)
+    sums += np.bincount(ids, weights=ratings, minlength=size)
+    return counts, sums
+
+
+def _get_means(counts: np.ndarray, sums: np.ndarray, size: int) -> np.ndarray:
+    """
+    Mean rating for every id (see `get_mean_rating_table()`)
+    """
+    means = np.full(size, DEFAULT_MEAN_RATING, dtype=np.float64)
+    np.divide(sums, counts, out=means[:counts.shape[0]], where=counts > 0)
+    return means
+
+
+def _pad(array: np.ndarray, size: int) -> np.ndarray:
+    """
+    Extend an id-indexed table with zeros, so it holds `size` ids
+    """
+    if array.shape[0] >= size:
+        return array
+    padding = [(0, size - array.shape[0])] + [(0, 0)] * (array.ndim - 1)
+    return np.pad(array, padding, mode='constant')
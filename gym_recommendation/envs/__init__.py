@@ -1 +1,29 @@
+import importlib
+from typing import Any, List
+
+from gym_recommendation.envs.instrumentation import Instrumentation, JsonLinesSink, \
+    LoggingSink, MetricsSink, TensorBoardSink
 from gym_recommendation.envs.reco_env import RecoEnv
+from gym_recommendation.envs.remote_env import RemoteEnv
+from gym_recommendation.envs.slate_env import SlateEnv
+from gym_recommendation.envs.stream_env import StreamEnv
+
+# Environments that are imported on first use, since they depend on stable_baselines
+_LAZY_ATTRIBUTES = {
+    'RecoVecEnv': 'gym_recommendation.envs.reco_vec_env',
+}
+
+
+def __getattr__(name: str) -> Any:
+    """
+    Import environments lazily (PEP 562)
+    """
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(list(globals().keys()) + list(_LAZY_ATTRIBUTES.keys()))
@@ -0,0 +1,317 @@
+import json
+import math
+import os
+import queue
+import re
+import select
+import socket
+import time
+from collections import deque
+from itertools import islice
+from typing import Any, Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+# Keys of rating events given as dictionaries (timestamp is optional)
+EVENT_KEYS = ('user_id', 'item_id', 'rating', 'timestamp')
+# Separators of rating events given as text lines (e.g., MovieLens u.data or ratings.dat)
+LINE_SEPARATORS = re.compile(r'::|[,\t|;]|\s+')
+
+
+def parse_event(event: Any) -> Tuple[int, int, int, int]:
+    """
+    Convert a rating event into a (user_id, item_id, rating, timestamp) row.
+
+    Events are dictionaries with the `EVENT_KEYS`, sequences in that order, or
+    text lines holding a JSON object/array or separated values (e.g.,
+    "196\\t242\\t3\\t881250949" or "1::1193::5::978300760"). Half-star ratings
+    are rounded up to whole stars, like `MovieLensLoader.build_features()`.
+
+    :raises ValueError: if the event cannot be parsed (e.g., a CSV header)
+    """
+    if isinstance(event, bytes):
+        event = event.decode()
+    if isinstance(event, str):
+        event = event.strip()
+        if event.startswith(('{', '[')):
+            event = json.loads(event)
+        else:
+            event = LINE_SEPARATORS.split(event)
+    if isinstance(event, dict):
+        event = [event['user_id'], event['item_id'], event['rating'],
+                 event.get('timestamp', 0)]
+    if len(event) < 3:
+        raise ValueError(f'Rating events need a user_id, item_id and rating, got {event}.')
+    rating = min(max(math.ceil(float(event[2])), 1), 5)
+    timestamp = int(float(event[3])) if len(event) > 3 else 0
+    return int(event[0]), int(event[1]), rating, timestamp
+
+
+def parse_events(events: List[Any]) -> np.ndarray:
+    """
+    Convert a batch of rating events given as dictionaries or numeric sequences
+    (all of the same kind) into rows at once, like `parse_event()`
+
+    :return: int64 array of (user_id, item_id, rating, timestamp) rows
+    :raises ValueError: if the batch holds other events (e.g., text lines)
+    """
+    if not events:
+        return np.zeros((0, 4), dtype=np.int64)
+    if isinstance(events[0], dict):
+        events = [(event['user_id'], event['item_id'], event['rating'],
+                   event.get('timestamp', 0)) for event in events]
+    elif isinstance(events[0], (str, bytes)):
+        raise ValueError('Text events are parsed one at a time with parse_event().')
+    values = np.array(events, dtype=np.float64)
+    if values.ndim != 2 or values.shape[1] < 3:
+        raise ValueError('Rating events need a user_id, item_id and rating.')
+    rows = np.zeros((values.shape[0], 4), dtype=np.int64)
+    rows[:, :2] = values[:, :2]
+    rows[:, 2] = np.clip(np.ceil(values[:, 2]), 1, 5)
+    if values.shape[1] > 3:
+        rows[:, 3] = values[:, 3]
+    return rows
+
+
+class EventSource(object):
+    """
+    Base class for the feeds of rating events consumed by `StreamEnv`.
+
+    `read()` returns the events that are available in one array, waiting only
+    until the first event arrives, so a slow feed never stalls a batch. Events
+    that cannot be parsed (e.g., a CSV header) are skipped and counted in
+    `num_of_dropped`.
+    """
+    # number of unparsable events skipped so far (set on the instance once counted)
+    num_of_dropped = 0
+
+    def read(self, max_events: int) -> np.ndarray:
+        """
+        Read up to `max_events` events
+
+        :return: int64 array of (user_id, item_id, rating, timestamp) rows,
+            empty once the feed has ended
+        """
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """
+        Release the resources of the feed
+        """
+        pass
+
+    def _to_array(self, events: Iterable) -> np.ndarray:
+        events = list(events)
+        try:
+            return parse_events(events)
+        except (ValueError, TypeError, KeyError, IndexError):
+            pass
+        rows = []
+        for event in events:
+            try:
+                rows.append(parse_event(event))
+            except (ValueError, KeyError, IndexError):
+                self.num_of_dropped += 1  # e.g., a CSV header
+        return np.array(rows, dtype=np.int64).reshape(-1, 4)
+
+
+class IteratorSource(EventSource):
+    """
+    Rating events of a Python iterable (e.g., a generator or a list of dictionaries)
+    """
+
+    def __init__(self, events: Iterable):
+        self.events = iter(events)
+
+    def read(self, max_events: int) -> np.ndarray:
+        while True:
+            chunk = list(islice(self.events, max_events))
+            if not chunk:
+                return np.zeros((0, 4), dtype=np.int64)
+            rows = self._to_array(chunk)
+            if rows.shape[0] > 0:
+                return rows
+
+
+class QueueSource(EventSource):
+    """
+    Rating events put into a queue (e.g., `queue.Queue` or `multiprocessing.Queue`
+    standing in for an event bus). Putting `sentinel` into the queue ends the feed.
+    """
+
+    def __init__(self, events: Any, sentinel: Any = None, timeout: Optional[float] = None):
+        """
+        :param events: queue with `get(block, timeout)` and `get_nowait()`
+        :param timeout: seconds to wait for an event before ending the feed
+            (None = wait forever)
+        """
+        self.events = events
+        self.sentinel = sentinel
+        self.timeout = timeout
+        self.ended = False
+
+    def read(self, max_events: int) -> np.ndarray:
+        while not self.ended:
+            chunk = []
+            try:
+                chunk.append(self.events.get(block=True, timeout=self.timeout))
+                while len(chunk) < max_events:
+                    chunk.append(self.events.get_nowait())
+            except queue.Empty:
+                self.ended = not chunk  # no event before the timeout
+            if chunk and self._is_sentinel(chunk[-1]):
+                self.ended = True
+                chunk.pop()
+            rows = self._to_array(chunk)
+            if rows.shape[0] > 0:
+                return rows
+        return np.zeros((0, 4), dtype=np.int64)
+
+    def _is_sentinel(self, event: Any) -> bool:
+        return event is self.sentinel or (self.sentinel is not None and
+                                          event == self.sentinel)
+
+
+class LineSource(EventSource):
+    """
+    Base class for feeds of text lines, which are read in blocks. Lines that are
+    not complete yet (i.e., without a newline) are kept until the rest arrives.
+    """
+
+    def __init__(self):
+        self.lines = deque()
+        self.partial_line = ''
+        self.ended = False
+
+    def _read_text(self) -> Optional[str]:
+        """
+        Wait for more text
+
+        :return: text (possibly empty), or None once the feed has ended
+        """
+        raise NotImplementedError
+
+    def read(self, max_events: int) -> np.ndarray:
+        while True:
+            while not self.lines and not self.ended:
+                text = self._read_text()
+                if text is None:
+                    self.ended = True
+                    if self.partial_line.strip():
+                        self.lines.append(self.partial_line)
+                    self.partial_line = ''
+                    break
+                lines = (self.partial_line + text).split('\n')
+                self.partial_line = lines.pop()
+                self.lines.extend(line for line in lines if line.strip())
+            if not self.lines:
+                return np.zeros((0, 4), dtype=np.int64)
+            num_of_lines = min(max_events, len(self.lines))
+            rows = self._to_array(self.lines.popleft() for _ in range(num_of_lines))
+            if rows.shape[0] > 0:
+                return rows
+
+
+class FileSource(LineSource):
+    """
+    Rating events of a JSON-lines or CSV/TSV file. With `follow=True` the file is
+    tailed like `tail -f`: new lines are read as they are appended.
+    """
+
+    def __init__(self, path: str, follow: bool = False, poll_interval: float = 0.1,
+                 timeout: Optional[float] = None, block_size: int = 1 << 20):
+        """
+        :param path: file to read
+        :param follow: if True, wait for lines appended to the file
+        :param poll_interval: seconds between checks for new lines
+        :param timeout: with `follow`, seconds without new lines before the feed
+            ends (None = wait forever)
+        :param block_size: number of bytes read at a time
+        """
+        super(FileSource, self).__init__()
+        self.file = open(path, 'r')
+        self.follow = follow
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.block_size = block_size
+
+    def _read_text(self) -> Optional[str]:
+        start_time = time.perf_counter()
+        while True:
+            text = self.file.read(self.block_size)
+            if text:
+                return text
+            if not self.follow:
+                return None
+            if self.timeout is not None and time.perf_counter() - start_time > self.timeout:
+                return None
+            time.sleep(self.poll_interval)
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class SocketSource(LineSource):
+    """
+    Rating events sent as lines (JSON or separated values) over a TCP socket,
+    standing in for an event bus. The feed ends when the sender closes the connection.
+    """
+
+    def __init__(self, address: Union[Tuple[str, int], socket.socket],
+                 timeout: Optional[float] = None, block_size: int = 1 << 16):
+        """
+        :param address: (host, port) to connect to, or a connected socket
+        :param timeout: seconds without data before the feed ends (None = wait forever)
+        :param block_size: number of bytes received at a time
+        """
+        super(SocketSource, self).__init__()
+        self.socket = address if isinstance(address, socket.socket) \
+            else socket.create_connection(address)
+        self.timeout = timeout
+        self.block_size = block_size
+        self._pending_bytes = b''
+
+    def _read_text(self) -> Optional[str]:
+        readable, _, _ = select.select([self.socket], [], [], self.timeout)
+        if not readable:
+            return None
+        data = self.socket.recv(self.block_size)
+        if not data:
+            return None
+        # keep the bytes of a character that is split between blocks
+        data = self._pending_bytes + data
+        try:
+            text = data.decode()
+            self._pending_bytes = b''
+        except UnicodeDecodeError as error:
+            text = data[:error.start].decode()
+            self._pending_bytes = data[error.start:]
+        return text
+
+    def close(self) -> None:
+        self.socket.close()
+
+
+def get_event_source(events: Any) -> EventSource:
+    """
+    Wrap a feed of rating events in an `EventSource`: a file path (see `FileSource`),
+    a queue (see `QueueSource`), or any other iterable (see `IteratorSource`)
+    """
+    if isinstance(events, EventSource):
+        return events
+    if isinstance(events, (str, os.PathLike)):
+        return FileSource(path=os.fspath(events))
+    if hasattr(events, 'get') and hasattr(events, 'get_nowait'):
+        return QueueSource(events=events)
+    return IteratorSource(events=events)
+
+
+def iterate_events(source: EventSource, batch_size: int = 1024) -> Iterator[np.ndarray]:
+    """
+    Iterate over the batches of a feed until it ends
+    """
+    while True:
+        rows = source.read(max_events=batch_size)
+        if rows.shape[0] == 0:
+            return
+        yield rows
@@ -0,0 +1,491 @@
+import json
+import os
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from gym_recommendation.cache import atomic_directory
+
+# Number of age groups used for the one-hot age features (see `get_age_buckets`)
+NUM_OF_AGE_BUCKETS = 7
+# Number of gender groups used for the one-hot gender features (only M or F)
+NUM_OF_GENDERS = 2
+# Default mean rating used for ids that do not appear in the rating data
+DEFAULT_MEAN_RATING = 3.
+# Columns of the compact observations (see `RecoFeatures.get_compact_observations`)
+COMPACT_COLUMNS = ('user_mean', 'movie_mean', 'user_id', 'item_id', 'age_bucket',
+                   'occupation_id', 'gender_id', 'genre_mask')
+# Largest integer that compact observations hold exactly (float32 has 24 bits of precision)
+MAX_COMPACT_INDEX = 2 ** 24
+
+
+def get_id_dtype(max_value: int) -> type:
+    """
+    Smallest unsigned integer type that holds the ids or codes up to `max_value`
+    """
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if max_value <= np.iinfo(dtype).max:
+            return dtype
+    return np.uint64
+
+
+def get_data_dtype(data: np.ndarray) -> type:
+    """
+    Integer type of the rating rows (user_id, item_id, rating, timestamp):
+    int32 when every value fits (e.g., timestamps before 2038), else int64
+    """
+    if data.size == 0:
+        return np.int32
+    int32 = np.iinfo(np.int32)
+    return np.int32 if int32.min <= data.min() and data.max() <= int32.max else np.int64
+
+
+def get_nbytes(array: Optional[np.ndarray], include_shared: bool = True) -> int:
+    """
+    Number of bytes of an array (0 for None, and for memory-mapped arrays,
+    which are shared through the page cache, unless `include_shared`)
+    """
+    if array is None or (not include_shared and isinstance(array, np.memmap)):
+        return 0
+    return int(array.nbytes)
+
+
+def get_reward(action: int, rating: int) -> float:
+    """
+    Reward for predicting `action` + 1 when the user's actual rating is `rating`
+    """
+    prediction_difference = abs(int(action) + 1 - int(rating))
+    reward = 0.
+    if prediction_difference == 0:
+        reward += 1.
+    else:
+        # Use addition since log loss is negative
+        reward += np.log(1. - prediction_difference / 5)
+    return reward
+
+
+# Reward for every (action, rating - 1) pair, which turns reward calculations
+# for a batch of predictions into a single lookup
+REWARD_TABLE = np.array([[get_reward(action=action, rating=rating)
+                          for rating in range(1, 6)]
+                         for action in range(5)], dtype=np.float64)
+
+
+def get_movie_genre_table(item: pd.DataFrame) -> np.ndarray:
+    """
+    Vectorized equivalent of `RecoEnv._get_movie_genre()`, indexed by movie_id.
+
+    Row `movie_id` holds the genre flags found at position `movie_id` of the
+    item table, which mirrors the original per-movie `item.iloc` lookups exactly.
+    Movies without genre flags are left as zeros.
+
+    :param item: Movie reference data
+    :return: uint8 array of shape (max_movie_id + 1, number_of_genres)
+    """
+    num_of_movies = item['movie_id'].nunique()
+    num_of_rows = max(int(item['movie_id'].max()), num_of_movies - 1) + 1
+    genres = item.iloc[:, 5:].values.astype(np.uint8)
+    movie_genre = np.zeros((num_of_rows, genres.shape[1]), dtype=np.uint8)
+    movie_genre[1:num_of_movies] = genres[1:num_of_movies]
+    return movie_genre
+
+
+def get_age_buckets(age: np.ndarray) -> np.ndarray:
+    """
+    Vectorized age group lookup (i.e., 0-9, 10-19, ..., 60+)
+    """
+    return np.clip(np.asarray(age) // 10, 0, NUM_OF_AGE_BUCKETS - 1).astype(np.uint8)
+
+
+def get_gender_ids(gender: np.ndarray) -> np.ndarray:
+    """
+    Vectorized gender lookup (M = 0 | everything else = 1)
+    """
+    return (pd.Series(gender).str.upper().values != 'M').astype(np.uint8)
+
+
+def get_user_tables(user: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray,
+                                                  np.ndarray, int]:
+    """
+    Create id-indexed arrays of user stats (e.g., age, occupation, gender).
+
+    Occupations are numbered in order of first appearance, which is the same
+    ordering as `user.occupation.unique()`. Every table uses the smallest
+    unsigned integer type that holds its codes (see `get_id_dtype()`).
+
+    :param user: User reference data
+    :return: (age_bucket, occupation_id, gender_id, num_of_occupations)
+    """
+    user_ids = user['user_id'].values
+    occupation_ids, occupations = pd.factorize(user['occupation'])
+    num_of_rows = int(user_ids.max()) + 1
+    age_bucket = np.zeros(num_of_rows, dtype=np.uint8)
+    occupation_id = np.zeros(num_of_rows, dtype=get_id_dtype(max(len(occupations) - 1, 0)))
+    gender_id = np.zeros(num_of_rows, dtype=np.uint8)
+    age_bucket[user_ids] = get_age_buckets(user['age'].values)
+    occupation_id[user_ids] = occupation_ids
+    gender_id[user_ids] = get_gender_ids(user['gender'].values)
+    return age_bucket, occupation_id, gender_id, len(occupations)
+
+
+def get_mean_rating_table(ids: np.ndarray, ratings: np.ndarray,
+                          size: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Vectorized `groupby(ids).mean()` of the ratings, indexed by id.
+
+    :param ids: user_id or item_id of each rating
+    :param ratings: rating values
+    :param size: minimum length of the returned table
+    :return: (mean rating, number of ratings) for every id;
+        ids without ratings are assigned `DEFAULT_MEAN_RATING`
+    """
+    counts = np.bincount(ids, minlength=size)
+    sums = np.bincount(ids, weights=ratings, minlength=size)
+    means = np.full(counts.shape[0], DEFAULT_MEAN_RATING, dtype=np.float64)
+    np.divide(sums, counts, out=means, where=counts > 0)
+    return means, counts
+
+
+def get_genre_masks(movie_genre: np.ndarray) -> np.ndarray:
+    """
+    Pack the genre flags of every movie into an integer (bit `i` = genre `i`)
+    """
+    bits = np.left_shift(1, np.arange(movie_genre.shape[1], dtype=np.int64))
+    return (np.asarray(movie_genre) > 0.).astype(np.int64) @ bits
+
+
+def expand_observations(compact: np.ndarray, num_of_genres: int,
+                        num_of_occupations: int) -> np.ndarray:
+    """
+    Convert a batch of compact observations into the dense (one-hot) observations.
+
+    Columns after the compact columns (e.g., `online_stats` features) are kept at
+    the end of the dense observations, like in `RecoEnv`.
+
+    :param compact: array of shape (batch_size, len(COMPACT_COLUMNS) + extra columns)
+    :return: float32 array of shape (batch_size, observation_size + extra columns)
+    """
+    compact = np.asarray(compact)
+    num_of_rows = compact.shape[0]
+    num_of_extras = compact.shape[1] - len(COMPACT_COLUMNS)
+    observation_size = 2 + num_of_genres + NUM_OF_AGE_BUCKETS + \
+        num_of_occupations + NUM_OF_GENDERS
+    observations = np.zeros((num_of_rows, observation_size + num_of_extras),
+                            dtype=np.float32)
+    observations[:, :2] = compact[:, :2]
+    offset = 2
+    genre_mask = compact[:, 7].astype(np.int64)
+    observations[:, offset:offset + num_of_genres] = np.bitwise_and(
+        np.right_shift(genre_mask[:, None], np.arange(num_of_genres)), 1)
+    offset += num_of_genres
+    index = np.arange(num_of_rows)
+    observations[index, offset + compact[:, 4].astype(np.int64)] = 1.
+    offset += NUM_OF_AGE_BUCKETS
+    observations[index, offset + compact[:, 5].astype(np.int64)] = 1.
+    offset += num_of_occupations
+    observations[index, offset + compact[:, 6].astype(np.int64)] = 1.
+    observations[:, observation_size:] = compact[:, len(COMPACT_COLUMNS):]
+    return observations
+
+
+class RecoFeatures(object):
+    """
+    Dense, id-indexed lookup tables used to create RecoEnv observations
+    for many rating rows at once.
+    """
+    # Names of the arrays written by `save()` and read by `load()`
+    ARRAYS = ('data', 'user_mean', 'movie_mean', 'movie_genre', 'age_bucket',
+              'occupation_id', 'gender_id', 'observations')
+
+    def __init__(self,
+                 data: np.ndarray,
+                 user_mean: np.ndarray,
+                 movie_mean: np.ndarray,
+                 movie_genre: np.ndarray,
+                 age_bucket: np.ndarray,
+                 occupation_id: np.ndarray,
+                 gender_id: np.ndarray,
+                 num_of_occupations: int,
+                 observations: np.ndarray = None):
+        """
+        Parameterized constructor
+        """
+        self.data = data
+        self.user_mean = user_mean
+        self.movie_mean = movie_mean
+        self.movie_genre = movie_genre
+        self.age_bucket = age_bucket
+        self.occupation_id = occupation_id
+        self.gender_id = gender_id
+        self.num_of_occupations = num_of_occupations
+        self.observations = observations
+        self.num_of_genres = movie_genre.shape[1]
+        self._genre_mask = None
+        self.observation_size = 2 + self.num_of_genres + NUM_OF_AGE_BUCKETS + \
+            num_of_occupations + NUM_OF_GENDERS
+        # position of the first column of each one-hot feature
+        self._age_offset = 2 + self.num_of_genres
+        self._occupation_offset = self._age_offset + NUM_OF_AGE_BUCKETS
+        self._gender_offset = self._occupation_offset + num_of_occupations
+
+    @classmethod
+    def from_dataframes(cls,
+                        data: pd.DataFrame,
+                        item: pd.DataFrame,
+                        user: pd.DataFrame) -> 'RecoFeatures':
+        """
+        Derive all lookup tables from the MovieLens DataFrames.
+
+        The tables are stored with compact types (see `get_data_dtype()` and
+        `get_user_tables()`), and no DataFrame is kept. Mean ratings stay float64, so
+        the observations equal the means of the DataFrame divided by 5.
+        """
+        values = data.values
+        values = values.astype(get_data_dtype(values))
+        user_ids = data['user_id'].values
+        movie_ids = data['item_id'].values
+        ratings = data['rating'].values.astype(np.float64)
+        age_bucket, occupation_id, gender_id, num_of_occupations = \
+            get_user_tables(user=user)
+        movie_genre = get_movie_genre_table(item=item)
+        user_mean, _ = get_mean_rating_table(ids=user_ids, ratings=ratings,
+                                             size=age_bucket.shape[0])
+        movie_mean, _ = get_mean_rating_table(ids=movie_ids, ratings=ratings,
+                                              size=movie_genre.shape[0])
+        return cls(data=values,
+                   user_mean=user_mean,
+                   movie_mean=movie_mean,
+                   movie_genre=movie_genre,
+                   age_bucket=age_bucket,
+                   occupation_id=occupation_id,
+                   gender_id=gender_id,
+                   num_of_occupations=num_of_occupations)
+
+    def get_observations(self, rows: np.ndarray) -> np.ndarray:
+        """
+        Create the observations for a batch of rating rows.
+
+        Each row is identical to `RecoEnv._get_observation(step_number=row)`.
+
+        :param rows: row numbers in `data`
+        :return: float32 array of shape (len(rows), observation_size)
+        """
+        return self.get_pair_observations(user_ids=self.data[rows, 0],
+                                          movie_ids=self.data[rows, 1])
+
+    def get_pair_observations(self, user_ids: np.ndarray,
+                              movie_ids: np.ndarray) -> np.ndarray:
+        """
+        Create the observations for a batch of (user_id, movie_id) pairs, which do
+        not need to appear in `data` (e.g., candidate movies for a user)
+
+        :return: float32 array of shape (len(user_ids), observation_size)
+        """
+        num_of_rows = user_ids.shape[0]
+        observations = np.zeros((num_of_rows, self.observation_size), dtype=np.float32)
+        observations[:, 0] = self._lookup(self.user_mean, user_ids,
+                                          DEFAULT_MEAN_RATING) / 5.
+        observations[:, 1] = self._lookup(self.movie_mean, movie_ids,
+                                          DEFAULT_MEAN_RATING) / 5.
+        observations[:, 2:self._age_offset] = self._lookup(self.movie_genre, movie_ids, 0)
+        index = np.arange(num_of_rows)
+        # codes are stored as small unsigned integers, so offsets are added as int64
+        observations[index, self._age_offset +
+                     self._lookup(self.age_bucket, user_ids, 0).astype(np.int64)] = 1.
+        observations[index, self._occupation_offset +
+                     self._lookup(self.occupation_id, user_ids, 0).astype(np.int64)] = 1.
+        observations[index, self._gender_offset +
+                     self._lookup(self.gender_id, user_ids, 0).astype(np.int64)] = 1.
+        return observations
+
+    def get_observation(self, user_id: int, movie_id: int) -> np.ndarray:
+        """
+        Create the observation of one (user_id, movie_id) pair, which is identical
+        to a row of `get_pair_observations()` without the overhead of batch indexing
+        (i.e., the observation of one `RecoEnv.step()`)
+        """
+        observation = np.zeros(self.observation_size, dtype=np.float32)
+        # divided in the type of the tables, like `get_pair_observations()`
+        observation[0] = (self.user_mean[user_id] if user_id < self.user_mean.shape[0]
+                          else self.user_mean.dtype.type(DEFAULT_MEAN_RATING)) / 5.
+        observation[1] = (self.movie_mean[movie_id] if movie_id < self.movie_mean.shape[0]
+                          else self.movie_mean.dtype.type(DEFAULT_MEAN_RATING)) / 5.
+        if movie_id < self.movie_genre.shape[0]:
+            observation[2:self._age_offset] = self.movie_genre[movie_id]
+        if user_id < self.age_bucket.shape[0]:
+            observation[self._age_offset + int(self.age_bucket[user_id])] = 1.
+        else:
+            observation[self._age_offset] = 1.
+        if user_id < self.occupation_id.shape[0]:
+            observation[self._occupation_offset + int(self.occupation_id[user_id])] = 1.
+        else:
+            observation[self._occupation_offset] = 1.
+        if user_id < self.gender_id.shape[0]:
+            observation[self._gender_offset + int(self.gender_id[user_id])] = 1.
+        else:
+            observation[self._gender_offset] = 1.
+        return observation
+
+    def get_compact_observations(self, rows: np.ndarray) -> np.ndarray:
+        """
+        Create the compact observations for a batch of rating rows: the two mean
+        ratings of the dense observations followed by the user_id, item_id, age
+        bucket, occupation id, gender id and genre bitmask (see `COMPACT_COLUMNS`).
+
+        The dense observations are recovered with `expand_observations()`.
+
+        :param rows: row numbers in `data`
+        :return: float32 array of shape (len(rows), len(COMPACT_COLUMNS))
+        """
+        return self.get_compact_pair_observations(user_ids=self.data[rows, 0],
+                                                  movie_ids=self.data[rows, 1])
+
+    def get_compact_pair_observations(self, user_ids: np.ndarray,
+                                      movie_ids: np.ndarray) -> np.ndarray:
+        """
+        Create the compact observations for a batch of (user_id, movie_id) pairs
+        (see `get_pair_observations()`)
+        """
+        if self._genre_mask is None:
+            self._genre_mask = get_genre_masks(movie_genre=self.movie_genre)
+        observations = np.empty((user_ids.shape[0], len(COMPACT_COLUMNS)), dtype=np.float32)
+        observations[:, 0] = self._lookup(self.user_mean, user_ids,
+                                          DEFAULT_MEAN_RATING) / 5.
+        observations[:, 1] = self._lookup(self.movie_mean, movie_ids,
+                                          DEFAULT_MEAN_RATING) / 5.
+        observations[:, 2] = user_ids
+        observations[:, 3] = movie_ids
+        observations[:, 4] = self._lookup(self.age_bucket, user_ids, 0)
+        observations[:, 5] = self._lookup(self.occupation_id, user_ids, 0)
+        observations[:, 6] = self._lookup(self.gender_id, user_ids, 0)
+        observations[:, 7] = self._lookup(self._genre_mask, movie_ids, 0)
+        return observations
+
+    def get_compact_observation_table(self, batch_size: int = 65536) -> np.ndarray:
+        """
+        Create the read-only compact observation for every rating row in `data`
+        (see `get_observation_table()`)
+        """
+        num_of_rows = self.data.shape[0]
+        table = np.empty((num_of_rows, len(COMPACT_COLUMNS)), dtype=np.float32)
+        for start in range(0, num_of_rows, batch_size):
+            rows = np.arange(start, min(start + batch_size, num_of_rows))
+            table[rows] = self.get_compact_observations(rows=rows)
+        table.flags.writeable = False
+        return table
+
+    def expand_observations(self, compact: np.ndarray) -> np.ndarray:
+        """
+        Convert a batch of compact observations into dense observations
+        (see `expand_observations()`)
+        """
+        return expand_observations(compact=compact, num_of_genres=self.num_of_genres,
+                                   num_of_occupations=self.num_of_occupations)
+
+    def check_compact_observations(self) -> None:
+        """
+        Raise a ValueError if the ids or genres do not fit in compact observations
+        """
+        largest_id = max(int(self.data[:, 0].max()), int(self.data[:, 1].max()))
+        if largest_id >= MAX_COMPACT_INDEX or self.num_of_genres >= 24:
+            raise ValueError(f'Compact observations support ids below {MAX_COMPACT_INDEX} '
+                             f'and fewer than 24 genres.')
+
+    def precompute_observations(self) -> np.ndarray:
+        """
+        Create and keep the observation table, so observations become row lookups
+        """
+        self.observations = self.get_observation_table()
+        return self.observations
+
+    def get_memory_usage(self, include_shared: bool = True) -> Dict[str, int]:
+        """
+        Number of bytes of every lookup table (and the observation table, if
+        created) by name (see `get_nbytes()`)
+        """
+        usage = dict()
+        for name in RecoFeatures.ARRAYS + ('_genre_mask',):
+            array = getattr(self, name)
+            if array is not None:
+                usage[name.lstrip('_')] = get_nbytes(array, include_shared=include_shared)
+        return usage
+
+    def save(self, directory: str, overwrite: bool = False) -> None:
+        """
+        Save all lookup tables (and the observation table, if created) into
+        `directory` as `.npy` files, which can be memory-mapped with `load()`.
+
+        Files are written to a temporary directory first and moved into place,
+        so concurrent readers never attach to a partially written directory.
+
+        :param overwrite: if True, replace an existing `directory`
+        :raises FileExistsError: if `directory` exists (and is not an empty
+            directory) and `overwrite` is False
+        """
+        if not overwrite and os.path.exists(directory) and \
+                not (os.path.isdir(directory) and not os.listdir(directory)):
+            raise FileExistsError(f'{directory} already exists; pass overwrite=True '
+                                  f'to replace it.')
+        with atomic_directory(directory=directory, overwrite=overwrite) as tmp_directory:
+            self.save_arrays(directory=tmp_directory)
+
+    def save_arrays(self, directory: str) -> None:
+        """
+        Write the lookup tables into an existing directory (see `save()`).
+
+        Arrays set to None are skipped, which lets callers write large arrays
+        (e.g., `data`) into `directory` themselves.
+        """
+        for name in RecoFeatures.ARRAYS:
+            array = getattr(self, name)
+            if array is not None:
+                np.save(os.path.join(directory, f'{name}.npy'), np.ascontiguousarray(array))
+        with open(os.path.join(directory, 'meta.json'), 'w') as f:
+            json.dump(dict(num_of_occupations=int(self.num_of_occupations)), f)
+
+    @classmethod
+    def load(cls, directory: str, mmap_mode: Optional[str] = 'r') -> 'RecoFeatures':
+        """
+        Load lookup tables saved with `save()`.
+
+        With the default `mmap_mode='r'` the arrays are read-only memory maps,
+        so every process that loads the same directory shares one copy of the
+        data through the operating system's page cache.
+        """
+        with open(os.path.join(directory, 'meta.json')) as f:
+            meta = json.load(f)
+        arrays = dict()
+        for name in RecoFeatures.ARRAYS:
+            file_path = os.path.join(directory, f'{name}.npy')
+            if os.path.exists(file_path):
+                arrays[name] = np.load(file_path, mmap_mode=mmap_mode)
+        return cls(num_of_occupations=meta['num_of_occupations'], **arrays)
+
+    def get_observation_table(self, batch_size: int = 65536) -> np.ndarray:
+        """
+        Create the read-only observation for every rating row in `data`.
+
+        :param batch_size: number of rows to create per vectorized call
+        :return: float32 array of shape (len(data), observation_size)
+        """
+        num_of_rows = self.data.shape[0]
+        table = np.empty((num_of_rows, self.observation_size), dtype=np.float32)
+        for start in range(0, num_of_rows, batch_size):
+            rows = np.arange(start, min(start + batch_size, num_of_rows))
+            table[rows] = self.get_observations(rows=rows)
+        table.flags.writeable = False
+        return table
+
+    @staticmethod
+    def _lookup(table: np.ndarray, ids: np.ndarray,
+                default: float) -> np.ndarray:
+        """
+        Index a table by id, using `default` for ids outside of the table
+        """
+        known = ids < table.shape[0]
+        if known.all():
+            return table[ids]
+        values = table[np.where(known, ids, 0)]
+        values[~known] = default
+        return values
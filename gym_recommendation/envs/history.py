@@ -0,0 +1,138 @@
+import math
+
+import numpy as np
+
+# Scale of the time since the user's last rating: log1p(seconds) / 20 is below 1
+# for gaps of up to ~15 years
+TIME_SCALE = 20.
+
+
+def get_num_of_history_features(history_length: int, num_of_genres: int) -> int:
+    """
+    Number of features created by `UserHistory.get_features()`
+    """
+    return 2 * history_length + num_of_genres + 1
+
+
+class UserHistory(object):
+    """
+    Recent ratings of every user, updated one rating at a time.
+
+    The last `history_length` movies and ratings of each user are kept in
+    preallocated ring buffers (one row per user_id), next to an exponentially
+    decayed genre profile and the timestamp of the user's last rating. Updates
+    and lookups only touch one user's row, so they cost O(history_length +
+    number of genres) no matter how many ratings were replayed.
+
+    Every rating is written twice (at `position` and `position + history_length`),
+    so the last `history_length` ratings are always the contiguous slice starting
+    at `position`, which is read without index arithmetic.
+    """
+    # Per-user tables, indexed by user_id
+    ARRAYS = ('item_ids', 'ratings', 'position', 'count', 'last_timestamp',
+              'genre_affinity', 'genre_weight')
+
+    def __init__(self, num_of_users: int, num_of_genres: int,
+                 history_length: int = 10, decay: float = 0.9):
+        """
+        Parameterized constructor
+
+        :param num_of_users: size of the user tables (i.e., max user_id + 1)
+        :param num_of_genres: number of genre flags of every movie
+        :param history_length: number of recent ratings kept for every user
+        :param decay: weight of the genre profile kept at every new rating
+            (e.g., 0.9 = the profile halves after ~7 ratings)
+        """
+        if history_length < 1:
+            raise ValueError(f'history_length must be at least 1, got {history_length}.')
+        self.history_length = history_length
+        self.num_of_genres = num_of_genres
+        self.decay = decay
+        # stored like the observations (float32 holds movie_ids below 2 ** 24 exactly)
+        self.item_ids = np.zeros((num_of_users, 2 * history_length), dtype=np.float32)
+        self.ratings = np.zeros((num_of_users, 2 * history_length), dtype=np.float32)
+        self.position = np.zeros(num_of_users, dtype=np.int64)
+        self.count = np.zeros(num_of_users, dtype=np.int64)
+        self.last_timestamp = np.zeros(num_of_users, dtype=np.int64)
+        self.genre_affinity = np.zeros((num_of_users, num_of_genres), dtype=np.float64)
+        self.genre_weight = np.zeros(num_of_users, dtype=np.float64)
+        self.num_of_features = get_num_of_history_features(
+            history_length=history_length, num_of_genres=num_of_genres)
+
+    def reset(self) -> None:
+        """
+        Forget all ratings
+        """
+        for name in UserHistory.ARRAYS:
+            getattr(self, name).fill(0)
+
+    def get_state(self) -> dict:
+        """
+        Get a copy of the histories (see `set_state()`)
+        """
+        return dict((name, getattr(self, name).copy()) for name in UserHistory.ARRAYS)
+
+    def set_state(self, state: dict) -> None:
+        """
+        Restore histories returned by `get_state()`
+        """
+        for name in UserHistory.ARRAYS:
+            setattr(self, name, state[name].copy())
+
+    def update(self, user_id: int, movie_id: int, rating: float, timestamp: int,
+               genres: np.ndarray) -> None:
+        """
+        Add one rating to the user's history
+
+        :param genres: genre flags of the movie
+        """
+        history_length = self.history_length
+        position = self.position[user_id]
+        self.item_ids[user_id, position] = movie_id
+        self.item_ids[user_id, position + history_length] = movie_id
+        self.ratings[user_id, position] = rating / 5.
+        self.ratings[user_id, position + history_length] = rating / 5.
+        self.position[user_id] = (position + 1) % history_length
+        self.count[user_id] += 1
+        self.last_timestamp[user_id] = timestamp
+        affinity = self.genre_affinity[user_id]
+        affinity *= self.decay
+        affinity += genres * (rating / 5.)
+        self.genre_weight[user_id] = self.genre_weight[user_id] * self.decay + 1.
+
+    def get_features(self, user_id: int, timestamp: int) -> np.ndarray:
+        """
+        Get the history features of a user at `timestamp`
+
+        Features=
+          recent_items:
+            movie_id of the user's last `history_length` ratings, newest first
+            (0 = no rating)
+          recent_ratings:
+            The user's last `history_length` ratings, newest first (divided by 5)
+          genre_affinity:
+            Recency-weighted average of the genre flags of the user's rated movies,
+            weighted by rating (divided by 5)
+          time_since_last_rating:
+            Log of the seconds since the user's last rating (divided by 20);
+            1 if the user has no earlier rating
+        """
+        history_length = self.history_length
+        position = self.position[user_id]
+        # oldest to newest rating, reversed into newest first
+        newest_first = slice(position + history_length - 1,
+                             position - 1 if position > 0 else None, -1)
+        features = np.empty(self.num_of_features, dtype=np.float32)
+        features[:history_length] = self.item_ids[user_id, newest_first]
+        features[history_length:2 * history_length] = self.ratings[user_id, newest_first]
+        weight = self.genre_weight[user_id]
+        genres_end = 2 * history_length + self.num_of_genres
+        if weight > 0.:
+            np.divide(self.genre_affinity[user_id], weight,
+                      out=features[2 * history_length:genres_end], casting='unsafe')
+            features[-1] = math.log1p(max(timestamp - self.last_timestamp[user_id], 0)) / \
+                TIME_SCALE
+        else:
+            features[2 * history_length:genres_end] = 0.
+            features[-1] = 1.
+        return features
@@ -0,0 +1,285 @@
+import json
+import logging
+from collections import deque
+from time import perf_counter
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from gym_recommendation.envs.features import REWARD_TABLE
+
+# Possible rewards from best (correct prediction) to worst (prediction off by 4 stars),
+# i.e., the bins of the reward histogram
+REWARD_LEVELS = np.unique(REWARD_TABLE)[::-1].copy()
+# Reward levels in ascending order for `np.searchsorted()`
+_ASCENDING_REWARD_LEVELS = REWARD_LEVELS[::-1].copy()
+
+
+class MetricsSink(object):
+    """
+    Base class for writing the records created by `Instrumentation`.
+
+    Every record is a flat dict with an `event` key ('episode', 'summary' or
+    'message') and JSON serializable values.
+    """
+
+    def write(self, record: dict) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class LoggingSink(MetricsSink):
+    """
+    Write records to the `logging` module
+    """
+
+    def __init__(self, logger: Optional[logging.Logger] = None, level: int = logging.INFO):
+        self.logger = logger or logging.getLogger('gym_recommendation')
+        self.level = level
+
+    def write(self, record: dict) -> None:
+        if not self.logger.isEnabledFor(self.level):
+            return
+        if record['event'] == 'message':
+            self.logger.log(self.level, '%s', record['message'])
+        else:
+            self.logger.log(self.level, '%s', json.dumps(record))
+
+
+class JsonLinesSink(MetricsSink):
+    """
+    Append records to a JSON-lines file (one record per line)
+    """
+
+    def __init__(self, path: str, flush: bool = False):
+        """
+        :param path: file to append records to
+        :param flush: if True, flush the file after every record
+        """
+        self.path = path
+        self.flush = flush
+        self.file = open(path, 'a')
+
+    def write(self, record: dict) -> None:
+        self.file.write(json.dumps(record) + '\n')
+        if self.flush:
+            self.file.flush()
+
+    def close(self) -> None:
+        if not self.file.closed:
+            self.file.close()
+
+
+class TensorBoardSink(MetricsSink):
+    """
+    Write the numeric values of 'episode' and 'summary' records as TensorBoard
+    scalars (e.g., `episode/accuracy`). Requires TensorFlow.
+    """
+
+    def __init__(self, log_dir: str):
+        import tensorflow as tf
+        self.tf = tf
+        self.step = 0
+        if hasattr(tf.summary, 'create_file_writer'):  # TensorFlow 2
+            self.writer = tf.summary.create_file_writer(log_dir)
+        else:
+            self.writer = tf.summary.FileWriter(log_dir)
+
+    def write(self, record: dict) -> None:
+        if record['event'] == 'message':
+            return
+        step = record.get('episode', self.step)
+        self.step += 1
+        scalars = [(f"{record['event']}/{key}", float(value))
+                   for key, value in _flatten(record).items()
+                   if isinstance(value, (int, float)) and not isinstance(value, bool)]
+        if hasattr(self.writer, 'as_default'):
+            with self.writer.as_default():
+                for tag, value in scalars:
+                    self.tf.summary.scalar(tag, value, step=step)
+        else:
+            self.writer.add_summary(self.tf.Summary(value=[
+                self.tf.Summary.Value(tag=tag, simple_value=value)
+                for tag, value in scalars]), global_step=step)
+
+    def close(self) -> None:
+        self.writer.flush()
+        self.writer.close()
+
+
+def _flatten(record: dict, prefix: str = '') -> dict:
+    """
+    Flatten nested dicts and lists into `parent/child` keys
+    """
+    flat = dict()
+    for key, value in record.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, prefix=f'{prefix}{key}/'))
+        elif isinstance(value, list):
+            flat.update(_flatten(dict(enumerate(value)), prefix=f'{prefix}{key}/'))
+        else:
+            flat[f'{prefix}{key}'] = value
+    return flat
+
+
+class Instrumentation(object):
+    """
+    Opt-in metrics for environments: time spent in each phase of `step()`, rolling
+    episode metrics (accuracy, rewards, steps/sec) and a histogram of the rewards.
+
+    Environments only call into this class when it is passed to them, so
+    environments without instrumentation pay a single `is None` check per step.
+    Records are written to the sinks at the end of every `log_every` episodes and
+    when `flush()` is called.
+    """
+
+    def __init__(self,
+                 sinks: Optional[List[MetricsSink]] = None,
+                 timing: bool = True,
+                 window: int = 100,
+                 log_every: int = 1):
+        """
+        Parameterized constructor
+
+        :param sinks: where to write records (e.g., `LoggingSink`, `JsonLinesSink`)
+        :param timing: if True, time every phase of `step()` with `perf_counter()`
+        :param window: number of episodes included in the rolling metrics
+        :param log_every: write an 'episode' record every `log_every` episodes
+        """
+        self.sinks = sinks if sinks is not None else list()
+        self.timing = timing
+        self.window = window
+        self.log_every = log_every
+        self.phase_calls = dict()  # type: Dict[str, int]
+        self.phase_seconds = dict()  # type: Dict[str, float]
+        self.episodes = deque(maxlen=window)
+        self.num_of_episodes = 0
+        self.total_steps = 0
+        self.reward_histogram = np.zeros(REWARD_LEVELS.shape[0], dtype=np.int64)
+        self._reset_episode()
+
+    def _reset_episode(self) -> None:
+        """
+        Clear the accumulators of the current episode
+        """
+        self.episode_steps = 0
+        self.episode_correct_predictions = 0
+        self.episode_reward = 0.
+        self.episode_reward_histogram = np.zeros(REWARD_LEVELS.shape[0], dtype=np.int64)
+        self.episode_start_time = None
+
+    def add_time(self, phase: str, seconds: float, calls: int = 1) -> None:
+        """
+        Add time spent in a phase (e.g., 'observation')
+        """
+        self.phase_calls[phase] = self.phase_calls.get(phase, 0) + calls
+        self.phase_seconds[phase] = self.phase_seconds.get(phase, 0.) + seconds
+
+    def record_step(self, reward: float) -> None:
+        """
+        Add the reward of one step to the current episode
+        """
+        if self.episode_start_time is None:
+            self.episode_start_time = perf_counter()
+        self.episode_steps += 1
+        self.episode_reward += reward
+        if reward > 0.:
+            self.episode_correct_predictions += 1
+        self.episode_reward_histogram[
+            REWARD_LEVELS.shape[0] - 1 -
+            np.searchsorted(_ASCENDING_REWARD_LEVELS, reward)] += 1
+
+    def record_steps(self, rewards: np.ndarray) -> None:
+        """
+        Add the rewards of a batch of steps (e.g., from a vectorized environment)
+        to the totals, without assigning them to an episode
+        """
+        self.total_steps += rewards.shape[0]
+        bins = REWARD_LEVELS.shape[0] - 1 - \
+            np.searchsorted(_ASCENDING_REWARD_LEVELS, rewards)
+        self.reward_histogram += np.bincount(bins, minlength=REWARD_LEVELS.shape[0])
+
+    def end_episode(self, **fields) -> Optional[dict]:
+        """
+        Close the current episode and write its record every `log_every` episodes
+
+        :param fields: extra values to include in the record
+        :return: record of the episode (None if no step was taken)
+        """
+        if self.episode_steps == 0:
+            return None
+        seconds = perf_counter() - self.episode_start_time
+        self.num_of_episodes += 1
+        self.total_steps += self.episode_steps
+        self.reward_histogram += self.episode_reward_histogram
+        record = dict(event='episode',
+                      episode=self.num_of_episodes,
+                      steps=self.episode_steps,
+                      total_correct_predictions=self.episode_correct_predictions,
+                      accuracy=self.episode_correct_predictions / self.episode_steps,
+                      total_reward=self.episode_reward,
+                      mean_reward=self.episode_reward / self.episode_steps,
+                      steps_per_second=self.episode_steps / max(seconds, 1e-9),
+                      reward_histogram=self.episode_reward_histogram.tolist(),
+                      **fields)
+        self.episodes.append(record)
+        self._reset_episode()
+        if self.num_of_episodes % self.log_every == 0:
+            self.write(record)
+        return record
+
+    def get_metrics(self) -> dict:
+        """
+        Get the rolling episode metrics, reward histogram and phase timings
+        """
+        episodes = list(self.episodes)
+
+        def rolling_mean(key: str) -> Optional[float]:
+            return float(np.mean([episode[key] for episode in episodes])) \
+                if episodes else None
+
+        return dict(event='summary',
+                    episodes=self.num_of_episodes,
+                    total_steps=self.total_steps,
+                    rolling_accuracy=rolling_mean('accuracy'),
+                    rolling_mean_reward=rolling_mean('mean_reward'),
+                    rolling_steps_per_second=rolling_mean('steps_per_second'),
+                    reward_histogram=self.reward_histogram.tolist(),
+                    phases=dict([(phase, dict(
+                        calls=self.phase_calls[phase],
+                        seconds=self.phase_seconds[phase],
+                        mean_microseconds=self.phase_seconds[phase] /
+                                          self.phase_calls[phase] * 1e6))
+                        for phase in self.phase_calls]))
+
+    def write(self, record: dict) -> None:
+        """
+        Write a record to every sink
+        """
+        for sink in self.sinks:
+            sink.write(record)
+
+    def log(self, message: str) -> None:
+        """
+        Write a text message to every sink
+        """
+        if self.sinks:
+            self.write(dict(event='message', message=message))
+
+    def flush(self) -> dict:
+        """
+        Write the current metrics (see `get_metrics()`) to every sink
+        """
+        metrics = self.get_metrics()
+        self.write(metrics)
+        return metrics
+
+    def close(self) -> None:
+        """
+        Write the final metrics and close every sink
+        """
+        self.flush()
+        for sink in self.sinks:
+            sink.close()
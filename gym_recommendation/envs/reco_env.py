@@ -1,36 +1,119 @@
-from typing import Dict, List, Tuple, Union
+import copy
+from time import perf_counter
+from typing import Dict, List, Tuple
 
 import numpy as np
 import pandas as pd
 from gym import Env
 from gym import spaces
 
+from gym_recommendation.envs.features import MAX_COMPACT_INDEX, RecoFeatures, get_nbytes, \
+    get_reward
+from gym_recommendation.envs.instrumentation import Instrumentation
+from gym_recommendation.envs.history import UserHistory
+from gym_recommendation.envs.running_stats import RunningStats
+from gym_recommendation.envs.sampling import get_sampler
+
 
 class RecoEnv(Env):
     # Environment static properties
     metadata = {'render.modes': ['human', 'logger']}
     id = 'reco-v0'
     actions = np.eye(5)
+    observation_modes = ('dense', 'compact')
 
     def __init__(self,
-                 data: pd.DataFrame,
-                 item: pd.DataFrame,
-                 user: pd.DataFrame,
-                 seed: int = 1):
+                 data: pd.DataFrame = None,
+                 item: pd.DataFrame = None,
+                 user: pd.DataFrame = None,
+                 seed: int = 1,
+                 precompute: bool = False,
+                 features: RecoFeatures = None,
+                 online_stats: bool = False,
+                 sampling: str = None,
+                 episode_length: int = None,
+                 instrumentation: Instrumentation = None,
+                 observation_mode: str = 'dense',
+                 history_length: int = 0):
         """
         Parameterized constructor
+
+        :param precompute: if True, create the observations for every rating row
+            at construction, which turns `step()` and `reset()` into a row lookup
+        :param features: lookup tables created in advance (e.g., memory-mapped
+            with `RecoFeatures.load()`), which are used instead of `data`,
+            `item` and `user` so the environment shares them without copying
+        :param online_stats: if True, ratings are replayed in timestamp order and the
+            user/movie means are running averages of the ratings seen so far in the
+            episode (instead of averages over the whole data set, which include
+            future ratings). The user rating count, user rating variance and movie
+            rating count are added to the observation (see `RunningStats`)
+        :param sampling: strategy for choosing the rating rows of each episode:
+            'sequential' (file order), 'timestamp' (timestamp order), 'permutation'
+            (new random order every epoch), 'window' (random windows of consecutive
+            rows) or 'user' (one random user's ratings in timestamp order).
+            Defaults to 'timestamp' with `online_stats` or `history_length` and
+            'sequential' otherwise
+            (see `sampling.SAMPLERS`)
+        :param episode_length: maximum number of rating rows per episode
+            (None = all rows)
+        :param instrumentation: collects step timings and episode metrics and
+            writes them to its sinks (None = no metrics and no logging)
+        :param observation_mode: 'dense' (one-hot features) or 'compact' (the two
+            mean ratings followed by integer indices: user_id, item_id, age bucket,
+            occupation id, gender id and genre bitmask; see `COMPACT_COLUMNS`).
+            Compact observations are converted into dense observations in batches
+            with `expand_observations()`
+        :param history_length: if above 0, the user's last `history_length` movies
+            and ratings, a recency-weighted genre profile and the time since the
+            user's last rating are added at the end of the observation. The history
+            is updated as the episode advances (see `UserHistory`)
         """
-        # data for creating features
-        self.data = data
-        self.item = item
-        self.user = user
-        # features derived from data
-        self.movie_genre = self._get_movie_genre(item=self.item)
-        self.user_info = self._get_user_data(user=self.user)
-        self.occupations = self.user.occupation.unique().tolist()
-        self.num_of_occupations = len(self.occupations)
-        self.user_mean = self.data.groupby('user_id').mean().to_dict()['rating']
-        self.movie_mean = self.data.groupby('item_id').mean().to_dict()['rating']
+        if observation_mode not in RecoEnv.observation_modes:
+            raise ValueError(f'Unknown observation_mode {observation_mode}. '
+                             f'Choose one of {RecoEnv.observation_modes}.')
+        self.observation_mode = observation_mode
+        self.compact = observation_mode == 'compact'
+        self.precompute = precompute
+        self.features = features
+        if self.features is None:
+            # id-indexed lookup tables derived from the DataFrames, which are not kept
+            self.features = RecoFeatures.from_dataframes(data=data, item=item, user=user)
+        self.data = self.features.data
+        self.item = None
+        self.user = None
+        self.num_of_occupations = self.features.num_of_occupations
+        # observation table (only when precompute=True or loaded with the features)
+        self.observations = None
+        if self.compact:
+            self.features.check_compact_observations()
+            if self.precompute:
+                self.observations = self.features.get_compact_observation_table()
+        else:
+            if self.features.observations is None and self.precompute:
+                self.features.precompute_observations()
+            self.observations = self.features.observations
+        # running user/movie statistics (only when online_stats=True)
+        self.online_stats = online_stats
+        self.stats = None
+        if self.online_stats:
+            self.stats = RunningStats(num_of_users=int(self.data[:, 0].max()) + 1,
+                                      num_of_movies=int(self.data[:, 1].max()) + 1)
+        # recent ratings of every user (only when history_length > 0)
+        self.history_length = history_length
+        self.history = None
+        if self.history_length > 0:
+            self.history = UserHistory(num_of_users=int(self.data[:, 0].max()) + 1,
+                                       num_of_genres=self._get_genres(movie_id=1).shape[0],
+                                       history_length=self.history_length)
+        self.sampling = sampling or ('timestamp' if self.online_stats or self.history_length
+                                     else 'sequential')
+        self.episode_length = episode_length
+        self.sampler = None
+        # rating rows of the current episode (None = all rows in file order)
+        self.episode_rows = None
+        self._episode_is_new = True
+        self.instrumentation = instrumentation
         # MDP variables
         self.reward = 0.0
         self.done = False
@@ -42,11 +125,15 @@ class RecoEnv(Env):
         self._random_state = np.random.RandomState(seed=self._seed)
         self.max_step = self.data.shape[0] - 2
         self.total_correct_predictions = 0
-        # convert data to numpy for faster training
-        self.data = self.data.values
+        if self.sampling != 'sequential' or self.episode_length is not None:
+            self.sampler = get_sampler(sampling=self.sampling, data=self.data,
+                                       episode_length=self.episode_length)
+            self._sample_episode()
         # other openAI.gym specific variables
         self.action_space = spaces.Discrete(len(RecoEnv.actions))
-        self.observation_space = spaces.Box(low=-1., high=5.0,
+        self.observation_space = spaces.Box(low=-1.,
+                                            high=float(MAX_COMPACT_INDEX) if self.compact
+                                            else 5.0,
                                             shape=self._get_observation(
                                                 step_number=0).shape,
                                             dtype=np.float32)
@@ -55,38 +142,89 @@ class RecoEnv(Env):
         """
         Agent steps through environment
         """
+        if self.instrumentation is not None:
+            return self._step_instrumented(action=action)
+        if self.done:
+            self.observation = self.reset()
+            return self.observation, self.reward, self.done, {}
+        self._take_step(action=action)
+        return self.observation, self.reward, self.done, {}
+
+    def _step_instrumented(self, action: int = 0) -> Tuple[np.ndarray, float, bool, dict]:
+        """
+        Same as `step()`, but timing every phase and recording the reward
+        """
+        instrumentation = self.instrumentation
         if self.done:
+            start_time = perf_counter()
             self.observation = self.reset()
+            if instrumentation.timing:
+                instrumentation.add_time('reset', perf_counter() - start_time)
             return self.observation, self.reward, self.done, {}
+        start_time = perf_counter() if instrumentation.timing else 0.
+        reward_time, observation_time = self._take_step(action=action,
+                                                        timing=instrumentation.timing)
+        instrumentation.record_step(reward=self.reward)
+        if instrumentation.timing:
+            instrumentation.add_time('reward', reward_time - start_time)
+            instrumentation.add_time('observation', observation_time - reward_time)
+            instrumentation.add_time('bookkeeping', perf_counter() - observation_time)
+        return self.observation, self.reward, self.done, {}
+
+    def _take_step(self, action: int, timing: bool = False) -> Tuple[float, float]:
+        """
+        Score the action against the rating of the current step, create its
+        observation and move to the next step (shared by `step()` and
+        `_step_instrumented()`)
+
+        :param timing: if True, read the clock after the reward and the observation
+        :return: times after the reward and after the observation (0. without timing)
+        """
         self.action = action
         self.reward = self._get_reward(action=action, step_number=self.local_step_number)
+        reward_time = perf_counter() if timing else 0.
         self.observation = self._get_observation(step_number=self.local_step_number)
+        observation_time = perf_counter() if timing else 0.
+        if self.stats is not None or self.history is not None:
+            # the rating is only known after the observation is created
+            self._update_running_features(step_number=self.local_step_number)
         if self.reward > 0.:
             self.total_correct_predictions += 1
         if self.local_step_number >= self.max_step:
             self.done = True
         self.local_step_number += 1
-        return self.observation, self.reward, self.done, {}
+        return reward_time, observation_time
 
     def reset(self) -> np.ndarray:
         """
         Reset the environment to an initial state
         """
+        if self.sampler is not None and not self._episode_is_new:
+            self._sample_episode()
+        self._episode_is_new = False
         self.local_step_number = 0
         self.reward = 0.0
         self.done = False
-        print(f"Reco is being reset() --> "
-              f"first step = {self.local_step_number} | "
-              f"Total_correct = {self.total_correct_predictions}")
+        if self.instrumentation is not None:
+            self.instrumentation.end_episode()
         self.total_correct_predictions = 0
+        if self.stats is not None:
+            self.stats.reset()
+        if self.history is not None:
+            self.history.reset()
         return self._get_observation(step_number=self.local_step_number)
 
     def render(self, mode: str = 'human') -> None:
         """
         Render environment
         """
-        if mode == 'logger':
+        if mode != 'logger':
+            return
+        if self.instrumentation is None:
             print(f"Env observation at step {self.local_step_number} is \n{self.observation}")
+        else:
+            self.instrumentation.log(f"Env observation at step {self.local_step_number} "
+                                     f"is {np.array2string(self.observation, threshold=8)}")
 
     def close(self) -> None:
         """
@@ -95,7 +233,9 @@ class RecoEnv(Env):
         self.data = None
         self.user = None
         self.item = None
-        print("RecoGym is being closed.")
+        if self.instrumentation is not None:
+            self.instrumentation.log("RecoGym is being closed.")
+            self.instrumentation.close()
 
     def seed(self, seed: int = 1) -> List[int]:
         """
@@ -105,80 +245,189 @@ class RecoEnv(Env):
         self._seed = seed
         return [seed]
 
+    def get_state(self) -> dict:
+        """
+        Get a snapshot of the environment's position, which can be pickled and
+        restored with `set_state()` (e.g., to resume training mid-episode).
+
+        The snapshot holds the step counters, the random state and the sampler's
+        cursor, but no data or features: the episode's rating rows are located
+        again through the sampler. With `online_stats` or `history_length`, it also
+        holds a copy of the running statistics and user histories.
+        """
+        return dict(local_step_number=self.local_step_number,
+                    total_correct_predictions=self.total_correct_predictions,
+                    done=self.done,
+                    reward=self.reward,
+                    action=self.action,
+                    observation=self.observation,
+                    episode_is_new=self._episode_is_new,
+                    seed=self._seed,
+                    random_state=self._random_state.get_state(),
+                    sampler=None if self.sampler is None else self.sampler.get_state(),
+                    stats=None if self.stats is None else self.stats.get_state(),
+                    history=None if self.history is None else self.history.get_state())
+
+    def set_state(self, state: dict) -> None:
+        """
+        Restore a snapshot returned by `get_state()` of an environment created
+        with the same data and arguments
+        """
+        self.local_step_number = state['local_step_number']
+        self.total_correct_predictions = state['total_correct_predictions']
+        self.done = state['done']
+        self.reward = state['reward']
+        self.action = state['action']
+        self.observation = state['observation']
+        self._episode_is_new = state['episode_is_new']
+        self._seed = state['seed']
+        self._random_state = np.random.RandomState()
+        self._random_state.set_state(state['random_state'])
+        if self.sampler is not None:
+            self.sampler.set_state(state=state['sampler'])
+            self.episode_rows = self.sampler.get_episode()
+            self.max_step = self.episode_rows.shape[0] - 2
+        if self.stats is not None:
+            self.stats.set_state(state=state['stats'])
+        if self.history is not None:
+            self.history.set_state(state=state['history'])
+
+    def clone(self, instrumentation: Instrumentation = None) -> 'RecoEnv':
+        """
+        Create an environment at the same position, which steps independently
+        (e.g., for lookahead or parallel rollouts).
+
+        The data, features and observation tables are shared by reference, so
+        cloning costs a copy of the state in `get_state()` instead of a new
+        environment's construction.
+
+        :param instrumentation: instrumentation of the clone (None = no metrics,
+            so the clone does not write into the sinks of this environment)
+        """
+        env = copy.copy(self)
+        env.instrumentation = instrumentation
+        if self.sampler is not None:
+            env.sampler = copy.copy(self.sampler)
+        if self.stats is not None:
+            env.stats = copy.copy(self.stats)
+        if self.history is not None:
+            env.history = copy.copy(self.history)
+        env.set_state(state=self.get_state())
+        return env
+
+    def get_memory_usage(self, include_shared: bool = True) -> Dict[str, int]:
+        """
+        Report the memory held by the environment, by array.
+
+        :param include_shared: if False, memory-mapped arrays (e.g., features loaded
+            with `RecoFeatures.load()`) are counted as 0 bytes, since every process
+            that maps them shares one copy through the page cache
+        :return: number of bytes by name (e.g., 'features.data', 'stats.user_count'
+            or 'sampler.order') and their 'total'
+        """
+        usage = dict(('features.' + name, nbytes) for name, nbytes in
+                     self.features.get_memory_usage(include_shared=include_shared).items())
+        if self.observations is not None and self.observations is not self.features.observations:
+            usage['observations'] = get_nbytes(self.observations, include_shared=include_shared)
+        for prefix, owner, names in (('stats', self.stats, RunningStats.ARRAYS),
+                                     ('history', self.history, UserHistory.ARRAYS),
+                                     ('sampler', self.sampler, ('order', 'starts', 'ends'))):
+            if owner is None:
+                continue
+            for name in names:
+                if getattr(owner, name, None) is not None:
+                    usage[f'{prefix}.{name}'] = get_nbytes(getattr(owner, name),
+                                                           include_shared=include_shared)
+        usage['total'] = sum(usage.values())
+        return usage
+
     def __str__(self) -> str:
         return f'GymID={RecoEnv.id} | seed={self._seed}'
 
-    @staticmethod
-    def _one_hot(num: int, selection: int) -> np.ndarray:
+    def get_observations(self, rows: np.ndarray) -> np.ndarray:
         """
-        Create one-hot features
+        Get the observations of many rating rows (i.e., indices in `data`) at once.
+
+        Only available without `online_stats` and `history_length`, since running
+        statistics and histories depend on the order in which the ratings are replayed.
         """
-        return np.eye(num, dtype=np.float32)[selection]
+        if self.stats is not None or self.history is not None:
+            raise ValueError('get_observations() is not available with online_stats '
+                             'or history_length.')
+        if self.observations is not None:
+            return self.observations[rows]
+        if self.compact:
+            return self.features.get_compact_observations(rows=rows)
+        return self.features.get_observations(rows=rows)
 
-    @staticmethod
-    def _get_movie_genre(item: pd.DataFrame) -> Dict[int, np.ndarray]:
+    def expand_observations(self, observations: np.ndarray) -> np.ndarray:
         """
-        Extract one-hot of movie genre type from dataset
+        Convert a batch of compact observations into dense observations
+        (e.g., the observations of a rollout buffer)
         """
-        movie_genre = dict([(movie_id, np.empty(19, dtype=np.float32))
-                            for movie_id in item['movie_id'].tolist()])
-        for movie_id in range(1, len(movie_genre)):
-            movie_genre[movie_id] = item.iloc[movie_id, 5:].values.astype(np.float32)
-        return movie_genre
+        return self.features.expand_observations(compact=observations)
 
-    @staticmethod
-    def _get_user_data(user: pd.DataFrame) -> Dict[int, Dict[str, Union[int, str]]]:
+    def get_episode_rows(self) -> np.ndarray:
         """
-        Create dictionary of user stats (e.g., age, occupation, gender)
-        to use as inputs into other functions.
+        Get the rating rows (i.e., indices in `data`) of the current episode
         """
-        tmp_user = user.drop(['zip_code'], axis=1)
-        tmp_user.index = tmp_user.user_id
-        tmp_user = tmp_user.drop(['user_id'], axis=1)
-        return tmp_user.to_dict(orient='index')
+        if self.episode_rows is None:
+            return np.arange(self.data.shape[0])
+        return self.episode_rows
 
-    def _get_movie_genre_buckets(self, movie_id: int = 1) -> np.ndarray:
+    def _sample_episode(self) -> None:
         """
-        Extract one-hot of movie genre type for a specific movie_id
+        Choose the rating rows of the next episode with the seeded random state
         """
-        return self.movie_genre.get(movie_id, np.empty(19, dtype=np.float32))
+        self.episode_rows = self.sampler.sample(random_state=self._random_state)
+        self.max_step = self.episode_rows.shape[0] - 2
 
-    def _get_age_buckets(self, age: int = 10) -> np.ndarray:
+    def _get_row(self, step_number: int) -> int:
         """
-        Extract one-hot of age group for a specific age
+        Get the rating row (i.e., index in `data`) of a step in the episode
         """
-        if age < 10:
-            bucket_number = 0
-        elif age < 20:
-            bucket_number = 1
-        elif age < 30:
-            bucket_number = 2
-        elif age < 40:
-            bucket_number = 3
-        elif age < 50:
-            bucket_number = 4
-        elif age < 60:
-            bucket_number = 5
-        else:
-            bucket_number = 6
-        return self._one_hot(num=7, selection=bucket_number)
+        if self.episode_rows is None:
+            return step_number
+        return self.episode_rows[step_number]
+
+    def _get_observation(self, step_number: int = 0) -> np.ndarray:
+        """
+        Get the observation of a step in the episode
+        """
+        row = self._get_row(step_number=step_number)
+        observation = self._get_row_observation(row=row)
+        if self.stats is not None:
+            running_features = self.stats.get_features(user_id=self.data[row, 0],
+                                                       movie_id=self.data[row, 1])
+            observation = np.concatenate((running_features[:2], observation[2:],
+                                          running_features[2:]))
+        if self.history is not None:
+            history_features = self.history.get_features(user_id=self.data[row, 0],
+                                                         timestamp=self.data[row, 3])
+            observation = np.concatenate((observation, history_features))
+        return observation
 
-    def _get_occupation_buckets(self, job: str = 'none') -> np.ndarray:
+    def _update_running_features(self, step_number: int) -> None:
         """
-        Extract one-hot of occupation type for a specific job
+        Add the rating of a step to the running statistics and user histories
         """
-        selection = self.occupations.index(job)
-        return self._one_hot(num=self.num_of_occupations, selection=selection)
+        row = self._get_row(step_number=step_number)
+        user_id, movie_id, rating, timestamp = self.data[row]
+        if self.stats is not None:
+            self.stats.update(user_id=user_id, movie_id=movie_id, rating=rating)
+        if self.history is not None:
+            self.history.update(user_id=user_id, movie_id=movie_id, rating=rating,
+                                timestamp=timestamp, genres=self._get_genres(movie_id=movie_id))
 
-    def _get_gender_buckets(self, gender: str = 'm') -> np.ndarray:
+    def _get_genres(self, movie_id: int) -> np.ndarray:
         """
-        Extract one-hot of gender type for a specific gender (e.g., M or F)
+        Genre flags of a movie
         """
-        sex = gender.upper()
-        sex_id = 0 if sex == 'M' else 1
-        return self._one_hot(num=2, selection=sex_id)
+        movie_genre = self.features.movie_genre
+        return movie_genre[movie_id] if movie_id < movie_genre.shape[0] \
+            else np.zeros(movie_genre.shape[1], dtype=movie_genre.dtype)
 
-    def _get_observation(self, step_number: int = 0) -> np.ndarray:
+    def _get_row_observation(self, row: int = 0) -> np.ndarray:
         """
         Get features and concatenate them into one observation
 
@@ -196,35 +445,16 @@ class RecoEnv(Env):
           gender_bucket:
             One-hot of the user's gender (only M or F)
         """
-        # lookup keys
-        user_id = self.data[step_number, 0]
-        movie_id = self.data[step_number, 1]
-        # values for one_hot
-        user_age = self.user_info[user_id]['age']
-        user_occupation = self.user_info[user_id]['occupation']
-        user_gender = self.user_info[user_id]['gender']
-        # features
-        user_mean = np.array([self.user_mean.get(user_id, 3.) / 5.], dtype=np.float32)
-        movie_mean = np.array([self.movie_mean.get(movie_id, 3.) / 5.], dtype=np.float32)
-        movie_genre_bucket = self._get_movie_genre_buckets(movie_id=movie_id)
-        age_bucket = self._get_age_buckets(age=user_age)
-        occupation_bucket = self._get_occupation_buckets(job=user_occupation)
-        gender_bucket = self._get_gender_buckets(gender=user_gender)
-        # concatenate it all together
-        return np.concatenate((user_mean, movie_mean, movie_genre_bucket,
-                               age_bucket, occupation_bucket, gender_bucket))
+        if self.observations is not None:
+            return self.observations[row]
+        if self.compact:
+            return self.features.get_compact_observations(rows=np.array([row]))[0]
+        return self.features.get_observation(user_id=self.data[row, 0],
+                                             movie_id=self.data[row, 1])
 
     def _get_reward(self, action: int, step_number: int) -> float:
         """
         Calculate reward for a given state and action
         """
-        users_rating = int(self.data[step_number, 2])
-        predicted_rating = int(action) + 1  # to compensate for zero-index
-        prediction_difference = abs(predicted_rating - users_rating)
-        reward = 0.
-        if prediction_difference == 0:
-            reward += 1.
-        else:
-            # Use addition since log loss is negative
-            reward += np.log(1. - prediction_difference / 5)
-        return reward
+        return get_reward(action=action,
+                          rating=self.data[self._get_row(step_number=step_number), 2])
@@ -0,0 +1,292 @@
+from time import perf_counter
+from typing import Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from gym import spaces
+
+from gym_recommendation.envs.features import MAX_COMPACT_INDEX, REWARD_TABLE, \
+    RecoFeatures
+from gym_recommendation.envs.instrumentation import Instrumentation
+from gym_recommendation.envs.reco_env import RecoEnv
+
+try:
+    from stable_baselines.common.vec_env import VecEnv
+except ImportError:  # stable_baselines is only required for training agents
+    VecEnv = object
+
+
+class RecoVecEnv(VecEnv):
+    """
+    Vectorized version of RecoEnv that steps `num_envs` independent cursors over
+    one shared data set, computing all observations, rewards and dones in a
+    single batched call.
+
+    Each slot behaves like a RecoEnv wrapped in stable_baselines' `SubprocVecEnv`:
+    an episode runs from the first to the last rating row, and a slot is reset
+    automatically when its episode ends (the final observation is returned in
+    `info['terminal_observation']`).
+    """
+    metadata = RecoEnv.metadata
+    id = 'reco-vec-v0'
+    actions = RecoEnv.actions
+    # per-slot versions of the methods that can be called with `env_method()`
+    slot_methods = dict(reset='reset_slots')
+
+    def __init__(self,
+                 data: pd.DataFrame = None,
+                 item: pd.DataFrame = None,
+                 user: pd.DataFrame = None,
+                 num_envs: int = 1,
+                 seed: int = 1,
+                 precompute: bool = True,
+                 stagger: bool = True,
+                 features: RecoFeatures = None,
+                 instrumentation: Instrumentation = None,
+                 observation_mode: str = 'dense'):
+        """
+        Parameterized constructor
+
+        :param num_envs: number of independent cursors (i.e., environments)
+        :param precompute: if True, create the observation for every rating row
+            at construction (see `RecoEnv`)
+        :param stagger: if True, the first episode of every slot starts at an
+            evenly spaced row, so slots do not produce identical observations
+        :param features: lookup tables created in advance (see `RecoEnv`)
+        :param instrumentation: collects the time of every batched step and the
+            reward histogram of all slots (see `RecoEnv`)
+        :param observation_mode: 'dense' or 'compact' observations (see `RecoEnv`)
+        """
+        if observation_mode not in RecoEnv.observation_modes:
+            raise ValueError(f'Unknown observation_mode {observation_mode}. '
+                             f'Choose one of {RecoEnv.observation_modes}.')
+        self.observation_mode = observation_mode
+        self.compact = observation_mode == 'compact'
+        self.features = features
+        if self.features is None:
+            self.features = RecoFeatures.from_dataframes(data=data, item=item, user=user)
+        if self.compact:
+            self.features.check_compact_observations()
+            self.observations = self.features.get_compact_observation_table() \
+                if precompute else None
+        else:
+            if self.features.observations is None and precompute:
+                self.features.precompute_observations()
+            self.observations = self.features.observations
+        self.data = self.features.data
+        self.num_envs = num_envs
+        self.max_step = self.data.shape[0] - 2
+        self.stagger = stagger
+        self.instrumentation = instrumentation
+        # cursor variables (one per slot)
+        self.local_step_number = np.zeros(num_envs, dtype=np.int64)
+        self.total_correct_predictions = np.zeros(num_envs, dtype=np.int64)
+        self.episode_number = np.zeros(num_envs, dtype=np.int64)
+        self._actions = np.zeros(num_envs, dtype=np.int64)
+        # other environment variables
+        self._seed = seed
+        self._random_state = np.random.RandomState(seed=self._seed)
+        # other openAI.gym specific variables
+        self.action_space = spaces.Discrete(len(RecoVecEnv.actions))
+        self.observation_space = spaces.Box(low=-1.,
+                                            high=float(MAX_COMPACT_INDEX) if self.compact
+                                            else 5.0,
+                                            shape=self._get_observations(
+                                                rows=np.zeros(1, dtype=np.int64)).shape[1:],
+                                            dtype=np.float32)
+
+    def reset(self) -> np.ndarray:
+        """
+        Reset all slots to an initial state
+        """
+        self.episode_number[:] = 0
+        return self.reset_slots(slots=np.arange(self.num_envs))
+
+    def reset_slots(self, slots: np.ndarray) -> np.ndarray:
+        """
+        Reset a subset of slots to an initial state (e.g., when a remote actor
+        starts a new episode, see `server.EnvServer`)
+
+        Like the automatic reset in `step_slots()`, episodes start at the first row,
+        except the first episode of a slot (i.e., `episode_number` 0) when `stagger`.
+
+        :param slots: index of the slots to reset
+        :return: observations for each slot in `slots`
+        """
+        slots = np.asarray(slots, dtype=np.int64)
+        if self.stagger:
+            self.local_step_number[slots] = np.where(
+                self.episode_number[slots] == 0,
+                slots * (self.max_step // max(self.num_envs, 1)), 0)
+        else:
+            self.local_step_number[slots] = 0
+        self.total_correct_predictions[slots] = 0
+        return self._get_observations(rows=self.local_step_number[slots])
+
+    def step_async(self, actions: np.ndarray) -> None:
+        """
+        Store the actions to use in the next `step_wait()`
+        """
+        self._actions = np.asarray(actions, dtype=np.int64).reshape(self.num_envs)
+
+    def step_wait(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, List[dict]]:
+        """
+        Step every slot through the data set with the last actions
+        """
+        return self.step_slots(slots=np.arange(self.num_envs), actions=self._actions)
+
+    def step(self, actions: np.ndarray) -> Tuple[np.ndarray, np.ndarray,
+                                                 np.ndarray, List[dict]]:
+        """
+        Agent steps through all slots of the environment
+        """
+        self.step_async(actions)
+        return self.step_wait()
+
+    def step_slots(self, slots: np.ndarray,
+                   actions: np.ndarray) -> Tuple[np.ndarray, np.ndarray,
+                                                 np.ndarray, List[dict]]:
+        """
+        Step a subset of slots with one batched observation and reward lookup.
+
+        :param slots: index of the slots to step
+        :param actions: action for each slot in `slots`
+        :return: (observations, rewards, dones, infos) for each slot in `slots`
+        """
+        instrumentation = self.instrumentation
+        timing = instrumentation is not None and instrumentation.timing
+        start_time = perf_counter() if timing else 0.
+        rows = self.local_step_number[slots]
+        rewards = REWARD_TABLE[actions, self.data[rows, 2] - 1]
+        reward_time = perf_counter() if timing else 0.
+        observations = self._get_observations(rows=rows)
+        observation_time = perf_counter() if timing else 0.
+        self.total_correct_predictions[slots] += rewards > 0.
+        dones = rows >= self.max_step
+        infos = [{} for _ in range(len(slots))]
+        self.local_step_number[slots] = rows + 1
+        if dones.any():
+            done_slots = slots[dones]
+            for index in np.flatnonzero(dones):
+                infos[index]['terminal_observation'] = observations[index].copy()
+                infos[index]['total_correct_predictions'] = \
+                    int(self.total_correct_predictions[slots[index]])
+            self.local_step_number[done_slots] = 0
+            self.total_correct_predictions[done_slots] = 0
+            self.episode_number[done_slots] += 1
+            observations[dones] = self._get_observations(
+                rows=self.local_step_number[done_slots])
+        if instrumentation is not None:
+            instrumentation.record_steps(rewards=rewards)
+            if timing:
+                calls = len(slots)
+                instrumentation.add_time('reward', reward_time - start_time, calls=calls)
+                instrumentation.add_time('observation', observation_time - reward_time,
+                                         calls=calls)
+                instrumentation.add_time('bookkeeping', perf_counter() - observation_time,
+                                         calls=calls)
+        return observations, rewards, dones, infos
+
+    def expand_observations(self, observations: np.ndarray) -> np.ndarray:
+        """
+        Convert a batch of compact observations into dense observations
+        """
+        return self.features.expand_observations(compact=observations)
+
+    def close(self) -> None:
+        """
+        Clear resources when shutting down environment
+        """
+        self.features = None
+        self.observations = None
+        self.data = None
+        if self.instrumentation is not None:
+            self.instrumentation.close()
+
+    def seed(self, seed: Optional[int] = None) -> List[int]:
+        """
+        Set random seed
+        """
+        self._random_state = np.random.RandomState(seed=seed)
+        self._seed = seed
+        return [seed] * self.num_envs
+
+    def render(self, mode: str = 'human', *args, **kwargs) -> None:
+        """
+        Render environment
+        """
+        if mode == 'logger' and self.instrumentation is not None:
+            self.instrumentation.log(f"Env step numbers are "
+                                     f"{np.array2string(self.local_step_number, threshold=8)}")
+
+    def get_images(self) -> Sequence[np.ndarray]:
+        """
+        RecoVecEnv does not produce images
+        """
+        raise NotImplementedError('RecoVecEnv does not support rendering images.')
+
+    def get_attr(self, attr_name: str, indices: Optional[Sequence[int]] = None) -> List[Any]:
+        """
+        Return an attribute for each slot (per-slot arrays are indexed by slot)
+        """
+        value = getattr(self, attr_name)
+        return [value[i] if self._is_per_slot(value) else value
+                for i in self._get_indices(indices)]
+
+    def set_attr(self, attr_name: str, value: Any,
+                 indices: Optional[Sequence[int]] = None) -> None:
+        """
+        Set an attribute for each slot (per-slot arrays are indexed by slot)
+        """
+        current = getattr(self, attr_name)
+        if self._is_per_slot(current):
+            current[self._get_indices(indices)] = value
+        else:
+            setattr(self, attr_name, value)
+
+    def env_method(self, method_name: str, *method_args,
+                   indices: Optional[Sequence[int]] = None, **method_kwargs) -> List[Any]:
+        """
+        Call a method for a subset of slots through its per-slot version (see
+        `slot_methods`), e.g., `env_method('reset', indices=[0, 2])` calls
+        `reset_slots(slots=[0, 2])`
+
+        :return: the result of the method for each slot
+        :raises NotImplementedError: for methods without a per-slot version
+        """
+        if method_name not in RecoVecEnv.slot_methods:
+            raise NotImplementedError(f'RecoVecEnv.env_method() is not available for '
+                                      f'{method_name}. Choose one of '
+                                      f'{sorted(RecoVecEnv.slot_methods)}.')
+        method = getattr(self, RecoVecEnv.slot_methods[method_name])
+        slots = np.asarray(self._get_indices(indices), dtype=np.int64)
+        return list(method(slots, *method_args, **method_kwargs))
+
+    def __str__(self) -> str:
+        return f'GymID={RecoVecEnv.id} | num_envs={self.num_envs} | seed={self._seed}'
+
+    def _get_indices(self, indices: Optional[Sequence[int]]) -> List[int]:
+        """
+        Convert the `indices` argument of VecEnv methods into a list of slots
+        """
+        if indices is None:
+            return list(range(self.num_envs))
+        if isinstance(indices, int):
+            return [indices]
+        return list(indices)
+
+    def _is_per_slot(self, value: Any) -> bool:
+        """
+        Check if an attribute holds one value per slot
+        """
+        return isinstance(value, np.ndarray) and value.shape[:1] == (self.num_envs,)
+
+    def _get_observations(self, rows: np.ndarray) -> np.ndarray:
+        """
+        Get the observations for a batch of rating rows
+        """
+        if self.observations is not None:
+            return self.observations[rows]
+        if self.compact:
+            return self.features.get_compact_observations(rows=rows)
+        return self.features.get_observations(rows=rows)
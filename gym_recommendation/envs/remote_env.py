@@ -0,0 +1,181 @@
+import socket
+import struct
+from typing import List, Tuple, Union
+
+import numpy as np
+from gym import Env
+from gym import spaces
+
+from gym_recommendation.envs.instrumentation import Instrumentation
+
+# Binary protocol between `server.EnvServer` and `RemoteEnv` (little-endian, fixed size):
+#   hello (server -> client, once): slot, observation size, number of actions,
+#     observation low and high
+#   request (client -> server): opcode and action
+#   response (server -> client): status, done, reward and the float32 observation
+HELLO = struct.Struct('<iIIff')
+REQUEST = struct.Struct('<Bi')
+RESPONSE = struct.Struct('<BBd')
+OP_RESET = 0
+OP_STEP = 1
+OP_CLOSE = 2
+STATUS_OK = 0
+STATUS_ERROR = 1
+# Slot sent in the hello when every slot of the server is taken
+NO_SLOT = -1
+
+
+def get_response_size(observation_size: int) -> int:
+    """
+    Number of bytes of a response holding an observation of `observation_size` values
+    """
+    return RESPONSE.size + 4 * observation_size
+
+
+class RemoteEnv(Env):
+    """
+    Client of an `EnvServer`, which steps one slot of the server's shared data set.
+
+    It implements the gym `Env` interface of `RecoEnv` (e.g.,
+    `gym.make(RemoteEnv.id, address=('127.0.0.1', 5000))`), so actors do not
+    load the data set themselves. Every call is one request and response over a
+    TCP or Unix socket.
+    """
+    # Environment static properties
+    metadata = {'render.modes': ['human', 'logger']}
+    id = 'reco-remote-v0'
+
+    def __init__(self, address: Union[Tuple[str, int], str] = ('127.0.0.1', 5000),
+                 timeout: float = None, seed: int = 1,
+                 instrumentation: Instrumentation = None):
+        """
+        Parameterized constructor
+
+        :param address: (host, port) of a TCP server or path of a Unix socket
+        :param timeout: seconds to wait for the server (None = wait forever)
+        :param instrumentation: collects the episode metrics of this actor and
+            receives the output of `render()` (see `RecoEnv`)
+        """
+        self.address = address
+        if isinstance(address, str):
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.socket.settimeout(timeout)
+            self.socket.connect(address)
+        else:
+            self.socket = socket.create_connection(tuple(address), timeout=timeout)
+            self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        slot, observation_size, num_of_actions, low, high = HELLO.unpack(
+            self._receive(HELLO.size))
+        if slot == NO_SLOT:
+            self.socket.close()
+            raise ConnectionError(f'Every slot of the server at {address} is taken.')
+        self.slot = slot
+        self._response = bytearray(get_response_size(observation_size))
+        # MDP variables
+        self.reward = 0.0
+        self.done = False
+        self.observation = None
+        self.action = 0
+        # other environment variables
+        self.local_step_number = 0
+        self._seed = seed
+        self.instrumentation = instrumentation
+        # other openAI.gym specific variables
+        self.action_space = spaces.Discrete(num_of_actions)
+        self.observation_space = spaces.Box(low=low, high=high, shape=(observation_size,),
+                                            dtype=np.float32)
+
+    def step(self, action: int = 0) -> Tuple[np.ndarray, float, bool, dict]:
+        """
+        Agent steps through environment
+        """
+        if self.done:
+            self.observation = self.reset()
+            return self.observation, self.reward, self.done, {}
+        self.action = action
+        self.observation, self.reward, self.done = self._request(opcode=OP_STEP,
+                                                                 action=int(action))
+        self.local_step_number += 1
+        if self.instrumentation is not None:
+            self.instrumentation.record_step(reward=self.reward)
+        return self.observation, self.reward, self.done, {}
+
+    def reset(self) -> np.ndarray:
+        """
+        Reset the environment to an initial state
+        """
+        self.observation, _, _ = self._request(opcode=OP_RESET)
+        self.local_step_number = 0
+        self.reward = 0.0
+        self.done = False
+        if self.instrumentation is not None:
+            self.instrumentation.end_episode()
+        return self.observation
+
+    def render(self, mode: str = 'human') -> None:
+        """
+        Render environment
+        """
+        if mode != 'logger':
+            return
+        if self.instrumentation is None:
+            print(f"Env observation at step {self.local_step_number} is \n{self.observation}")
+        else:
+            self.instrumentation.log(f"Env observation at step {self.local_step_number} "
+                                     f"is {np.array2string(self.observation, threshold=8)}")
+
+    def close(self) -> None:
+        """
+        Release the server's slot and close the connection
+        """
+        if self.socket.fileno() < 0:
+            return
+        try:
+            self.socket.sendall(REQUEST.pack(OP_CLOSE, 0))
+        except OSError:
+            pass
+        self.socket.close()
+
+    def seed(self, seed: int = 1) -> List[int]:
+        """
+        Set random seed (the server's data set is stepped in a fixed order)
+        """
+        self._seed = seed
+        return [seed]
+
+    def __str__(self) -> str:
+        return f'GymID={RemoteEnv.id} | address={self.address} | slot={self.slot}'
+
+    def _request(self, opcode: int, action: int = 0) -> Tuple[np.ndarray, float, bool]:
+        """
+        Send one request and wait for its response
+
+        :return: (observation, reward, done)
+        """
+        self.socket.sendall(REQUEST.pack(opcode, action))
+        view = memoryview(self._response)
+        position = 0
+        while position < len(view):
+            num_of_bytes = self.socket.recv_into(view[position:])
+            if num_of_bytes == 0:
+                raise ConnectionError(f'The server at {self.address} closed the connection.')
+            position += num_of_bytes
+        status, done, reward = RESPONSE.unpack_from(self._response)
+        if status != STATUS_OK:
+            raise ValueError(f'The server at {self.address} rejected the request.')
+        observation = np.frombuffer(self._response, dtype=np.float32,
+                                    offset=RESPONSE.size).copy()
+        return observation, reward, bool(done)
+
+    def _receive(self, num_of_bytes: int) -> bytes:
+        """
+        Read exactly `num_of_bytes` from the server
+        """
+        chunks = []
+        while num_of_bytes > 0:
+            chunk = self.socket.recv(num_of_bytes)
+            if not chunk:
+                raise ConnectionError(f'The server at {self.address} closed the connection.')
+            chunks.append(chunk)
+            num_of_bytes -= len(chunk)
+        return b''.join(chunks)
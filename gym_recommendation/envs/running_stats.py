@@ -0,0 +1,127 @@
+import numpy as np
+
+from gym_recommendation.envs.features import DEFAULT_MEAN_RATING
+
+# Number of features created by `RunningStats.get_features()`
+NUM_OF_RUNNING_FEATURES = 5
+
+
+class RunningStats(object):
+    """
+    Per-user and per-movie rating statistics that are updated one rating at a time.
+
+    Counts, sums and sums of squares are kept in arrays indexed by user_id and
+    movie_id, so every update and lookup is O(1). When the ratings are replayed in
+    timestamp order, the statistics of a rating row only include earlier ratings,
+    which avoids leaking future ratings into the features.
+    """
+    # Statistics tables, indexed by user_id or movie_id
+    ARRAYS = ('user_count', 'user_sum', 'user_sum_of_squares', 'movie_count', 'movie_sum')
+
+    def __init__(self, num_of_users: int, num_of_movies: int):
+        """
+        Parameterized constructor
+
+        :param num_of_users: size of the user tables (i.e., max user_id + 1)
+        :param num_of_movies: size of the movie tables (i.e., max movie_id + 1)
+        """
+        self.user_count = np.zeros(num_of_users, dtype=np.int64)
+        self.user_sum = np.zeros(num_of_users, dtype=np.float64)
+        self.user_sum_of_squares = np.zeros(num_of_users, dtype=np.float64)
+        self.movie_count = np.zeros(num_of_movies, dtype=np.int64)
+        self.movie_sum = np.zeros(num_of_movies, dtype=np.float64)
+
+    def reset(self) -> None:
+        """
+        Forget all ratings
+        """
+        for name in RunningStats.ARRAYS:
+            getattr(self, name).fill(0)
+
+    def get_state(self) -> dict:
+        """
+        Get a copy of the statistics (see `set_state()`)
+        """
+        return dict((name, getattr(self, name).copy()) for name in RunningStats.ARRAYS)
+
+    def set_state(self, state: dict) -> None:
+        """
+        Restore statistics returned by `get_state()`
+        """
+        for name in RunningStats.ARRAYS:
+            setattr(self, name, state[name].copy())
+
+    def grow(self, num_of_users: int, num_of_movies: int) -> None:
+        """
+        Extend the tables to hold new user_ids and movie_ids (e.g., when ratings
+        are added to the data set), keeping the statistics collected so far
+        """
+        def pad(array: np.ndarray, size: int) -> np.ndarray:
+            return np.pad(array, (0, max(size - array.shape[0], 0)), mode='constant')
+
+        self.user_count = pad(self.user_count, num_of_users)
+        self.user_sum = pad(self.user_sum, num_of_users)
+        self.user_sum_of_squares = pad(self.user_sum_of_squares, num_of_users)
+        self.movie_count = pad(self.movie_count, num_of_movies)
+        self.movie_sum = pad(self.movie_sum, num_of_movies)
+
+    def update(self, user_id: int, movie_id: int, rating: float) -> None:
+        """
+        Add one rating to the statistics
+        """
+        self.user_count[user_id] += 1
+        self.user_sum[user_id] += rating
+        self.user_sum_of_squares[user_id] += rating * rating
+        self.movie_count[movie_id] += 1
+        self.movie_sum[movie_id] += rating
+
+    def update_batch(self, user_ids: np.ndarray, movie_ids: np.ndarray,
+                     ratings: np.ndarray) -> None:
+        """
+        Add many ratings to the statistics at once
+        """
+        self.grow(num_of_users=int(user_ids.max()) + 1,
+                  num_of_movies=int(movie_ids.max()) + 1)
+        ratings = ratings.astype(np.float64)
+        num_of_users = self.user_count.shape[0]
+        num_of_movies = self.movie_count.shape[0]
+        self.user_count += np.bincount(user_ids, minlength=num_of_users)
+        self.user_sum += np.bincount(user_ids, weights=ratings, minlength=num_of_users)
+        self.user_sum_of_squares += np.bincount(user_ids, weights=ratings * ratings,
+                                                minlength=num_of_users)
+        self.movie_count += np.bincount(movie_ids, minlength=num_of_movies)
+        self.movie_sum += np.bincount(movie_ids, weights=ratings, minlength=num_of_movies)
+
+    def get_features(self, user_id: int, movie_id: int) -> np.ndarray:
+        """
+        Get the running features of a (user, movie) pair
+
+        Features=
+          user_mean:
+            Average rating given by the user so far (divided by 5)
+          movie_mean:
+            Average rating of the movie so far (divided by 5)
+          user_count:
+            Log of the number of ratings given by the user so far (divided by 10)
+          user_variance:
+            Variance of the ratings given by the user so far (divided by 4,
+            the largest possible variance of 1-5 ratings)
+          movie_count:
+            Log of the number of ratings of the movie so far (divided by 10)
+        """
+        user_count = self.user_count[user_id]
+        movie_count = self.movie_count[movie_id]
+        user_mean = DEFAULT_MEAN_RATING
+        user_variance = 0.
+        if user_count > 0:
+            user_mean = self.user_sum[user_id] / user_count
+            user_variance = max(self.user_sum_of_squares[user_id] / user_count -
+                                user_mean * user_mean, 0.)
+        movie_mean = DEFAULT_MEAN_RATING
+        if movie_count > 0:
+            movie_mean = self.movie_sum[movie_id] / movie_count
+        return np.array([user_mean / 5.,
+                         movie_mean / 5.,
+                         np.log1p(user_count) / 10.,
+                         user_variance / 4.,
+                         np.log1p(movie_count) / 10.], dtype=np.float32)
@@ -0,0 +1,227 @@
+from typing import Dict, Optional, Type
+
+import numpy as np
+
+
+def get_index_dtype(size: int) -> type:
+    """
+    Smallest integer type that can index an array of `size` rows
+    """
+    return np.int32 if size < np.iinfo(np.int32).max else np.int64
+
+
+class EpisodeSampler(object):
+    """
+    Base class for choosing the rating rows of an episode.
+
+    Samplers return index arrays into the environment's `data` array (never
+    reordered copies of the data), and every episode is a view into an index
+    array built once, so memory stays constant no matter how many episodes
+    are sampled. All randomness comes from the environment's random state,
+    which keeps seeded runs reproducible.
+    """
+    name = None
+
+    def __init__(self, data: np.ndarray, episode_length: Optional[int] = None):
+        """
+        Parameterized constructor
+
+        :param data: rating rows of the environment (user_id, item_id, rating, timestamp)
+        :param episode_length: number of rating rows per episode (None = all rows)
+        """
+        self.num_of_rows = data.shape[0]
+        self.episode_length = min(episode_length or self.num_of_rows, self.num_of_rows)
+        if self.episode_length < 2:
+            raise ValueError(f'episode_length must be at least 2, got {episode_length}.')
+        # rows of every episode (set by subclasses) and the bounds of the last episode
+        self.order = None
+        self.episode_start = 0
+        self.episode_end = 0
+
+    def sample(self, random_state: np.random.RandomState) -> np.ndarray:
+        """
+        Get the rating rows of the next episode
+        """
+        raise NotImplementedError
+
+    def get_episode(self) -> np.ndarray:
+        """
+        Get the rating rows of the last episode returned by `sample()`
+        """
+        return self.order[self.episode_start:self.episode_end]
+
+    def get_state(self) -> dict:
+        """
+        Get the cursor of the sampler (see `set_state()`)
+        """
+        return dict(episode_start=self.episode_start, episode_end=self.episode_end)
+
+    def set_state(self, state: dict) -> None:
+        """
+        Restore a cursor returned by `get_state()`
+        """
+        self.episode_start = state['episode_start']
+        self.episode_end = state['episode_end']
+
+
+class OrderedSampler(EpisodeSampler):
+    """
+    Replays the rating rows in a fixed order, split into consecutive episodes
+    of `episode_length` rows (starting over after the last episode)
+    """
+
+    def __init__(self, data: np.ndarray, episode_length: Optional[int] = None):
+        super(OrderedSampler, self).__init__(data=data, episode_length=episode_length)
+        self.order = self._get_order(data=data)
+        self.position = 0
+
+    def _get_order(self, data: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def _next_epoch(self, random_state: np.random.RandomState) -> None:
+        """
+        Called when every row of `order` has been replayed
+        """
+        pass
+
+    def sample(self, random_state: np.random.RandomState) -> np.ndarray:
+        if self.order is None or self.position + self.episode_length > self.num_of_rows:
+            self.position = 0
+            self._next_epoch(random_state=random_state)
+        self.episode_start = self.position
+        self.episode_end = self.position + self.episode_length
+        self.position += self.episode_length
+        return self.get_episode()
+
+    def get_state(self) -> dict:
+        state = super(OrderedSampler, self).get_state()
+        state['position'] = self.position
+        return state
+
+    def set_state(self, state: dict) -> None:
+        super(OrderedSampler, self).set_state(state=state)
+        self.position = state['position']
+
+
+class SequentialSampler(OrderedSampler):
+    """
+    Rating rows in file order (the default RecoEnv episodes)
+    """
+    name = 'sequential'
+
+    def _get_order(self, data: np.ndarray) -> np.ndarray:
+        return np.arange(self.num_of_rows, dtype=get_index_dtype(self.num_of_rows))
+
+
+class TimestampSampler(OrderedSampler):
+    """
+    Rating rows replayed in timestamp order
+    """
+    name = 'timestamp'
+
+    def _get_order(self, data: np.ndarray) -> np.ndarray:
+        return np.argsort(data[:, 3], kind='stable') \
+            .astype(get_index_dtype(self.num_of_rows))
+
+
+class PermutationSampler(OrderedSampler):
+    """
+    Rating rows in a new random order for every epoch (i.e., pass over all rows).
+
+    Every epoch's order is a permutation created from a seed drawn from the
+    environment's random state, so the state of the sampler is that seed and the
+    cursor, and restoring it only recreates the permutation of another epoch.
+    """
+    name = 'permutation'
+
+    def __init__(self, data: np.ndarray, episode_length: Optional[int] = None):
+        super(PermutationSampler, self).__init__(data=data, episode_length=episode_length)
+        self.epoch_seed = None
+
+    def _get_order(self, data: np.ndarray) -> Optional[np.ndarray]:
+        # created on the first `sample()` call with the environment's random state
+        return None
+
+    def _next_epoch(self, random_state: np.random.RandomState) -> None:
+        self.epoch_seed = int(random_state.randint(np.iinfo(np.int32).max))
+        self.order = self._get_permutation(epoch_seed=self.epoch_seed)
+
+    def _get_permutation(self, epoch_seed: int) -> np.ndarray:
+        # a new array for every epoch, so clones can share the order of an epoch
+        return np.random.RandomState(seed=epoch_seed).permutation(self.num_of_rows) \
+            .astype(get_index_dtype(self.num_of_rows))
+
+    def get_state(self) -> dict:
+        state = super(PermutationSampler, self).get_state()
+        state['epoch_seed'] = self.epoch_seed
+        return state
+
+    def set_state(self, state: dict) -> None:
+        super(PermutationSampler, self).set_state(state=state)
+        if state['epoch_seed'] != self.epoch_seed:
+            self.epoch_seed = state['epoch_seed']
+            self.order = None if self.epoch_seed is None \
+                else self._get_permutation(epoch_seed=self.epoch_seed)
+
+
+class WindowSampler(EpisodeSampler):
+    """
+    Random windows of `episode_length` consecutive rating rows (in file order)
+    """
+    name = 'window'
+
+    def __init__(self, data: np.ndarray, episode_length: Optional[int] = None):
+        super(WindowSampler, self).__init__(data=data, episode_length=episode_length)
+        self.order = np.arange(self.num_of_rows, dtype=get_index_dtype(self.num_of_rows))
+
+    def sample(self, random_state: np.random.RandomState) -> np.ndarray:
+        self.episode_start = int(random_state.randint(self.num_of_rows -
+                                                      self.episode_length + 1))
+        self.episode_end = self.episode_start + self.episode_length
+        return self.get_episode()
+
+
+class UserSampler(EpisodeSampler):
+    """
+    All ratings of one random user in timestamp order (at most `episode_length`
+    rows, starting with the user's first rating). Users with a single rating
+    are never sampled.
+    """
+    name = 'user'
+
+    def __init__(self, data: np.ndarray, episode_length: Optional[int] = None):
+        super(UserSampler, self).__init__(data=data, episode_length=episode_length)
+        # rows grouped by user (CSR style), ordered by timestamp within a user
+        self.order = np.lexsort((data[:, 3], data[:, 0])) \
+            .astype(get_index_dtype(self.num_of_rows))
+        user_ids = data[self.order, 0]
+        starts = np.flatnonzero(np.r_[True, user_ids[1:] != user_ids[:-1]])
+        ends = np.r_[starts[1:], self.num_of_rows]
+        eligible = ends - starts >= 2
+        self.starts = starts[eligible]
+        self.ends = ends[eligible]
+        if self.starts.shape[0] == 0:
+            raise ValueError('UserSampler needs at least one user with 2 ratings.')
+
+    def sample(self, random_state: np.random.RandomState) -> np.ndarray:
+        user = random_state.randint(self.starts.shape[0])
+        self.episode_start = int(self.starts[user])
+        self.episode_end = min(int(self.ends[user]), self.episode_start + self.episode_length)
+        return self.get_episode()
+
+
+# Samplers by name (i.e., the `sampling` argument of RecoEnv)
+SAMPLERS = dict([(sampler.name, sampler) for sampler in (
+    SequentialSampler, TimestampSampler, PermutationSampler, WindowSampler, UserSampler)]
+)  # type: Dict[str, Type[EpisodeSampler]]
+
+
+def get_sampler(sampling: str, data: np.ndarray,
+                episode_length: Optional[int] = None) -> EpisodeSampler:
+    """
+    Create an episode sampler by name (see `SAMPLERS`)
+    """
+    if sampling not in SAMPLERS:
+        raise ValueError(f'Unknown sampling strategy {sampling}. '
+                         f'Choose one of {sorted(SAMPLERS.keys())}.')
+    return SAMPLERS[sampling](data=data, episode_length=episode_length)
@@ -0,0 +1,472 @@
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+from gym import Env
+from gym import spaces
+
+from gym_recommendation.envs.features import MAX_COMPACT_INDEX, RecoFeatures
+from gym_recommendation.envs.instrumentation import Instrumentation
+from gym_recommendation.envs.reco_env import RecoEnv
+
+
+def get_user_item_index(data: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Create a CSR index of the movies rated by every user.
+
+    The movies of `user_id` are `item_ids[indptr[user_id]:indptr[user_id + 1]]`
+    (sorted by movie_id) with their ratings in the same positions of `ratings`.
+
+    :param data: rating rows (user_id, item_id, rating, timestamp)
+    :return: (indptr, item_ids, ratings)
+    """
+    order = np.lexsort((data[:, 1], data[:, 0]))
+    user_ids = data[order, 0]
+    counts = np.bincount(user_ids, minlength=int(user_ids.max()) + 1)
+    indptr = np.zeros(counts.shape[0] + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+    return indptr, data[order, 1].astype(np.int64), data[order, 2].astype(np.int64)
+
+
+def get_top_candidates(scores: np.ndarray, slate_size: int) -> np.ndarray:
+    """
+    Positions of the `slate_size` candidates with the highest scores (in order),
+    for a batch of candidate sets. Ties go to the earlier candidate, as with
+    `np.argsort(-scores, axis=1, kind='stable')[:, :slate_size]`.
+    """
+    if slate_size < scores.shape[1]:
+        threshold = -np.partition(-scores, slate_size - 1, axis=1)[:, slate_size - 1:slate_size]
+        above = scores > threshold
+        ties = scores == threshold
+        ties &= np.cumsum(ties, axis=1) <= slate_size - above.sum(axis=1, keepdims=True)
+        top = np.nonzero(above | ties)[1].reshape(scores.shape[0], slate_size)
+        order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1, kind='stable')
+        return np.take_along_axis(top, order, axis=1)
+    return np.argsort(-scores, axis=1, kind='stable')
+
+
+def get_discounts(slate_size: int) -> np.ndarray:
+    """
+    DCG discount of every position in a slate
+    """
+    return 1. / np.log2(np.arange(2, slate_size + 2))
+
+
+def get_ideal_dcg(relevance: np.ndarray, slate_size: int) -> np.ndarray:
+    """
+    Largest possible DCG of every candidate set in a batch
+    """
+    gains = np.exp2(relevance) - 1.
+    slate_size = min(slate_size, gains.shape[1])
+    return (-np.sort(-gains, axis=1)[:, :slate_size] * get_discounts(slate_size)).sum(axis=1)
+
+
+def get_ndcg(scores: np.ndarray, relevance: np.ndarray, slate_size: int) -> np.ndarray:
+    """
+    Normalized discounted cumulative gain of the `slate_size` candidates with the
+    highest scores, for a batch of candidate sets.
+
+    :param scores: agent scores of shape (batch_size, num_of_candidates)
+    :param relevance: graded relevance (e.g., rating) of every candidate
+    :return: NDCG of every candidate set (0 when no candidate is relevant)
+    """
+    top = get_top_candidates(scores=scores, slate_size=slate_size)
+    gains = np.exp2(relevance) - 1.
+    dcg = (np.take_along_axis(gains, top, axis=1) * get_discounts(top.shape[1])).sum(axis=1)
+    ideal = get_ideal_dcg(relevance=relevance, slate_size=top.shape[1])
+    return np.divide(dcg, ideal, out=np.zeros_like(dcg), where=ideal > 0.)
+
+
+def get_hit_rate(scores: np.ndarray, relevance: np.ndarray, slate_size: int) -> np.ndarray:
+    """
+    1 if any of the `slate_size` candidates with the highest scores is relevant,
+    for a batch of candidate sets (see `get_ndcg()`)
+    """
+    top = get_top_candidates(scores=scores, slate_size=slate_size)
+    return (np.take_along_axis(relevance, top, axis=1) > 0.).any(axis=1).astype(np.float64)
+
+
+# Ranking metrics by name (i.e., the `metric` argument of SlateEnv)
+METRICS = dict(ndcg=get_ndcg, hit_rate=get_hit_rate)
+
+
+class CandidateSampler(object):
+    """
+    Vectorized candidate generation for batches of users: every candidate set holds
+    `num_of_positives` movies the user rated at least `relevance_threshold` and
+    `num_of_candidates - num_of_positives` movies the user has not rated.
+
+    Negatives are drawn uniformly without replacement from the rated movies of the
+    data set. Membership in a user's ratings is checked with one `np.searchsorted()`
+    over the sorted (user_id, movie_id) keys of the CSR index. When the candidate
+    sets are small compared to the catalog, extra movies are drawn and the first
+    unrated, distinct ones are kept, so the cost grows with the batch and not with
+    the catalog; otherwise the whole catalog is ranked in random order.
+    """
+
+    def __init__(self,
+                 data: np.ndarray,
+                 num_of_candidates: int = 100,
+                 num_of_positives: int = 1,
+                 relevance_threshold: int = 4):
+        """
+        Parameterized constructor
+
+        :param data: rating rows (user_id, item_id, rating, timestamp)
+        :param num_of_candidates: number of movies in every candidate set (K)
+        :param num_of_positives: number of relevant movies in every candidate set
+        :param relevance_threshold: lowest rating of a relevant movie
+        """
+        if not 0 < num_of_positives < num_of_candidates:
+            raise ValueError(f'num_of_positives must be between 1 and '
+                             f'num_of_candidates - 1, got {num_of_positives}.')
+        self.num_of_candidates = num_of_candidates
+        self.num_of_positives = num_of_positives
+        self.num_of_negatives = num_of_candidates - num_of_positives
+        self.relevance_threshold = relevance_threshold
+        # all ratings (for excluding rated movies from the negatives)
+        self.indptr, self.item_ids, self.ratings = get_user_item_index(data=data)
+        self.catalog = np.unique(self.item_ids)
+        self.key_base = int(self.catalog[-1]) + 1
+        user_ids = np.repeat(np.arange(self.indptr.shape[0] - 1), np.diff(self.indptr))
+        self.keys = user_ids * self.key_base + self.item_ids
+        # relevant ratings (for drawing the positives)
+        relevant = self.ratings >= relevance_threshold
+        self.relevant_indptr = np.zeros_like(self.indptr)
+        np.cumsum(np.bincount(user_ids[relevant], minlength=self.indptr.shape[0] - 1),
+                  out=self.relevant_indptr[1:])
+        self.relevant_item_ids = self.item_ids[relevant]
+        self.relevant_ratings = self.ratings[relevant]
+        # users with enough relevant and unrated movies
+        num_of_relevant = np.diff(self.relevant_indptr)
+        num_of_unrated = self.catalog.shape[0] - np.diff(self.indptr)
+        self.user_ids = np.flatnonzero((num_of_relevant >= num_of_positives) &
+                                       (num_of_unrated >= self.num_of_negatives))
+        if self.user_ids.shape[0] == 0:
+            raise ValueError('No user has enough relevant and unrated movies '
+                             'for the candidate sets.')
+
+    def sample(self, user_ids: np.ndarray,
+               random_state: np.random.RandomState) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Draw a shuffled candidate set for every user
+
+        :param user_ids: users to draw candidates for (see `self.user_ids`)
+        :return: (item_ids, relevance) of shape (len(user_ids), num_of_candidates),
+            where relevance is the user's rating of relevant movies and 0 otherwise
+        """
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        num_of_users = user_ids.shape[0]
+        # positives: distinct offsets into each user's relevant movies
+        starts = self.relevant_indptr[user_ids][:, None]
+        sizes = self.relevant_indptr[user_ids + 1][:, None] - starts
+        offsets = (random_state.random_sample((num_of_users, self.num_of_positives)) *
+                   sizes).astype(np.int64)
+        duplicate = self._is_duplicate(offsets)
+        while duplicate.any():
+            offsets[duplicate] = (random_state.random_sample(offsets.shape) *
+                                  sizes).astype(np.int64)[duplicate]
+            duplicate = self._is_duplicate(offsets)
+        positives = self.relevant_item_ids[starts + offsets]
+        positive_ratings = self.relevant_ratings[starts + offsets]
+        # negatives: distinct movies that the user has not rated
+        if self.num_of_negatives * 4 >= self.catalog.shape[0]:
+            negatives = self._sample_dense_negatives(user_ids=user_ids,
+                                                     random_state=random_state)
+        else:
+            negatives = self._sample_sparse_negatives(user_ids=user_ids,
+                                                      random_state=random_state)
+        item_ids = np.concatenate((positives, negatives), axis=1)
+        relevance = np.zeros(item_ids.shape, dtype=np.float64)
+        relevance[:, :self.num_of_positives] = positive_ratings
+        # shuffle the candidates, so positives are not always first
+        order = np.argsort(random_state.random_sample(item_ids.shape), axis=1)
+        return (np.take_along_axis(item_ids, order, axis=1),
+                np.take_along_axis(relevance, order, axis=1))
+
+    def _sample_sparse_negatives(self, user_ids: np.ndarray,
+                                 random_state: np.random.RandomState) -> np.ndarray:
+        """
+        Draw more movies than needed and keep a random subset of the unrated,
+        distinct ones (rows without enough of them are drawn again).
+
+        Draws are sorted within each row and rows are ordered by user, so duplicates
+        are adjacent and the membership queries are sorted like the CSR keys.
+        """
+        num_of_items = self.catalog.shape[0]
+        negatives = np.empty((user_ids.shape[0], self.num_of_negatives), dtype=np.int64)
+        rows = np.argsort(user_ids, kind='stable')
+        while rows.shape[0] > 0:
+            users = user_ids[rows]
+            # enough draws to cover the rated movies and duplicates of most rows
+            rated_fraction = (self.indptr[users + 1] - self.indptr[users]).max() / num_of_items
+            valid_fraction = max(1. - rated_fraction - self.num_of_negatives / num_of_items,
+                                 0.05)
+            num_of_draws = int(self.num_of_negatives / valid_fraction * 1.1) + 8
+            draws = np.sort(self.catalog[random_state.randint(
+                num_of_items, size=(rows.shape[0], num_of_draws))], axis=1)
+            invalid = self._is_rated(users[:, None], draws)
+            invalid[:, 1:] |= draws[:, 1:] == draws[:, :-1]
+            enough = (~invalid).sum(axis=1) >= self.num_of_negatives
+            priorities = random_state.random_sample(draws.shape)
+            priorities[invalid] = 2.
+            chosen = np.argpartition(priorities, self.num_of_negatives - 1,
+                                     axis=1)[:, :self.num_of_negatives]
+            negatives[rows[enough]] = np.take_along_axis(draws, chosen, axis=1)[enough]
+            rows = rows[~enough]
+        return negatives
+
+    def _sample_dense_negatives(self, user_ids: np.ndarray,
+                                random_state: np.random.RandomState) -> np.ndarray:
+        """
+        Rank the whole catalog in random order (rated movies last) and keep the
+        first movies of every row
+        """
+        priorities = random_state.random_sample((user_ids.shape[0], self.catalog.shape[0]))
+        priorities[self._is_rated(user_ids[:, None], self.catalog[None, :])] = 2.
+        chosen = np.argpartition(priorities, self.num_of_negatives - 1,
+                                 axis=1)[:, :self.num_of_negatives]
+        return self.catalog[chosen]
+
+    def _is_rated(self, user_ids: np.ndarray, item_ids: np.ndarray) -> np.ndarray:
+        """
+        Check if users rated movies (broadcasting `user_ids` against `item_ids`)
+        """
+        keys = user_ids * self.key_base + item_ids
+        positions = np.minimum(np.searchsorted(self.keys, keys), self.keys.shape[0] - 1)
+        return self.keys[positions] == keys
+
+    @staticmethod
+    def _is_duplicate(values: np.ndarray) -> np.ndarray:
+        """
+        Flag every value that already appears earlier in its row
+        """
+        order = np.argsort(values, axis=1, kind='stable')
+        sorted_values = np.take_along_axis(values, order, axis=1)
+        duplicate = np.zeros(values.shape, dtype=bool)
+        np.put_along_axis(duplicate, order[:, 1:],
+                          sorted_values[:, 1:] == sorted_values[:, :-1], axis=1)
+        return duplicate
+
+
+class SlateEnv(Env):
+    """
+    Slate recommendation environment: every step presents a user with a candidate
+    set of `num_of_candidates` movies and the agent scores them. The reward is a
+    ranking metric (NDCG or hit rate) of the `slate_size` highest-scored candidates,
+    using the user's held ratings as relevance.
+
+    An episode visits `episode_length` users in a random order.
+    """
+    metadata = {'render.modes': ['human', 'logger']}
+    id = 'reco-slate-v0'
+
+    def __init__(self,
+                 data: pd.DataFrame = None,
+                 item: pd.DataFrame = None,
+                 user: pd.DataFrame = None,
+                 seed: int = 1,
+                 features: RecoFeatures = None,
+                 num_of_candidates: int = 100,
+                 num_of_positives: int = 1,
+                 slate_size: int = 10,
+                 relevance_threshold: int = 4,
+                 metric: str = 'ndcg',
+                 episode_length: int = None,
+                 observation_mode: str = 'dense',
+                 batch_size: int = 64,
+                 instrumentation: Instrumentation = None):
+        """
+        Parameterized constructor
+
+        :param features: lookup tables created in advance (see `RecoEnv`)
+        :param num_of_candidates: number of movies in every candidate set (K)
+        :param num_of_positives: number of relevant movies in every candidate set
+        :param slate_size: number of top-scored candidates the reward is computed on
+        :param relevance_threshold: lowest rating of a relevant movie
+        :param metric: 'ndcg' or 'hit_rate' (see `METRICS`)
+        :param episode_length: number of users per episode (None = every eligible user)
+        :param observation_mode: 'dense' or 'compact' features of every
+            (user, candidate) pair (see `RecoEnv`)
+        :param batch_size: number of upcoming users whose candidates and
+            observations are created in one vectorized call
+        :param instrumentation: receives the output of `render()` (see `RecoEnv`)
+        """
+        if metric not in METRICS:
+            raise ValueError(f'Unknown metric {metric}. Choose one of {sorted(METRICS)}.')
+        if observation_mode not in RecoEnv.observation_modes:
+            raise ValueError(f'Unknown observation_mode {observation_mode}. '
+                             f'Choose one of {RecoEnv.observation_modes}.')
+        self.features = features
+        if self.features is None:
+            self.features = RecoFeatures.from_dataframes(data=data, item=item, user=user)
+        self.data = self.features.data
+        self.compact = observation_mode == 'compact'
+        if self.compact:
+            self.features.check_compact_observations()
+        self.sampler = CandidateSampler(data=self.data,
+                                        num_of_candidates=num_of_candidates,
+                                        num_of_positives=num_of_positives,
+                                        relevance_threshold=relevance_threshold)
+        self.num_of_candidates = num_of_candidates
+        self.slate_size = min(slate_size, num_of_candidates)
+        self.metric = metric
+        self._discounts = get_discounts(self.slate_size)
+        self.episode_length = min(episode_length or self.sampler.user_ids.shape[0],
+                                  self.sampler.user_ids.shape[0])
+        # MDP variables
+        self.reward = 0.0
+        self.done = False
+        self.observation = None
+        self.candidates = None
+        self.relevance = None
+        self._gains = None
+        self._ideal_dcg = 0.
+        # other environment variables
+        self.local_step_number = 0
+        self.episode_users = None
+        self.batch_size = batch_size
+        self._batch = None
+        self._batch_start = 0
+        self._seed = seed
+        self._random_state = np.random.RandomState(seed=self._seed)
+        self.instrumentation = instrumentation
+        # other openAI.gym specific variables
+        num_of_columns = self._get_observations(user_ids=self.sampler.user_ids[:1],
+                                                item_ids=self.sampler.catalog[None, :1]
+                                                ).shape[-1]
+        self.action_space = spaces.Box(low=-np.inf, high=np.inf,
+                                       shape=(num_of_candidates,), dtype=np.float32)
+        self.observation_space = spaces.Box(low=-1.,
+                                            high=float(MAX_COMPACT_INDEX) if self.compact
+                                            else 5.0,
+                                            shape=(num_of_candidates, num_of_columns),
+                                            dtype=np.float32)
+
+    def step(self, action: np.ndarray) -> Tuple[np.ndarray, float, bool, dict]:
+        """
+        Score the candidates of the current user and move on to the next user
+
+        :param action: one score per candidate (higher = recommended first)
+        """
+        if self.episode_users is None:
+            raise ValueError('SlateEnv.step() called before reset()')
+        if self.done:
+            self.observation = self.reset()
+            return self.observation, self.reward, self.done, {}
+        self.reward = self._get_reward(
+            scores=np.asarray(action, dtype=np.float64).reshape(self.num_of_candidates))
+        info = dict(user_id=int(self.episode_users[self.local_step_number]),
+                    candidates=self.candidates)
+        self.local_step_number += 1
+        if self.local_step_number >= self.episode_length:
+            self.done = True
+        else:
+            self.observation = self._sample_candidates()
+        return self.observation, self.reward, self.done, info
+
+    def reset(self) -> np.ndarray:
+        """
+        Reset the environment to an initial state with a new order of users
+        """
+        self.episode_users = self._random_state.permutation(
+            self.sampler.user_ids)[:self.episode_length]
+        self.local_step_number = 0
+        self.reward = 0.0
+        self.done = False
+        self.observation = self._sample_candidates()
+        return self.observation
+
+    def render(self, mode: str = 'human') -> None:
+        """
+        Render environment
+        """
+        if mode != 'logger':
+            return
+        message = (f"Env candidates at step {self.local_step_number} "
+                   f"are {np.array2string(self.candidates, threshold=8)}")
+        if self.instrumentation is None:
+            print(message)
+        else:
+            self.instrumentation.log(message)
+
+    def close(self) -> None:
+        """
+        Clear resources when shutting down environment
+        """
+        self.data = None
+        self.features = None
+
+    def seed(self, seed: int = 1) -> List[int]:
+        """
+        Set random seed
+        """
+        self._random_state = np.random.RandomState(seed=seed)
+        self._seed = seed
+        return [seed]
+
+    def __str__(self) -> str:
+        return f'GymID={SlateEnv.id} | seed={self._seed}'
+
+    def expand_observations(self, observations: np.ndarray) -> np.ndarray:
+        """
+        Convert compact observations of shape (..., num_of_candidates, columns)
+        into dense observations (see `RecoEnv.expand_observations()`)
+        """
+        observations = np.asarray(observations)
+        dense = self.features.expand_observations(
+            compact=observations.reshape(-1, observations.shape[-1]))
+        return dense.reshape(observations.shape[:-1] + dense.shape[-1:])
+
+    def _sample_candidates(self) -> np.ndarray:
+        """
+        Get the candidates of the current user and their observations, drawing
+        them for the next `batch_size` users of the episode when needed
+        """
+        index = self.local_step_number - self._batch_start
+        if self.local_step_number == 0 or index >= self.batch_size:
+            self._batch_start = self.local_step_number
+            index = 0
+            user_ids = self.episode_users[self._batch_start:
+                                          self._batch_start + self.batch_size]
+            candidates, relevance = self.sampler.sample(user_ids=user_ids,
+                                                        random_state=self._random_state)
+            self._batch = (candidates, relevance, np.exp2(relevance) - 1.,
+                           get_ideal_dcg(relevance=relevance, slate_size=self.slate_size),
+                           self._get_observations(user_ids=user_ids, item_ids=candidates))
+        candidates, relevance, gains, ideal_dcg, observations = self._batch
+        self.candidates = candidates[index]
+        self.relevance = relevance[index]
+        self._gains = gains[index]
+        self._ideal_dcg = ideal_dcg[index]
+        return observations[index]
+
+    def _get_reward(self, scores: np.ndarray) -> float:
+        """
+        Ranking metric of the current candidates (same as `METRICS[self.metric]`,
+        using the gains and ideal DCG created with the candidates)
+        """
+        top = get_top_candidates(scores=scores[None], slate_size=self.slate_size)[0]
+        if self.metric == 'hit_rate':
+            return float(self.relevance[top].any())
+        if self._ideal_dcg <= 0.:
+            return 0.
+        return float(self._gains[top] @ self._discounts / self._ideal_dcg)
+
+    def _get_observations(self, user_ids: np.ndarray, item_ids: np.ndarray) -> np.ndarray:
+        """
+        Get the features of every (user, candidate) pair
+
+        :param user_ids: users of shape (batch_size,)
+        :param item_ids: candidates of shape (batch_size, num_of_candidates)
+        :return: float32 array of shape (batch_size, num_of_candidates, columns)
+        """
+        pair_user_ids = np.repeat(user_ids, item_ids.shape[1])
+        pair_item_ids = item_ids.reshape(-1)
+        if self.compact:
+            observations = self.features.get_compact_pair_observations(
+                user_ids=pair_user_ids, movie_ids=pair_item_ids)
+        else:
+            observations = self.features.get_pair_observations(
+                user_ids=pair_user_ids, movie_ids=pair_item_ids)
+        return observations.reshape(item_ids.shape + observations.shape[-1:])
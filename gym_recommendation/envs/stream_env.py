@@ -0,0 +1,312 @@
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+from gym import Env
+from gym import spaces
+
+from gym_recommendation.envs.events import EventSource, get_event_source
+from gym_recommendation.envs.features import DEFAULT_MEAN_RATING, RecoFeatures, \
+    get_movie_genre_table, get_nbytes, get_reward, get_user_tables
+from gym_recommendation.envs.instrumentation import Instrumentation
+from gym_recommendation.envs.running_stats import NUM_OF_RUNNING_FEATURES, RunningStats
+
+# Default bound of the user and movie ids of the feed (see `StreamEnv.max_id`)
+MAX_STREAM_ID = 2 ** 22
+
+
+class StreamEnv(Env):
+    """
+    Environment that consumes a live feed of rating events instead of a data set.
+
+    Events are read lazily in batches (see `events.EventSource`). Only the static
+    user/movie tables, a bounded sliding window of the latest events and the
+    running per-user/per-movie statistics are kept in memory, so memory stays
+    constant however long the feed runs (the statistics only grow with the largest
+    id, which is bounded by `max_id`). Observations have the layout of `RecoEnv(online_stats=True)`.
+    """
+    # Environment static properties
+    metadata = {'render.modes': ['human', 'logger']}
+    id = 'reco-stream-v0'
+    actions = np.eye(5)
+
+    def __init__(self,
+                 events: Any = None,
+                 item: pd.DataFrame = None,
+                 user: pd.DataFrame = None,
+                 features: RecoFeatures = None,
+                 batch_size: int = 1024,
+                 window_size: int = 65536,
+                 episode_length: int = None,
+                 max_id: int = MAX_STREAM_ID,
+                 seed: int = 1,
+                 instrumentation: Instrumentation = None):
+        """
+        Parameterized constructor
+
+        :param events: feed of rating events: an `EventSource` (e.g., a tailed file
+            with `FileSource(path, follow=True)` or a `SocketSource`), a file path,
+            a queue or any iterable of events (see `events.get_event_source()` and
+            `events.parse_event()`)
+        :param item: movie reference data (used for the genre features)
+        :param user: user reference data (used for the age, occupation and gender features)
+        :param features: lookup tables created in advance (e.g., memory-mapped with
+            `RecoFeatures.load()`), whose static user/movie tables are used instead
+            of `item` and `user`. Their rating rows and mean ratings are not used
+        :param batch_size: maximum number of events read from the feed at a time
+        :param window_size: number of latest events kept (see `get_window()`)
+        :param episode_length: maximum number of events per episode (None = until
+            the feed ends)
+        :param max_id: user and movie ids must be below this bound. Events with
+            negative or larger ids are dropped, since the running statistics hold
+            one entry per id up to the largest one
+        :param instrumentation: collects episode metrics, and receives the output
+            of `render()` and the number of events dropped from the feed (see `RecoEnv`)
+        """
+        if window_size < 1 or batch_size < 1 or max_id < 1:
+            raise ValueError('batch_size, window_size and max_id must be positive.')
+        self.source = get_event_source(events)  # type: EventSource
+        self.features = self._get_static_features(item=item, user=user, features=features)
+        self.num_of_occupations = self.features.num_of_occupations
+        self.batch_size = batch_size
+        self.window_size = window_size
+        self.episode_length = episode_length
+        self.max_id = max_id
+        # number of events dropped from the feed (unparsable or with ids out of range)
+        self.num_of_dropped = 0
+        # running statistics, grown as new ids appear in the feed
+        self.stats = RunningStats(num_of_users=self.features.age_bucket.shape[0],
+                                  num_of_movies=self.features.movie_genre.shape[0])
+        # ring buffer of the latest events (user_id, item_id, rating, timestamp)
+        self.window = np.zeros((window_size, 4), dtype=np.int64)
+        self.num_of_events = 0
+        # current batch of events and their static observations
+        self.batch = np.zeros((0, 4), dtype=np.int64)
+        self.batch_observations = np.zeros((0, self.features.observation_size),
+                                           dtype=np.float32)
+        self._batch_events = []
+        self.batch_position = 0
+        self.exhausted = False
+        # MDP variables
+        self.reward = 0.0
+        self.done = False
+        self.observation = None
+        self.action = 0
+        # other environment variables
+        self.local_step_number = 0
+        self.total_correct_predictions = 0
+        self._seed = seed
+        self._random_state = np.random.RandomState(seed=self._seed)
+        self.instrumentation = instrumentation
+        # other openAI.gym specific variables
+        self.action_space = spaces.Discrete(len(StreamEnv.actions))
+        self.observation_space = spaces.Box(low=-1., high=5.0,
+                                            shape=(self.features.observation_size +
+                                                   NUM_OF_RUNNING_FEATURES - 2,),
+                                            dtype=np.float32)
+
+    def step(self, action: int = 0) -> Tuple[np.ndarray, float, bool, dict]:
+        """
+        Agent steps through environment: the reward is for the rating of the event
+        in the last observation, which is then added to the running statistics
+        before the observation of the next event is created
+        """
+        if self.done:
+            self.observation = self.reset()
+            return self.observation, self.reward, self.done, {}
+        self.action = action
+        user_id, movie_id, rating, _ = self._batch_events[self.batch_position]
+        self.reward = get_reward(action=action, rating=rating)
+        self.stats.update(user_id=user_id, movie_id=movie_id, rating=rating)
+        if self.reward > 0.:
+            self.total_correct_predictions += 1
+        self.batch_position += 1
+        self.local_step_number += 1
+        if self.instrumentation is not None:
+            self.instrumentation.record_step(reward=self.reward)
+        if self.episode_length is not None and self.local_step_number >= self.episode_length:
+            self.done = True
+        if not self._has_event():
+            self.done = True
+        else:
+            self.observation = self._get_observation()
+        return self.observation, self.reward, self.done, {}
+
+    def reset(self) -> np.ndarray:
+        """
+        Start a new episode at the next event of the feed. The running statistics
+        and the window are kept, since the feed cannot be replayed.
+        """
+        self.local_step_number = 0
+        self.reward = 0.0
+        if self.instrumentation is not None:
+            self.instrumentation.end_episode()
+        self.total_correct_predictions = 0
+        self.done = not self._has_event()
+        if not self.done:
+            self.observation = self._get_observation()
+        elif self.observation is None:
+            self.observation = np.zeros(self.observation_space.shape, dtype=np.float32)
+        return self.observation
+
+    def render(self, mode: str = 'human') -> None:
+        """
+        Render environment
+        """
+        if mode != 'logger':
+            return
+        message = (f"Env observation at step {self.local_step_number} "
+                   f"is {np.array2string(self.observation, threshold=8)}")
+        if self.instrumentation is None:
+            print(message)
+        else:
+            self.instrumentation.log(message)
+
+    def close(self) -> None:
+        """
+        Clear resources when shutting down environment
+        """
+        self.source.close()
+
+    def seed(self, seed: int = 1) -> List[int]:
+        """
+        Set random seed
+        """
+        self._random_state = np.random.RandomState(seed=seed)
+        self._seed = seed
+        return [seed]
+
+    def get_window(self) -> np.ndarray:
+        """
+        Get the latest events read from the feed (at most `window_size`), oldest first
+
+        :return: int64 array of (user_id, item_id, rating, timestamp) rows
+        """
+        if self.num_of_events <= self.window_size:
+            return self.window[:self.num_of_events].copy()
+        start = self.num_of_events % self.window_size
+        return np.concatenate((self.window[start:], self.window[:start]))
+
+    def get_memory_usage(self, include_shared: bool = True) -> Dict[str, int]:
+        """
+        Report the memory held by the environment, by array (see `RecoEnv.get_memory_usage()`)
+        """
+        usage = dict(('features.' + name, nbytes) for name, nbytes in
+                     self.features.get_memory_usage(include_shared=include_shared).items())
+        usage['window'] = get_nbytes(self.window)
+        usage['batch'] = get_nbytes(self.batch)
+        usage['batch_observations'] = get_nbytes(self.batch_observations)
+        for name in RunningStats.ARRAYS:
+            usage[f'stats.{name}'] = get_nbytes(getattr(self.stats, name))
+        usage['total'] = sum(usage.values())
+        return usage
+
+    def __str__(self) -> str:
+        return f'GymID={StreamEnv.id} | seed={self._seed}'
+
+    def _has_event(self) -> bool:
+        """
+        Make sure the current batch holds an event that was not stepped through yet,
+        reading the next batch from the feed if needed. Events that cannot be parsed
+        or whose ids are negative or not below `max_id` are dropped and counted in
+        `num_of_dropped`.
+
+        :return: False once the feed has ended
+        """
+        if self.batch_position < self.batch.shape[0]:
+            return True
+        while not self.exhausted:
+            num_of_unparsable = self.source.num_of_dropped
+            batch = self.source.read(max_events=self.batch_size)
+            num_of_unparsable = self.source.num_of_dropped - num_of_unparsable
+            valid = ((batch[:, :2] >= 0) & (batch[:, :2] < self.max_id)).all(axis=1)
+            num_of_out_of_range = batch.shape[0] - int(valid.sum())
+            if num_of_out_of_range > 0:
+                batch = batch[valid]
+            self._log_dropped(num_of_unparsable=num_of_unparsable,
+                              num_of_out_of_range=num_of_out_of_range)
+            if batch.shape[0] > 0:
+                self._add_batch(batch=batch)
+                return True
+            # an empty read means the feed has ended, unless every event was dropped
+            self.exhausted = num_of_unparsable + num_of_out_of_range == 0
+        return False
+
+    def _log_dropped(self, num_of_unparsable: int, num_of_out_of_range: int) -> None:
+        """
+        Count the events dropped from a batch of the feed, and log them
+        """
+        self.num_of_dropped += num_of_unparsable + num_of_out_of_range
+        if self.instrumentation is None:
+            return
+        if num_of_unparsable > 0:
+            self.instrumentation.log(f"Dropped {num_of_unparsable} "
+                                     f"unparsable events from the feed")
+        if num_of_out_of_range > 0:
+            self.instrumentation.log(f"Dropped {num_of_out_of_range} events with ids "
+                                     f"out of [0, {self.max_id}) from the feed")
+
+    def _add_batch(self, batch: np.ndarray) -> None:
+        """
+        Make a batch of events current: create their static observations at once,
+        grow the running statistics for new ids and write them into the window
+        """
+        self.batch = batch
+        # Python integers, which are faster to step through than NumPy scalars
+        self._batch_events = batch.tolist()
+        self.batch_position = 0
+        self.batch_observations = self.features.get_pair_observations(
+            user_ids=batch[:, 0], movie_ids=batch[:, 1])
+        num_of_users = int(batch[:, 0].max()) + 1
+        num_of_movies = int(batch[:, 1].max()) + 1
+        if num_of_users > self.stats.user_count.shape[0] or \
+                num_of_movies > self.stats.movie_count.shape[0]:
+            # grown geometrically, so a feed of new ids is not copied on every batch
+            self.stats.grow(num_of_users=max(num_of_users, 2 * self.stats.user_count.shape[0]),
+                            num_of_movies=max(num_of_movies,
+                                              2 * self.stats.movie_count.shape[0]))
+        rows = batch[-self.window_size:]
+        positions = (self.num_of_events + batch.shape[0] - rows.shape[0] +
+                     np.arange(rows.shape[0])) % self.window_size
+        self.window[positions] = rows
+        self.num_of_events += batch.shape[0]
+
+    def _get_observation(self) -> np.ndarray:
+        """
+        Get the observation of the current event: the static features of its
+        (user, movie) pair with the running means and counts (see `RecoEnv._get_observation()`)
+        """
+        user_id, movie_id, _, _ = self._batch_events[self.batch_position]
+        running_features = self.stats.get_features(user_id=user_id, movie_id=movie_id)
+        return np.concatenate((running_features[:2],
+                               self.batch_observations[self.batch_position, 2:],
+                               running_features[2:]))
+
+    @staticmethod
+    def _get_static_features(item: pd.DataFrame, user: pd.DataFrame,
+                             features: RecoFeatures) -> RecoFeatures:
+        """
+        Lookup tables of the static user/movie features, without rating rows or
+        mean ratings (which come from the running statistics instead)
+        """
+        if features is not None:
+            movie_genre = features.movie_genre
+            age_bucket, occupation_id, gender_id = features.age_bucket, \
+                features.occupation_id, features.gender_id
+            num_of_occupations = features.num_of_occupations
+        elif item is not None and user is not None:
+            movie_genre = get_movie_genre_table(item=item)
+            age_bucket, occupation_id, gender_id, num_of_occupations = \
+                get_user_tables(user=user)
+        else:
+            raise ValueError('StreamEnv needs the item and user reference data or features.')
+        # every id falls back to the default mean rating
+        default_mean = np.full(1, DEFAULT_MEAN_RATING, dtype=np.float64)
+        return RecoFeatures(data=np.zeros((0, 4), dtype=np.int64),
+                            user_mean=default_mean,
+                            movie_mean=default_mean,
+                            movie_genre=movie_genre,
+                            age_bucket=age_bucket,
+                            occupation_id=occupation_id,
+                            gender_id=gender_id,
+                            num_of_occupations=num_of_occupations)
@@ -0,0 +1,306 @@
+import multiprocessing
+import os
+from time import perf_counter
+from typing import TYPE_CHECKING, Callable, Dict, Optional, Tuple, Union
+
+import numpy as np
+
+from .envs.features import REWARD_TABLE, RecoFeatures
+from .envs.reco_env import RecoEnv
+from .transitions import get_episodes, iterate_steps
+
+if TYPE_CHECKING:
+    from stable_baselines.common.base_class import ActorCriticRLModel
+
+# Number of possible ratings (i.e., 1-5 stars), which is also the number of actions
+NUM_OF_RATINGS = REWARD_TABLE.shape[0]
+# Ways of splitting the rating rows between the workers of `evaluate_sharded()`
+SHARD_MODES = ('rows', 'user')
+# Model and environment of an `evaluate_sharded()` worker process
+_worker = dict()
+
+
+def evaluate_batched(model: 'ActorCriticRLModel',
+                     env: RecoEnv,
+                     num_steps: Optional[int] = None,
+                     batch_size: int = 8192,
+                     deterministic: bool = True) -> Dict:
+    """
+    Evaluate a RL agent on the steps of the environment's current episode in
+    large batches.
+
+    Since the environment's transitions do not depend on the agent's actions, the
+    observations of `batch_size` steps are created at once and passed to
+    `model.predict()` together, and rewards come from the precomputed `REWARD_TABLE`.
+    Observations and ratings are paired like `RecoEnv.step()` (see
+    `transitions.iterate_steps()`), so the results equal stepping through the
+    environment. With `online_stats` or `history_length`, the running features
+    are replayed in episode order.
+
+    :param model: agent with a `predict(observations, deterministic)` method
+    :param env: environment to evaluate on (gym wrappers are removed); its next
+        episodes (i.e., that follow `reset()` calls) are played on a clone, so the
+        environment itself does not move
+    :param num_steps: number of steps to evaluate (None = the next episode);
+        steps continue into the environment's following episodes, like `reset()` calls
+    :param batch_size: number of steps per `model.predict()` call
+    :param deterministic: passed on to `model.predict()`
+    :return: evaluation results (see `get_evaluation_results()`)
+    """
+    confusion_matrix = np.zeros((NUM_OF_RATINGS, NUM_OF_RATINGS), dtype=np.int64)
+    predict_seconds = 0.
+    start_time = perf_counter()
+    for observations, ratings, _ in iterate_steps(
+            env=env, batch_size=batch_size, num_steps=num_steps,
+            num_of_episodes=None if num_steps else 1):
+        batch_confusion_matrix, batch_predict_seconds = _evaluate_batch(
+            model=model, observations=observations, ratings=ratings,
+            deterministic=deterministic)
+        confusion_matrix += batch_confusion_matrix
+        predict_seconds += batch_predict_seconds
+    return _summarize(confusion_matrix=confusion_matrix, start_time=start_time,
+                      predict_seconds=predict_seconds)
+
+
+def get_step_rows(env: RecoEnv,
+                  num_steps: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Get the rating rows of the environment's next steps (see
+    `transitions.iterate_steps()`)
+
+    :param num_steps: number of steps (None = the next episode)
+    :return: (rows of the observations the agent acts on, rows of the ratings
+        its actions are scored against), as indices in `env.data`
+    """
+    observation_rows, rated_rows = [], []
+    for _, rows in get_episodes(env=env, num_of_episodes=None if num_steps else 1):
+        rows = rows[:num_steps]
+        steps = np.arange(rows.shape[0])
+        observation_rows.append(rows[np.maximum(steps - 1, 0)])
+        rated_rows.append(rows)
+        if num_steps is None:
+            break
+        num_steps -= rows.shape[0]
+        if num_steps == 0:
+            break
+    return np.concatenate(observation_rows), np.concatenate(rated_rows)
+
+
+def evaluate_sharded(model: Union[str, Callable[[], 'ActorCriticRLModel']],
+                     features_directory: str,
+                     num_workers: Optional[int] = None,
+                     shard_by: str = 'rows',
+                     num_steps: Optional[int] = None,
+                     batch_size: int = 8192,
+                     deterministic: bool = True,
+                     env_kwargs: Optional[Dict] = None,
+                     start_method: str = 'spawn') -> Dict:
+    """
+    Evaluate a RL agent like `evaluate_batched()`, with the rating rows split into
+    shards that are scored by a pool of worker processes.
+
+    Every worker loads the agent once and attaches to the memory-mapped features
+    in `features_directory` (see `RecoFeatures.load()`), so the data set is shared
+    through the page cache instead of being copied into each process. Workers
+    return the confusion matrix of their shard, and since all results are derived
+    from those integer counts (see `get_evaluation_results()`), the merged results
+    are identical to evaluating the same rows serially.
+
+    :param model: path of an agent saved with `PPO2.save()`, or a picklable
+        callable that returns an agent (e.g., a class or a module-level function)
+    :param features_directory: directory of features saved with `RecoFeatures.save()`
+        (e.g., `datasets.get_features_directory()`)
+    :param num_workers: number of worker processes (None = number of CPUs)
+    :param shard_by: 'rows' (contiguous ranges of the episode's rating rows) or
+        'user' (all rating rows of a user are scored by the same worker)
+    :param num_steps: number of rating rows to evaluate (None = the whole episode)
+    :param batch_size: number of rating rows per `model.predict()` call
+    :param deterministic: passed on to `model.predict()`
+    :param env_kwargs: keyword arguments for the workers' `RecoEnv`
+        (e.g., `dict(sampling='permutation', seed=1)`), without `online_stats`
+        and `history_length`: running features depend on every earlier rating
+        row, so they cannot be computed for a shard on its own
+    :param start_method: multiprocessing start method of the workers ('spawn'
+        does not inherit the parent's TensorFlow session, which does not survive
+        a fork)
+    :return: evaluation results (see `get_evaluation_results()`), where
+        `predict_seconds` is summed over all workers
+    """
+    if shard_by not in SHARD_MODES:
+        raise ValueError(f'Unknown shard_by {shard_by}. Choose one of {SHARD_MODES}.')
+    env_kwargs = env_kwargs or dict()
+    if env_kwargs.get('online_stats') or env_kwargs.get('history_length'):
+        raise ValueError('evaluate_sharded() is not available with online_stats '
+                         'or history_length. Use evaluate_batched() instead.')
+    num_workers = num_workers or os.cpu_count() or 1
+    start_time = perf_counter()
+    context = multiprocessing.get_context(start_method)
+    with context.Pool(processes=num_workers, initializer=_init_worker,
+                      initargs=(model, features_directory, env_kwargs)) as pool:
+        shards = pool.map(_evaluate_shard,
+                          [(shard, num_workers, shard_by, num_steps, batch_size, deterministic)
+                           for shard in range(num_workers)])
+    confusion_matrix = np.zeros((NUM_OF_RATINGS, NUM_OF_RATINGS), dtype=np.int64)
+    predict_seconds = 0.
+    for shard_confusion_matrix, shard_predict_seconds in shards:
+        confusion_matrix += shard_confusion_matrix
+        predict_seconds += shard_predict_seconds
+    results = _summarize(confusion_matrix=confusion_matrix, start_time=start_time,
+                         predict_seconds=predict_seconds)
+    results['num_of_workers'] = num_workers
+    return results
+
+
+def get_shard_rows(env: RecoEnv, shard: int, num_of_shards: int, shard_by: str = 'rows',
+                   num_steps: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Get the rating rows of one shard of the environment's next steps
+
+    :param shard: index of the shard (0 to `num_of_shards` - 1)
+    :param shard_by: 'rows' (contiguous range of steps) or 'user' (steps scored
+        against the ratings of the users with `user_id % num_of_shards == shard`)
+    :return: (observation rows, rated rows) of the shard (see `get_step_rows()`)
+    """
+    observation_rows, rated_rows = get_step_rows(env=env, num_steps=num_steps)
+    if shard_by == 'rows':
+        bounds = np.linspace(0, rated_rows.shape[0], num_of_shards + 1).astype(np.int64)
+        index = slice(bounds[shard], bounds[shard + 1])
+    elif shard_by == 'user':
+        user_ids = env.unwrapped.data[rated_rows, 0].astype(np.int64)
+        index = user_ids % num_of_shards == shard
+    else:
+        raise ValueError(f'Unknown shard_by {shard_by}. Choose one of {SHARD_MODES}.')
+    return observation_rows[index], rated_rows[index]
+
+
+def _init_worker(model: Union[str, Callable[[], 'ActorCriticRLModel']],
+                 features_directory: str, env_kwargs: Dict) -> None:
+    """
+    Load the agent and attach to the features once per worker process
+    """
+    if isinstance(model, str):
+        from stable_baselines import PPO2  # only needed for saved agents
+        _worker['model'] = PPO2.load(model)
+    else:
+        _worker['model'] = model()
+    _worker['env'] = RecoEnv(features=RecoFeatures.load(directory=features_directory),
+                             **env_kwargs)
+
+
+def _evaluate_shard(task: Tuple[int, int, str, Optional[int], int, bool]
+                    ) -> Tuple[np.ndarray, float]:
+    """
+    Score the steps of one shard in batches in a worker process
+    """
+    shard, num_of_shards, shard_by, num_steps, batch_size, deterministic = task
+    env = _worker['env']
+    observation_rows, rated_rows = get_shard_rows(env=env, shard=shard,
+                                                  num_of_shards=num_of_shards,
+                                                  shard_by=shard_by, num_steps=num_steps)
+    confusion_matrix = np.zeros((NUM_OF_RATINGS, NUM_OF_RATINGS), dtype=np.int64)
+    predict_seconds = 0.
+    for start in range(0, rated_rows.shape[0], batch_size):
+        batch_confusion_matrix, batch_predict_seconds = _evaluate_batch(
+            model=_worker['model'],
+            observations=env.get_observations(rows=observation_rows[start:start + batch_size]),
+            ratings=env.data[rated_rows[start:start + batch_size], 2],
+            deterministic=deterministic)
+        confusion_matrix += batch_confusion_matrix
+        predict_seconds += batch_predict_seconds
+    return confusion_matrix, predict_seconds
+
+
+def _evaluate_batch(model: 'ActorCriticRLModel', observations: np.ndarray,
+                    ratings: np.ndarray, deterministic: bool) -> Tuple[np.ndarray, float]:
+    """
+    Score one batch of steps
+
+    :return: confusion matrix (see `get_confusion_matrix()`) and the seconds
+        spent in `model.predict()`
+    """
+    predict_start_time = perf_counter()
+    actions, _states = model.predict(observations, deterministic=deterministic)
+    predict_seconds = perf_counter() - predict_start_time
+    return get_confusion_matrix(ratings=ratings, actions=np.asarray(actions)), predict_seconds
+
+
+def _summarize(confusion_matrix: np.ndarray, start_time: float,
+               predict_seconds: float) -> Dict:
+    """
+    Evaluation results with the timings of an evaluation that began at `start_time`
+    """
+    results = get_evaluation_results(confusion_matrix=confusion_matrix)
+    results['elapsed_seconds'] = perf_counter() - start_time
+    results['predict_seconds'] = predict_seconds
+    results['rows_per_second'] = results['num_of_rows'] / max(results['elapsed_seconds'],
+                                                             1e-9)
+    return results
+
+
+def get_confusion_matrix(ratings: np.ndarray, actions: np.ndarray) -> np.ndarray:
+    """
+    Count every (rating, predicted rating) pair
+
+    :param ratings: users' ratings (1-5)
+    :param actions: agent's actions (0-4, i.e., predicted rating - 1)
+    :return: int64 array where [rating - 1, action] is the number of predictions
+    """
+    pairs = (ratings.astype(np.int64) - 1) * NUM_OF_RATINGS + actions.astype(np.int64)
+    return np.bincount(pairs.ravel(), minlength=NUM_OF_RATINGS * NUM_OF_RATINGS) \
+        .reshape(NUM_OF_RATINGS, NUM_OF_RATINGS)
+
+
+def get_evaluation_results(confusion_matrix: np.ndarray) -> Dict:
+    """
+    Summarize a confusion matrix into evaluation results.
+
+    All results are derived from the integer counts, so confusion matrices of
+    separate batches (or processes) can be added up before summarizing.
+
+    :return: Dictionary with
+        num_of_rows: number of predictions
+        total_correct_predictions: number of predictions equal to the rating
+        accuracy: total_correct_predictions / num_of_rows
+        total_reward / mean_reward: sum and average of the rewards
+        confusion_matrix: [rating - 1, action] counts
+        per_rating: count, accuracy and mean_reward for each rating (1-5)
+    """
+    rewards = confusion_matrix * REWARD_TABLE.T
+    counts = confusion_matrix.sum(axis=1)
+    correct = np.diag(confusion_matrix)
+    num_of_rows = int(counts.sum())
+    total_correct_predictions = int(correct.sum())
+    total_reward = float(rewards.sum())
+    per_rating = dict()
+    for rating_index in range(NUM_OF_RATINGS):
+        count = int(counts[rating_index])
+        per_rating[rating_index + 1] = dict(
+            count=count,
+            accuracy=correct[rating_index] / count if count else 0.,
+            mean_reward=rewards[rating_index].sum() / count if count else 0.)
+    return dict(num_of_rows=num_of_rows,
+                total_correct_predictions=total_correct_predictions,
+                accuracy=total_correct_predictions / num_of_rows if num_of_rows else 0.,
+                total_reward=total_reward,
+                mean_reward=total_reward / num_of_rows if num_of_rows else 0.,
+                confusion_matrix=confusion_matrix,
+                per_rating=per_rating)
+
+
+def print_evaluation_results(results: Dict) -> None:
+    """
+    Print the results of `evaluate_batched()` or `evaluate_sharded()`
+    """
+    print("**************EVALUATION****************")
+    print(f"Total steps = {results['num_of_rows']} | "
+          f"steps/second = {results['rows_per_second']:,.2f} | "
+          f"elapsed = {results['elapsed_seconds']:.3f} seconds "
+          f"(model.predict = {results['predict_seconds']:.3f} seconds)")
+    print(f"Total correct predictions = {results['total_correct_predictions']}")
+    print(f"Prediction accuracy = {results['accuracy']:.4f}")
+    print(f"Mean reward = {results['mean_reward']:.4f}")
+    for rating, stats in results['per_rating'].items():
+        print(f"  rating={rating} | count={stats['count']} | "
+              f"accuracy={stats['accuracy']:.4f} | mean_reward={stats['mean_reward']:.4f}")
+    print(f"Confusion matrix (rows = rating, columns = predicted rating):\n"
+          f"{results['confusion_matrix']}")
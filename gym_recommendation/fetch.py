@@ -0,0 +1,246 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+
+from gym_recommendation.cache import atomic_directory
+
+# Where the MovieLens zip files are downloaded from when no mirror is configured
+DEFAULT_MIRROR = 'http://files.grouplens.org/datasets/movielens'
+# Environment variable with the default mirror: a local directory, a `file://`
+# URL or an HTTP(S) URL holding `<dataset>.zip` (and optionally `<dataset>.zip.md5`)
+MIRROR_ENVIRONMENT_VARIABLE = 'GYM_RECOMMENDATION_MIRROR'
+# Size of the chunks streamed to disk (and hashed)
+CHUNK_SIZE = 1 << 20
+
+
+def get_mirror(mirror: Optional[str] = None) -> str:
+    """
+    Mirror to fetch data sets from: `mirror`, else the `GYM_RECOMMENDATION_MIRROR`
+    environment variable, else the GroupLens server
+    """
+    return mirror or os.environ.get(MIRROR_ENVIRONMENT_VARIABLE) or DEFAULT_MIRROR
+
+
+def get_local_path(location: str) -> Optional[str]:
+    """
+    File system path of a local path or `file://` URL (None for remote URLs)
+    """
+    parsed = urlparse(location)
+    if parsed.scheme == 'file':
+        return url2pathname(parsed.path)
+    if parsed.scheme in ('http', 'https'):
+        return None
+    return location
+
+
+@contextmanager
+def file_lock(path: str) -> Iterator[None]:
+    """
+    Context manager holding an exclusive lock on `path`, so concurrent processes
+    (e.g., workers that start at the same time) fetch a data set only once
+    """
+    with open(path, 'a') as f:
+        try:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        except ImportError:  # Windows
+            import msvcrt
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        try:
+            yield
+        finally:
+            try:
+                import fcntl
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            except ImportError:
+                import msvcrt
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def get_md5(file_path: str) -> str:
+    """
+    MD5 checksum of a file (the checksum published with the MovieLens zip files)
+    """
+    md5 = hashlib.md5()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+def print_progress(num_of_bytes: int, total_bytes: Optional[int]) -> None:
+    """
+    Default progress callback of `stream_to_file()`
+    """
+    if total_bytes:
+        print(f'\rDownloaded {num_of_bytes / 1e6:,.1f} of {total_bytes / 1e6:,.1f} MB '
+              f'({num_of_bytes / total_bytes:.0%})', end='\n' if num_of_bytes >= total_bytes
+              else '', flush=True)
+    else:
+        print(f'\rDownloaded {num_of_bytes / 1e6:,.1f} MB', end='', flush=True)
+
+
+def stream_to_file(source: str, file_path: str, timeout: float = 30.,
+                   progress: Optional[Callable[[int, Optional[int]], None]] = print_progress
+                   ) -> None:
+    """
+    Copy a local file or download a URL to `file_path` in chunks, resuming from
+    the bytes already in `file_path` (i.e., a partial download)
+
+    :param source: local path, `file://` URL or HTTP(S) URL
+    :param timeout: seconds to wait for the server to connect or send data
+    :param progress: called with (bytes written, total bytes or None) after every chunk
+    """
+    position = os.path.getsize(file_path) if os.path.exists(file_path) else 0
+    local_path = get_local_path(source)
+    if local_path is not None:
+        total_bytes = os.path.getsize(local_path)
+        with open(local_path, 'rb') as source_file, open(file_path, 'ab') as f:
+            source_file.seek(min(position, total_bytes))
+            f.truncate(min(position, total_bytes))
+            for chunk in iter(lambda: source_file.read(CHUNK_SIZE), b''):
+                f.write(chunk)
+                if progress is not None:
+                    progress(f.tell(), total_bytes)
+        return
+
+    import requests  # only needed when the data set is not available yet
+
+    headers = {'Range': f'bytes={position}-'} if position > 0 else {}
+    with requests.get(source, headers=headers, stream=True, timeout=timeout) as response:
+        if response.status_code == 416:  # the partial download is already complete
+            return
+        response.raise_for_status()
+        if response.status_code != 206:  # the server ignored the range: start over
+            position = 0
+        content_length = response.headers.get('Content-Length')
+        total_bytes = position + int(content_length) if content_length else None
+        with open(file_path, 'ab') as f:
+            f.truncate(position)
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                f.write(chunk)
+                if progress is not None:
+                    progress(f.tell(), total_bytes)
+
+
+def get_expected_md5(source: str, timeout: float = 30.) -> Optional[str]:
+    """
+    Read the `<source>.md5` checksum file published next to a zip file
+
+    :return: MD5 checksum, or None if the mirror has no checksum file
+    """
+    md5_source = source + '.md5'
+    local_path = get_local_path(md5_source)
+    try:
+        if local_path is not None:
+            with open(local_path) as f:
+                text = f.read()
+        else:
+            import requests
+            response = requests.get(md5_source, timeout=timeout)
+            if response.status_code != 200:
+                return None
+            text = response.text
+    except OSError:
+        return None
+    # formats: "<md5>  ml-100k.zip" (md5sum) or "MD5 (ml-100k.zip) = <md5>" (BSD)
+    words = text.replace('=', ' ').split()
+    checksums = [word.lower() for word in words
+                 if len(word) == 32 and all(c in '0123456789abcdefABCDEF' for c in word)]
+    return checksums[0] if checksums else None
+
+
+def fetch_dataset(dataset: str,
+                  data_directory: str,
+                  directory: str,
+                  mirror: Optional[str] = None,
+                  checksum: Optional[str] = None,
+                  retries: int = 3,
+                  timeout: float = 30.,
+                  progress: Optional[Callable[[int, Optional[int]], None]] = print_progress
+                  ) -> str:
+    """
+    Fetch `<dataset>.zip` from a mirror and extract it into `data_directory`,
+    unless `data_directory/directory` already exists.
+
+    The zip file is streamed to `<dataset>.zip.part` (resumed after interruptions
+    and retried with exponential backoff), verified against `checksum` or the
+    mirror's `<dataset>.zip.md5` file, and extracted into a temporary directory
+    that is moved into place, so an interrupted fetch never leaves a directory
+    that looks complete. A lock file serializes concurrent callers.
+
+    :param dataset: name of the zip file (e.g., 'ml-100k')
+    :param data_directory: directory the zip file is extracted into
+    :param directory: directory created by the zip file (e.g., 'ml-10M100K')
+    :param mirror: local directory, `file://` URL or HTTP(S) URL holding the
+        zip files (see `get_mirror()`)
+    :param checksum: expected MD5 of the zip file (None = use the mirror's `.md5` file)
+    :param retries: number of attempts to download the zip file
+    :param timeout: seconds to wait for the server to connect or send data
+    :return: path of the extracted data set
+    """
+    target = os.path.join(data_directory, directory)
+    if os.path.exists(target):
+        return target
+    os.makedirs(data_directory, exist_ok=True)
+    with file_lock(os.path.join(data_directory, f'.{dataset}.lock')):
+        if os.path.exists(target):  # fetched by another process while waiting
+            return target
+        mirror = get_mirror(mirror=mirror)
+        local_mirror = get_local_path(mirror)
+        source = os.path.join(local_mirror, f'{dataset}.zip') if local_mirror is not None \
+            else f"{mirror.rstrip('/')}/{dataset}.zip"
+        zip_file_path = os.path.join(data_directory, f'{dataset}.zip')
+        part_file_path = zip_file_path + '.part'
+        print(f'Fetching {source} into {data_directory}')
+
+        for attempt in range(retries):
+            try:
+                stream_to_file(source=source, file_path=part_file_path,
+                               timeout=timeout, progress=progress)
+                break
+            except OSError as error:  # includes requests' exceptions
+                if attempt + 1 == retries:
+                    raise
+                print(f'fetch_dataset() --> attempt {attempt + 1} failed ({error}), '
+                      f'retrying in {2 ** attempt} seconds...')
+                time.sleep(2 ** attempt)
+
+        expected_md5 = checksum or get_expected_md5(source=source, timeout=timeout)
+        if expected_md5 is None:
+            print(f'fetch_dataset() --> no checksum available for {source}, '
+                  f'skipping verification')
+        else:
+            actual_md5 = get_md5(part_file_path)
+            if actual_md5 != expected_md5.lower():
+                os.remove(part_file_path)
+                raise ValueError(f'Checksum mismatch for {source}: expected '
+                                 f'{expected_md5}, got {actual_md5}.')
+        os.replace(part_file_path, zip_file_path)
+
+        with atomic_directory(directory=target) as tmp_directory:
+            extract_directory = tempfile.mkdtemp(dir=data_directory, prefix='.extract-')
+            try:
+                with zipfile.ZipFile(zip_file_path, 'r') as f_zip:
+                    f_zip.extractall(path=extract_directory)
+                extracted = os.path.join(extract_directory, directory)
+                if not os.path.isdir(extracted):
+                    raise ValueError(f'{zip_file_path} does not contain {directory}/.')
+                for name in os.listdir(extracted):
+                    os.replace(os.path.join(extracted, name), os.path.join(tmp_directory, name))
+            finally:
+                shutil.rmtree(extract_directory, ignore_errors=True)
+    return target
@@ -0,0 +1,256 @@
+import asyncio
+import os
+import socket
+import threading
+from typing import List, Optional, Set, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from .envs.features import RecoFeatures
+from .envs.reco_vec_env import RecoVecEnv
+from .envs.remote_env import HELLO, NO_SLOT, OP_CLOSE, OP_RESET, OP_STEP, REQUEST, \
+    RESPONSE, STATUS_ERROR, STATUS_OK, get_response_size
+
+# Address of a TCP server (host, port) or path of a Unix socket
+Address = Union[Tuple[str, int], str]
+
+
+class EnvServer(object):
+    """
+    asyncio server that lets many remote actors (see `envs.RemoteEnv`) step one
+    shared data set.
+
+    Every connection is given a slot of a `RecoVecEnv`. Step requests that
+    arrive within `batch_window` seconds of each other are coalesced into one
+    `RecoVecEnv.step_slots()` call, which computes all their observations and
+    rewards at once; a batch is stepped without waiting once every connected
+    actor has a request in it (or `max_batch_size` is reached).
+    """
+
+    def __init__(self,
+                 data: pd.DataFrame = None,
+                 item: pd.DataFrame = None,
+                 user: pd.DataFrame = None,
+                 features: RecoFeatures = None,
+                 max_actors: int = 64,
+                 batch_window: float = 0.001,
+                 max_batch_size: int = None,
+                 precompute: bool = True,
+                 stagger: bool = False,
+                 observation_mode: str = 'dense'):
+        """
+        Parameterized constructor
+
+        :param features: lookup tables created in advance (see `RecoEnv`)
+        :param max_actors: number of slots (i.e., actors connected at the same time)
+        :param batch_window: seconds to wait for more step requests before stepping
+            a batch that does not include every connected actor
+        :param max_batch_size: number of step requests that are stepped without
+            waiting (None = `max_actors`)
+        :param precompute: if True, create the observation for every rating row
+            at construction (see `RecoVecEnv`)
+        :param stagger: if True, the episodes of every slot start at an evenly
+            spaced row; by default every actor steps from the first row, like `RecoEnv`
+        :param observation_mode: 'dense' or 'compact' observations (see `RecoEnv`)
+        """
+        self.vec_env = RecoVecEnv(data=data, item=item, user=user, features=features,
+                                  num_envs=max_actors, precompute=precompute,
+                                  stagger=stagger, observation_mode=observation_mode)
+        self.max_actors = max_actors
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size or max_actors
+        self.observation_size = self.vec_env.observation_space.shape[0]
+        self.num_of_actions = self.vec_env.action_space.n
+        # slots that are not used by a connection (lowest slot first)
+        self.free_slots = list(range(max_actors - 1, -1, -1))  # type: List[int]
+        # step requests waiting for the next batch: (slot, action, future)
+        self.pending = []  # type: List[Tuple[int, int, asyncio.Future]]
+        self.num_of_steps = 0
+        self.num_of_batches = 0
+        self.address = None  # type: Optional[Address]
+        self._server = None  # type: Optional[asyncio.AbstractServer]
+        self._writers = set()  # type: Set[asyncio.StreamWriter]
+        self._flush_handle = None  # type: Optional[asyncio.TimerHandle]
+        self._loop = None  # type: Optional[asyncio.AbstractEventLoop]
+        self._thread = None  # type: Optional[threading.Thread]
+        self._error_response = RESPONSE.pack(STATUS_ERROR, 0, 0.) + \
+            bytes(get_response_size(self.observation_size) - RESPONSE.size)
+
+    async def start(self, address: Address = ('127.0.0.1', 0)) -> Address:
+        """
+        Start accepting connections in the running event loop
+
+        :param address: (host, port) to listen on (port 0 = any free port), or the
+            path of a Unix socket
+        :return: address the server listens on
+        """
+        self._loop = asyncio.get_event_loop()
+        if isinstance(address, str):
+            if os.path.exists(address):
+                os.remove(address)
+            self._server = await asyncio.start_unix_server(self._handle, path=address)
+            self.address = address
+        else:
+            host, port = address
+            self._server = await asyncio.start_server(self._handle, host=host, port=port)
+            self.address = self._server.sockets[0].getsockname()[:2]
+        return self.address
+
+    async def close(self) -> None:
+        """
+        Stop accepting connections and disconnect every actor
+        """
+        if self._server is None:
+            return
+        self._server.close()
+        for writer in list(self._writers):
+            writer.close()
+        await self._server.wait_closed()
+        self._server = None
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.remove(self.address)
+
+    def serve_forever(self, address: Address = ('127.0.0.1', 5000)) -> None:
+        """
+        Run the server in the current thread until it is interrupted
+        """
+        async def serve() -> None:
+            print(f'EnvServer listening on {await self.start(address=address)}')
+            await self._server.serve_forever()
+
+        asyncio.run(serve())
+
+    def start_in_background(self, address: Address = ('127.0.0.1', 0)) -> Address:
+        """
+        Run the server in a daemon thread with its own event loop (e.g., next to
+        a learner in the same process), until `stop()` is called
+
+        :return: address the server listens on
+        """
+        loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def run() -> None:
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(self.start(address=address))
+            started.set()
+            loop.run_forever()
+            loop.run_until_complete(self.close())
+            tasks = asyncio.all_tasks(loop)
+            for task in tasks:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            loop.close()
+
+        self._thread = threading.Thread(target=run, name='EnvServer', daemon=True)
+        self._thread.start()
+        started.wait()
+        return self.address
+
+    def stop(self) -> None:
+        """
+        Stop a server started with `start_in_background()`
+        """
+        if self._thread is None:
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._thread = None
+
+    def get_mean_batch_size(self) -> float:
+        """
+        Average number of step requests coalesced into one batch
+        """
+        return self.num_of_steps / max(self.num_of_batches, 1)
+
+    async def _handle(self, reader: asyncio.StreamReader,
+                      writer: asyncio.StreamWriter) -> None:
+        """
+        Serve the requests of one actor until it disconnects
+        """
+        connection = writer.get_extra_info('socket')
+        if connection is not None and connection.family in (socket.AF_INET, socket.AF_INET6):
+            connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if not self.free_slots:
+            writer.write(HELLO.pack(NO_SLOT, 0, 0, 0., 0.))
+            writer.close()
+            return
+        slot = self.free_slots.pop()
+        self._writers.add(writer)
+        # a new actor starts the slot's first episode
+        self.vec_env.episode_number[slot] = 0
+        self.vec_env.reset_slots(slots=np.array([slot]))
+        observation_space = self.vec_env.observation_space
+        writer.write(HELLO.pack(slot, self.observation_size, self.num_of_actions,
+                                float(observation_space.low.min()),
+                                float(observation_space.high.max())))
+        try:
+            while True:
+                opcode, action = REQUEST.unpack(await reader.readexactly(REQUEST.size))
+                if opcode == OP_STEP and 0 <= action < self.num_of_actions:
+                    response = await self._step(slot=slot, action=action)
+                elif opcode == OP_RESET:
+                    observation = self.vec_env.reset_slots(slots=np.array([slot]))[0]
+                    response = RESPONSE.pack(STATUS_OK, 0, 0.) + \
+                        observation.astype(np.float32).tobytes()
+                elif opcode == OP_CLOSE:
+                    break
+                else:
+                    response = self._error_response
+                writer.write(response)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass  # the actor disconnected
+        finally:
+            self._writers.discard(writer)
+            self.free_slots.append(slot)
+            writer.close()
+
+    async def _step(self, slot: int, action: int) -> bytes:
+        """
+        Add a step request to the next batch and wait for its response
+        """
+        future = self._loop.create_future()
+        self.pending.append((slot, action, future))
+        if len(self.pending) >= min(self.max_batch_size, len(self._writers)):
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = self._loop.call_later(self.batch_window, self._flush)
+        try:
+            return await future
+        except Exception:
+            return self._error_response
+
+    def _flush(self) -> None:
+        """
+        Step every pending request in one batch and answer them
+        """
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        pending, self.pending = self.pending, []
+        if not pending:
+            return
+        slots = np.array([request[0] for request in pending], dtype=np.int64)
+        actions = np.array([request[1] for request in pending], dtype=np.int64)
+        try:
+            observations, rewards, dones, infos = self.vec_env.step_slots(slots=slots,
+                                                                          actions=actions)
+        except Exception as error:
+            print(f'EnvServer failed to step slots {slots.tolist()}: {error!r}')
+            # every actor of the batch is answered with an error response
+            for _, _, future in pending:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        observations = observations.astype(np.float32, copy=False)
+        self.num_of_steps += len(pending)
+        self.num_of_batches += 1
+        for index, (_, _, future) in enumerate(pending):
+            done = bool(dones[index])
+            # like RecoEnv, the last step of an episode returns the last observation
+            observation = infos[index]['terminal_observation'] if done \
+                else observations[index]
+            if not future.done():
+                future.set_result(RESPONSE.pack(STATUS_OK, done, float(rewards[index])) +
+                                  observation.astype(np.float32, copy=False).tobytes())
@@ -0,0 +1,199 @@
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from time import perf_counter
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Ways of choosing the trials of a sweep (see `get_trials()`)
+SEARCH_MODES = ('grid', 'random')
+
+
+def get_trials(spec: Dict) -> List[Dict[str, Any]]:
+    """
+    Create the hyperparameters of every trial of a sweep.
+
+    Spec format (e.g., loaded from a JSON file):
+      {"search": "grid", "parameters": {"learning_rate": [3e-4, 1e-3], "n_steps": [64, 128]}}
+      {"search": "random", "num_of_trials": 8, "seed": 1,
+       "parameters": {"learning_rate": {"low": 1e-5, "high": 1e-2, "log": true},
+                      "num_of_neurons": [32, 64, 128]}}
+
+    Grid searches take every combination of the listed values. Random searches
+    draw every parameter independently: one of the listed values, or a value
+    between `low` and `high` (log-uniform with `"log": true`; integers if both
+    bounds are integers).
+
+    :return: one dictionary of hyperparameters per trial
+    """
+    search = spec.get('search', 'grid')
+    parameters = spec['parameters']
+    names = sorted(parameters.keys())
+    if search == 'grid':
+        for name in names:
+            if not isinstance(parameters[name], list):
+                raise ValueError(f'Grid search parameter {name} must be a list of values.')
+        return [dict(zip(names, values))
+                for values in itertools.product(*[parameters[name] for name in names])]
+    if search == 'random':
+        random_state = np.random.RandomState(seed=spec.get('seed', 1))
+        return [dict((name, _sample_parameter(parameters[name], random_state=random_state))
+                     for name in names)
+                for _ in range(spec['num_of_trials'])]
+    raise ValueError(f'Unknown search {search}. Choose one of {SEARCH_MODES}.')
+
+
+def get_trial_id(params: Dict[str, Any], fixed_params: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Identifier of a trial, derived from all of its settings: the swept `params`
+    and the `fixed_params` shared by every trial (so a resumed sweep recognizes
+    the trials it already finished, but not the ones run with other settings)
+    """
+    settings = dict(fixed_params or dict(), **params)
+    return hashlib.sha1(json.dumps(settings, sort_keys=True,
+                                   default=str).encode()).hexdigest()[:12]
+
+
+def get_num_of_workers(cores_per_trial: int = 1, num_workers: Optional[int] = None) -> int:
+    """
+    Number of trials to run at the same time: `num_workers` if given, else as many
+    trials as fit on the CPUs with `cores_per_trial` cores each
+    """
+    if num_workers:
+        return num_workers
+    return max(1, (os.cpu_count() or 1) // max(1, cores_per_trial))
+
+
+def load_results(results_path: str) -> pd.DataFrame:
+    """
+    Load the results table of a sweep (one row per finished or failed trial).
+
+    Lines that cannot be parsed (e.g., a record cut off by an interruption) are skipped.
+    """
+    records = []
+    if os.path.exists(results_path):
+        with open(results_path) as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+    return pd.DataFrame.from_records(records)
+
+
+def get_finished_trial_ids(results_path: str) -> Set[str]:
+    """
+    Identifiers of the trials that finished successfully in earlier runs
+    """
+    results = load_results(results_path=results_path)
+    if results.empty:
+        return set()
+    return set(results.loc[results['status'] == 'ok', 'trial_id'])
+
+
+def run_sweep(trial_function: Callable[[Dict[str, Any]], Dict[str, Any]],
+              trials: List[Dict[str, Any]],
+              results_path: str,
+              num_workers: int = 1,
+              initializer: Optional[Callable] = None,
+              initargs: Tuple = (),
+              start_method: str = 'spawn',
+              fixed_params: Optional[Dict[str, Any]] = None) -> pd.DataFrame:
+    """
+    Run the trials of a sweep in a pool of worker processes.
+
+    Every finished trial is appended to `results_path` (JSON lines) as soon as it
+    completes, so an interrupted sweep resumes by calling `run_sweep()` again:
+    trials that already finished are skipped, and failed trials are retried.
+
+    :param trial_function: picklable function (e.g., defined at module level) that
+        runs one trial with its hyperparameters and returns its metrics
+    :param trials: hyperparameters of every trial (see `get_trials()`)
+    :param results_path: JSON-lines file holding one record per trial
+    :param num_workers: number of trials run at the same time (see `get_num_of_workers()`)
+    :param initializer: called once in every worker process (e.g., to attach to a
+        shared data set), with `initargs`
+    :param start_method: multiprocessing start method of the workers
+    :param fixed_params: settings shared by every trial, which are part of the
+        trial ids (see `get_trial_id()`)
+    :return: results table of all trials (see `load_results()`)
+    """
+    finished = get_finished_trial_ids(results_path=results_path)
+    pending = [params for params in trials
+               if get_trial_id(params, fixed_params=fixed_params) not in finished]
+    print(f'run_sweep() --> {len(trials) - len(pending)} of {len(trials)} trials already '
+          f'finished, running {len(pending)} with {num_workers} workers')
+    if pending:
+        directory = os.path.dirname(os.path.abspath(results_path))
+        os.makedirs(directory, exist_ok=True)
+        context = multiprocessing.get_context(start_method)
+        with ProcessPoolExecutor(max_workers=num_workers, mp_context=context,
+                                 initializer=initializer, initargs=initargs) as executor, \
+                open(results_path, 'a') as f:
+            if f.tell() > 0 and not _ends_with_newline(results_path):
+                f.write('\n')  # the last record was cut off by an interruption
+            futures = dict((executor.submit(_run_trial, trial_function, params,
+                                            fixed_params), params)
+                           for params in pending)
+            for future in as_completed(futures):
+                record = future.result()
+                f.write(json.dumps(record, default=_to_json) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+                print(f"run_sweep() --> trial {record['trial_id']} {record['status']} "
+                      f"in {record['wall_seconds']:.1f} seconds")
+    return load_results(results_path=results_path)
+
+
+def _run_trial(trial_function: Callable[[Dict[str, Any]], Dict[str, Any]],
+               params: Dict[str, Any],
+               fixed_params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Run one trial in a worker process and create its results record
+    """
+    start_time = perf_counter()
+    record = dict(trial_id=get_trial_id(params, fixed_params=fixed_params), **params)
+    try:
+        record.update(trial_function(params))
+        record['status'] = 'ok'
+    except Exception as error:
+        record['status'] = 'failed'
+        record['error'] = repr(error)
+    record['wall_seconds'] = perf_counter() - start_time
+    return record
+
+
+def _ends_with_newline(file_path: str) -> bool:
+    with open(file_path, 'rb') as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b'\n'
+
+
+def _to_json(value: Any) -> Any:
+    """
+    Convert the NumPy values of a results record (e.g., np.float32 metrics)
+    """
+    if isinstance(value, (np.generic, np.ndarray)):
+        return value.tolist()
+    return str(value)
+
+
+def _sample_parameter(values: Any, random_state: np.random.RandomState) -> Any:
+    """
+    Draw a value of a random search parameter (see `get_trials()`)
+    """
+    if isinstance(values, list):
+        return values[random_state.randint(len(values))]
+    low, high = values['low'], values['high']
+    if values.get('log', False):
+        value = float(np.exp(random_state.uniform(np.log(low), np.log(high))))
+    else:
+        value = float(random_state.uniform(low, high))
+    if isinstance(low, int) and isinstance(high, int):
+        return int(min(round(value), high))
+    return value
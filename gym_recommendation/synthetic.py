@@ -0,0 +1,226 @@
+import os
+from typing import Dict, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+from .datasets import MovieLensLoader
+from .envs.features import RecoFeatures, get_movie_genre_table
+from .utils import CWD, DATA_HEADER, ITEM_HEADER, USER_HEADER, convert_header_to_camel_case
+
+# Occupations of the MovieLens 100k users (`u.occupation`)
+OCCUPATIONS = ('administrator', 'artist', 'doctor', 'educator', 'engineer', 'entertainment',
+               'executive', 'healthcare', 'homemaker', 'lawyer', 'librarian', 'marketing',
+               'none', 'other', 'programmer', 'retired', 'salesman', 'scientist', 'student',
+               'technician', 'writer')
+# First and last timestamps of the MovieLens 100k ratings
+TIMESTAMP_RANGE = (874724710, 893286638)
+# Number of rating rows generated from one seed, so rows do not depend on the chunk size
+BLOCK_SIZE = 1 << 20
+
+
+class SyntheticLoader(MovieLensLoader):
+    """
+    Random data set with the schema of MovieLens 100k, for testing at any size
+    without downloading anything.
+
+    Users and movies are drawn with power-law (Zipf) popularity, so a few users
+    and movies account for most ratings like in MovieLens. Ratings are
+    3.5 + user bias + movie bias + noise, rounded and clipped to 1-5 stars, and
+    timestamps increase with the row number. Every table is generated with
+    vectorized NumPy from `seed`; rating rows are generated in blocks of
+    `BLOCK_SIZE` with their own seeds, so any range of rows is generated on
+    its own (see `generate_ratings()`). (user_id, item_id) pairs may repeat.
+    """
+    name = 'synthetic'
+
+    def __init__(self,
+                 num_of_ratings: int = 100000,
+                 num_of_users: int = 943,
+                 num_of_movies: int = 1682,
+                 seed: int = 1,
+                 user_exponent: float = 0.8,
+                 movie_exponent: float = 1.0,
+                 data_directory: str = CWD):
+        """
+        Parameterized constructor (defaults to the size of MovieLens 100k)
+
+        :param user_exponent: Zipf exponent of the user popularity
+            (0 = uniform; larger values concentrate the ratings on fewer users)
+        :param movie_exponent: Zipf exponent of the movie popularity
+        """
+        super(SyntheticLoader, self).__init__(data_directory=data_directory)
+        self.num_of_ratings = num_of_ratings
+        self.num_of_users = num_of_users
+        self.num_of_movies = num_of_movies
+        self.seed = seed
+        self.user_exponent = user_exponent
+        self.movie_exponent = movie_exponent
+        random_state = np.random.RandomState(seed=seed)
+        # index of the user/movie at every popularity rank, so popular ids are spread out
+        self.user_ranking = random_state.permutation(num_of_users)
+        self.movie_ranking = random_state.permutation(num_of_movies)
+        self.user_bias = random_state.normal(0., 0.5, num_of_users)
+        self.movie_bias = random_state.normal(0., 0.7, num_of_movies)
+
+    def download(self) -> None:
+        pass
+
+    def count_ratings(self) -> int:
+        return self.num_of_ratings
+
+    def read_ratings(self, chunksize: int) -> Iterator[pd.DataFrame]:
+        for start in range(0, self.num_of_ratings, chunksize):
+            end = min(start + chunksize, self.num_of_ratings)
+            yield pd.DataFrame(self.generate_ratings(start=start, end=end),
+                               columns=convert_header_to_camel_case(DATA_HEADER))
+
+    def read_movies(self) -> pd.DataFrame:
+        """
+        Movies with the columns of `ITEM_HEADER` (i.e., genre flags instead of
+        '|' separated genre names, see `_get_movie_genre_table()`)
+        """
+        return self.generate_item()
+
+    def read_users(self) -> Optional[pd.DataFrame]:
+        return self.generate_user()
+
+    def generate_ratings(self, start: int = 0, end: int = None) -> np.ndarray:
+        """
+        Generate the rating rows `start` to `end` (exclusive)
+
+        :return: int64 array of (user_id, item_id, rating, timestamp) rows
+        """
+        end = self.num_of_ratings if end is None else min(end, self.num_of_ratings)
+        rows = np.empty((max(end - start, 0), 4), dtype=np.int64)
+        for block_index in range(start // BLOCK_SIZE, (end - 1) // BLOCK_SIZE + 1):
+            block_start = block_index * BLOCK_SIZE
+            block = self._generate_block(block_index=block_index)
+            first, last = max(start, block_start), min(end, block_start + block.shape[0])
+            rows[first - start:last - start] = block[first - block_start:last - block_start]
+        return rows
+
+    def generate_item(self) -> pd.DataFrame:
+        """
+        Generate the movies with the columns of `ITEM_HEADER`: every movie has one
+        to a few genre flags
+        """
+        random_state = np.random.RandomState(seed=[self.seed, 1])
+        columns = convert_header_to_camel_case(ITEM_HEADER)
+        num_of_genres = len(columns) - 5
+        genres = (random_state.random_sample((self.num_of_movies, num_of_genres)) <
+                  1.5 / num_of_genres).astype(np.int64)
+        genres[np.arange(self.num_of_movies),
+               random_state.randint(1, num_of_genres, self.num_of_movies)] = 1
+        movie_ids = np.arange(1, self.num_of_movies + 1)
+        item = pd.DataFrame(genres, columns=columns[5:])
+        item.insert(0, 'movie_id', movie_ids)
+        item.insert(1, 'movie_title', pd.Series(movie_ids).map('Movie {}'.format))
+        item.insert(2, 'release_date', '01-Jan-1995')
+        item.insert(3, 'video_release_date', np.nan)
+        item.insert(4, 'IMDb_URL', '')
+        return item
+
+    def generate_user(self) -> pd.DataFrame:
+        """
+        Generate the users with the columns of `USER_HEADER`
+        """
+        random_state = np.random.RandomState(seed=[self.seed, 2])
+        columns = convert_header_to_camel_case(USER_HEADER)
+        num_of_users = self.num_of_users
+        zip_codes = random_state.randint(0, 100000, num_of_users)
+        return pd.DataFrame(dict(zip(columns, [
+            np.arange(1, num_of_users + 1),
+            random_state.randint(7, 74, num_of_users),
+            np.where(random_state.random_sample(num_of_users) < 0.71, 'M', 'F'),
+            np.array(OCCUPATIONS)[random_state.randint(0, len(OCCUPATIONS), num_of_users)],
+            pd.Series(zip_codes).map('{:05d}'.format).values])))
+
+    def _generate_block(self, block_index: int) -> np.ndarray:
+        """
+        Generate the rating rows of one block (see `BLOCK_SIZE`)
+        """
+        start = block_index * BLOCK_SIZE
+        num_of_rows = min(BLOCK_SIZE, self.num_of_ratings - start)
+        random_state = np.random.RandomState(seed=[self.seed, 3, block_index])
+        user_index = self.user_ranking[self._sample_ranks(
+            num_of_ids=self.num_of_users, exponent=self.user_exponent,
+            uniform=random_state.random_sample(num_of_rows))]
+        movie_index = self.movie_ranking[self._sample_ranks(
+            num_of_ids=self.num_of_movies, exponent=self.movie_exponent,
+            uniform=random_state.random_sample(num_of_rows))]
+        rows = np.empty((num_of_rows, 4), dtype=np.int64)
+        rows[:, 0] = user_index + 1
+        rows[:, 1] = movie_index + 1
+        ratings = 3.5 + self.user_bias[user_index] + self.movie_bias[movie_index] + \
+            random_state.normal(0., 0.9, num_of_rows)
+        rows[:, 2] = np.clip(np.rint(ratings), 1, 5)
+        # evenly spread over the MovieLens 100k time range, in row order
+        first_timestamp, last_timestamp = TIMESTAMP_RANGE
+        seconds_per_row = (last_timestamp - first_timestamp) / max(self.num_of_ratings, 1)
+        rows[:, 3] = first_timestamp + ((np.arange(start, start + num_of_rows) +
+                                         random_state.random_sample(num_of_rows)) *
+                                        seconds_per_row).astype(np.int64)
+        return rows
+
+    @staticmethod
+    def _get_movie_genre_table(movies: pd.DataFrame) -> np.ndarray:
+        return get_movie_genre_table(item=movies)
+
+    @staticmethod
+    def _sample_ranks(num_of_ids: int, exponent: float, uniform: np.ndarray) -> np.ndarray:
+        """
+        Draw popularity ranks (0 = most popular) from a power law with density
+        proportional to 1 / x ** exponent over [1, num_of_ids + 1), by inverting
+        its distribution function, which takes O(1) per draw instead of a search
+        through a table of probabilities
+        """
+        size = num_of_ids + 1.
+        if abs(exponent - 1.) < 1e-9:
+            x = np.power(size, uniform)
+        else:
+            power = 1. - exponent
+            x = np.power(1. + uniform * (size ** power - 1.), 1. / power)
+        return np.minimum(x.astype(np.int64) - 1, num_of_ids - 1)
+
+
+def generate_data_for_env(num_of_ratings: int = 100000,
+                          num_of_users: int = 943,
+                          num_of_movies: int = 1682,
+                          seed: int = 1,
+                          **kwargs) -> Dict[str, pd.DataFrame]:
+    """
+    Helper function to generate a synthetic data set with the schema of
+    `import_data_for_env()` (see `SyntheticLoader`)
+
+    :return: keyword arguments for `RecoEnv` (data, item and user DataFrames)
+    """
+    loader = SyntheticLoader(num_of_ratings=num_of_ratings, num_of_users=num_of_users,
+                             num_of_movies=num_of_movies, seed=seed, **kwargs)
+    return dict(data=pd.DataFrame(loader.generate_ratings(),
+                                  columns=convert_header_to_camel_case(DATA_HEADER)),
+                item=loader.generate_item(),
+                user=loader.generate_user())
+
+
+def generate_features(directory: str = None,
+                      chunksize: int = BLOCK_SIZE,
+                      **kwargs) -> RecoFeatures:
+    """
+    Helper function to generate the features of a synthetic data set.
+
+    With `directory`, ratings are generated chunk by chunk straight into
+    memory-mapped files (see `MovieLensLoader.build_features()`), so data sets
+    larger than memory can be generated, and the features are returned as
+    read-only memory maps. An existing directory is reused as is.
+
+    :param chunksize: number of ratings to generate at a time (multiples of
+        `BLOCK_SIZE` generate every block once)
+    :param kwargs: size and seed of the data set (see `SyntheticLoader`)
+    :return: lookup tables for `RecoEnv(features=...)`
+    """
+    if directory is None:
+        return RecoFeatures.from_dataframes(**generate_data_for_env(**kwargs))
+    if not os.path.exists(os.path.join(directory, 'meta.json')):
+        SyntheticLoader(**kwargs).build_features(directory=directory, chunksize=chunksize)
+    return RecoFeatures.load(directory=directory)
@@ -0,0 +1,71 @@
+import os
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from gym_recommendation.utils import DATA_HEADER, ITEM_HEADER, USER_HEADER, \
+    convert_header_to_camel_case, import_data_for_env
+
+# Small data set in the MovieLens 100k file format bundled with the tests
+# (created with `write_movielens_100k(get_dummy_data(...), SAMPLE_DIRECTORY)`)
+SAMPLE_DIRECTORY = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                                'data', 'ml-100k-sample')
+
+OCCUPATIONS = ['technician', 'other', 'writer', 'executive', 'administrator',
+               'student', 'lawyer', 'educator', 'scientist', 'entertainment']
+
+
+def get_dummy_data(num_of_users: int = 40,
+                   num_of_movies: int = 60,
+                   num_of_ratings: int = 2000,
+                   seed: int = 1) -> Dict[str, pd.DataFrame]:
+    """
+    Create a small random data set with the same schema as `import_data_for_env()`,
+    so test cases can run without downloading MovieLens.
+    """
+    random_state = np.random.RandomState(seed=seed)
+    data = pd.DataFrame(dict(zip(
+        convert_header_to_camel_case(DATA_HEADER),
+        [random_state.randint(1, num_of_users + 1, num_of_ratings),
+         random_state.randint(1, num_of_movies + 1, num_of_ratings),
+         random_state.randint(1, 6, num_of_ratings),
+         np.sort(random_state.randint(874724710, 893286638, num_of_ratings))])))
+
+    item_header = convert_header_to_camel_case(ITEM_HEADER)
+    item = pd.DataFrame(random_state.randint(0, 2, (num_of_movies, len(item_header))),
+                        columns=item_header)
+    item['movie_id'] = np.arange(1, num_of_movies + 1)
+    item['movie_title'] = [f'Movie {i}' for i in item['movie_id']]
+    item['release_date'] = '01-Jan-1995'
+    item['video_release_date'] = np.nan
+    item['IMDb_URL'] = ''
+
+    user = pd.DataFrame(dict(zip(
+        convert_header_to_camel_case(USER_HEADER),
+        [np.arange(1, num_of_users + 1),
+         random_state.randint(7, 74, num_of_users),
+         random_state.choice(['M', 'F'], num_of_users),
+         random_state.choice(OCCUPATIONS, num_of_users),
+         [f'{i:05d}' for i in random_state.randint(0, 99999, num_of_users)]])))
+    return dict(data=data, item=item, user=user)
+
+
+def write_movielens_100k(kwargs: Dict[str, pd.DataFrame], directory: str) -> None:
+    """
+    Write a data set in the MovieLens 100k file format (`u.data`, `u.item`, `u.user`)
+    """
+    os.makedirs(directory, exist_ok=True)
+    kwargs['data'].to_csv(os.path.join(directory, 'u.data'), sep='\t',
+                          header=False, index=False)
+    for label, file_name in [('item', 'u.item'), ('user', 'u.user')]:
+        kwargs[label].to_csv(os.path.join(directory, file_name), sep='|',
+                             header=False, index=False, encoding='latin-1')
+
+
+def get_sample_data() -> Dict[str, pd.DataFrame]:
+    """
+    Import the bundled sample data set (see `SAMPLE_DIRECTORY`), the offline
+    equivalent of `import_data_for_env()`
+    """
+    return import_data_for_env(directory=SAMPLE_DIRECTORY)
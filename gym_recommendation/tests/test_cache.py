@@ -0,0 +1,87 @@
+import os
+import tempfile
+
+import pandas as pd
+import pytest
+
+from gym_recommendation.cache import atomic_directory, get_cache_directory, read_csv_cached
+from gym_recommendation.envs.features import RecoFeatures
+from gym_recommendation.tests.dummy_data import get_dummy_data
+from gym_recommendation.utils import ITEM_HEADER, convert_header_to_camel_case
+
+
+def test_read_csv_cached() -> None:
+    """
+    Test case to validate the binary cache returns the same DataFrame as
+    `pd.read_csv()` and is rebuilt when the source file changes.
+    """
+    kwargs = dict(delimiter='|', names=convert_header_to_camel_case(ITEM_HEADER),
+                  encoding='latin-1')
+    item = get_dummy_data()['item']
+
+    with tempfile.TemporaryDirectory() as tmp_directory:
+        file_path = os.path.join(tmp_directory, 'u.item')
+        item.to_csv(file_path, sep='|', header=False, index=False, encoding='latin-1')
+        expected = pd.read_csv(file_path, **kwargs)
+
+        cold = read_csv_cached(file_path, **kwargs)
+        assert os.path.exists(os.path.join(get_cache_directory(file_path), 'manifest.json'))
+        warm = read_csv_cached(file_path, **kwargs)
+        pd.testing.assert_frame_equal(expected, cold)
+        pd.testing.assert_frame_equal(expected, warm)
+
+        # touching the file keeps the cache, changing it rebuilds the cache
+        os.utime(file_path)
+        pd.testing.assert_frame_equal(expected, read_csv_cached(file_path, **kwargs))
+        item.iloc[:10].to_csv(file_path, sep='|', header=False, index=False,
+                              encoding='latin-1')
+        pd.testing.assert_frame_equal(expected.iloc[:10],
+                                      read_csv_cached(file_path, **kwargs))
+
+
+def test_read_csv_uncached() -> None:
+    """
+    Test case to validate files are still read when the cache cannot be written.
+    """
+    item = get_dummy_data()['item']
+    with tempfile.TemporaryDirectory() as tmp_directory:
+        file_path = os.path.join(tmp_directory, 'u.item')
+        item.to_csv(file_path, sep='|', header=False, index=False)
+        # a file in place of the cache's parent directory fails like a read-only one
+        with open(os.path.join(tmp_directory, '.cache'), 'w') as f:
+            f.write('')
+        expected = pd.read_csv(file_path, sep='|', header=None)
+        pd.testing.assert_frame_equal(expected, read_csv_cached(file_path, sep='|',
+                                                                header=None))
+        assert sorted(os.listdir(tmp_directory)) == ['.cache', 'u.item']
+
+
+def test_atomic_directory() -> None:
+    """
+    Test case to validate errors of the block are raised even if the directory
+    exists, and saving features never silently keeps an existing directory.
+    """
+    with tempfile.TemporaryDirectory() as tmp_directory:
+        directory = os.path.join(tmp_directory, 'features')
+        os.makedirs(directory)
+        open(os.path.join(directory, 'meta.json'), 'w').close()
+        with pytest.raises(OSError):
+            with atomic_directory(directory=directory):
+                raise OSError('disk full')
+        assert os.listdir(tmp_directory) == ['features']
+
+        # the directory was moved into place by another process first
+        with atomic_directory(directory=directory) as directory_in_progress:
+            open(os.path.join(directory_in_progress, 'a.npy'), 'w').close()
+        assert os.listdir(directory) == ['meta.json']
+        assert os.listdir(tmp_directory) == ['features']
+
+        features = RecoFeatures.from_dataframes(**get_dummy_data(num_of_ratings=100))
+        with pytest.raises(FileExistsError):
+            features.save(directory=directory)
+        features.save(directory=directory, overwrite=True)
+        assert RecoFeatures.load(directory=directory).data.shape == features.data.shape
+
+
+if __name__ == '__main__':
+    test_read_csv_cached()
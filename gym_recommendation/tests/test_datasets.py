@@ -0,0 +1,79 @@
+import os
+import tempfile
+
+import numpy as np
+
+from gym_recommendation import RecoEnv
+from gym_recommendation.datasets import GENRES, MovieLens1M, MovieLens20M
+from gym_recommendation.envs.features import RecoFeatures, get_mean_rating_table
+from gym_recommendation.tests.dummy_data import get_dummy_data
+
+
+def write_dummy_data(loader: str, data_directory: str) -> dict:
+    """
+    Write the dummy data set in the file format of a MovieLens data set
+    """
+    kwargs = get_dummy_data()
+    directory = os.path.join(data_directory, loader.directory)
+    os.makedirs(directory)
+    item = kwargs['item']
+    genres = item[GENRES].apply(
+        lambda row: '|'.join(row.index[row.values == 1]) or '(no genres listed)', axis=1)
+    if loader is MovieLens1M:
+        with open(os.path.join(directory, 'ratings.dat'), 'w') as f:
+            for row in kwargs['data'].values:
+                f.write('::'.join(map(str, row)) + '\n')
+        with open(os.path.join(directory, 'movies.dat'), 'w') as f:
+            for movie_id, title, genre in zip(item['movie_id'], item['movie_title'], genres):
+                f.write(f'{movie_id}::{title}::{genre}\n')
+        with open(os.path.join(directory, 'users.dat'), 'w') as f:
+            for row in kwargs['user'][['user_id', 'gender', 'age', 'occupation',
+                                       'zip_code']].values:
+                f.write('::'.join(map(str, row)) + '\n')
+    else:
+        ratings = kwargs['data'].astype({'rating': float})
+        ratings.columns = ['userId', 'movieId', 'rating', 'timestamp']
+        ratings.to_csv(os.path.join(directory, 'ratings.csv'), index=False)
+        item.assign(genres=genres)[['movie_id', 'movie_title', 'genres']] \
+            .rename(columns={'movie_id': 'movieId', 'movie_title': 'title'}) \
+            .to_csv(os.path.join(directory, 'movies.csv'), index=False)
+    return kwargs
+
+
+def test_build_features() -> None:
+    """
+    Test case to validate data sets are streamed in chunks into the same
+    features as the ones derived from DataFrames.
+    """
+    for loader in [MovieLens1M, MovieLens20M]:
+        with tempfile.TemporaryDirectory() as data_directory:
+            kwargs = write_dummy_data(loader=loader, data_directory=data_directory)
+            directory = os.path.join(data_directory, 'features')
+            loader(data_directory=data_directory).build_features(directory=directory,
+                                                                 chunksize=128)
+            features = RecoFeatures.load(directory=directory)
+            data = kwargs['data']
+
+            assert features.data.dtype == np.int32
+            assert np.array_equal(features.data, data.values)
+            user_mean, _ = get_mean_rating_table(ids=data['user_id'].values,
+                                                 ratings=data['rating'].values)
+            assert features.user_mean.dtype == np.float64
+            assert np.array_equal(features.user_mean[:user_mean.shape[0]], user_mean)
+            movie_ids = kwargs['item']['movie_id'].values
+            assert np.array_equal(features.movie_genre[movie_ids],
+                                  kwargs['item'][GENRES].values)
+            expected_occupations = kwargs['user']['occupation'].nunique() \
+                if loader is MovieLens1M else 1
+            assert features.num_of_occupations == expected_occupations
+
+            env = RecoEnv(features=features)
+            env.reset()
+            for _ in range(100):
+                observation, reward, done, _ = env.step(0)
+                assert observation.shape == env.observation_space.shape
+            del env, features
+
+
+if __name__ == '__main__':
+    test_build_features()
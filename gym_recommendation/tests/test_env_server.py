@@ -0,0 +1,118 @@
+import os
+import tempfile
+from multiprocessing.pool import ThreadPool
+
+import gym
+import numpy as np
+import pytest
+
+from gym_recommendation import Instrumentation, RecoEnv, RemoteEnv
+from gym_recommendation.server import EnvServer
+from gym_recommendation.tests.dummy_data import get_dummy_data
+from gym_recommendation.tests.test_instrumentation import ListSink
+
+
+def assert_same_steps(address, kwargs: dict, num_of_steps: int) -> None:
+    """
+    Step a remote environment and a local RecoEnv with the same actions and
+    compare every observation, reward and done
+    """
+    remote_env = RemoteEnv(address=address, timeout=30.)
+    env = RecoEnv(**kwargs)
+    assert remote_env.observation_space == env.observation_space
+    assert np.array_equal(remote_env.reset(), env.reset())
+    random_state = np.random.RandomState(seed=remote_env.slot)
+    for _ in range(num_of_steps):
+        action = random_state.randint(5)
+        observation, reward, done, _ = remote_env.step(action=action)
+        expected_observation, expected_reward, expected_done, _ = env.step(action=action)
+        assert np.array_equal(observation, expected_observation)
+        assert reward == expected_reward and done == expected_done
+    remote_env.close()
+
+
+def test_env_server() -> None:
+    """
+    Test case to validate remote environments step like RecoEnv (including the
+    end of episodes), and concurrent step requests are batched.
+    """
+    kwargs = get_dummy_data(num_of_ratings=150)
+    server = EnvServer(max_actors=8, batch_window=0.005, **kwargs)
+    address = server.start_in_background()
+    try:
+        assert_same_steps(address=address, kwargs=kwargs, num_of_steps=400)
+        assert server.get_mean_batch_size() == 1.
+
+        with ThreadPool(processes=8) as pool:
+            pool.map(lambda _: assert_same_steps(address=address, kwargs=kwargs,
+                                                 num_of_steps=300), range(8))
+        assert server.get_mean_batch_size() > 1.
+        assert sorted(server.free_slots) == list(range(8))
+
+        env = gym.make(RemoteEnv.id, address=address)
+        assert env.reset().shape == env.observation_space.shape
+        env.close()
+    finally:
+        server.stop()
+
+
+def test_env_server_unix_socket() -> None:
+    """
+    Test case to validate serving over a Unix socket, and rejecting actors when
+    every slot is taken or a request is invalid.
+    """
+    kwargs = get_dummy_data(num_of_ratings=100)
+    server = EnvServer(max_actors=2, observation_mode='compact', **kwargs)
+    with tempfile.TemporaryDirectory() as tmp_directory:
+        address = server.start_in_background(address=os.path.join(tmp_directory, 'env.sock'))
+        try:
+            assert_same_steps(address=address,
+                              kwargs=dict(observation_mode='compact', **kwargs),
+                              num_of_steps=50)
+            envs = [RemoteEnv(address=address) for _ in range(2)]
+            with pytest.raises(ConnectionError):
+                RemoteEnv(address=address)
+            envs[0].reset()
+            with pytest.raises(ValueError):
+                envs[0].step(action=7)
+            for env in envs:
+                env.close()
+        finally:
+            server.stop()
+        assert not os.path.exists(address)
+
+
+def test_env_server_step_error() -> None:
+    """
+    Test case to validate every actor of a batch that fails to step gets an error
+    response, the server keeps serving afterwards, and remote environments render
+    through their instrumentation.
+    """
+    server = EnvServer(max_actors=2, **get_dummy_data(num_of_ratings=100))
+    step_slots = server.vec_env.step_slots
+
+    def fail_step_slots(slots: np.ndarray, actions: np.ndarray) -> None:
+        raise RuntimeError('step failed')
+
+    address = server.start_in_background()
+    try:
+        sink = ListSink()
+        env = RemoteEnv(address=address, timeout=30.,
+                        instrumentation=Instrumentation(sinks=[sink]))
+        env.reset()
+        env.render(mode='logger')
+        assert sink.records[-1]['message'].startswith('Env observation at step 0')
+        server.vec_env.step_slots = fail_step_slots
+        with pytest.raises(ValueError):
+            env.step(action=0)
+        assert not server.pending
+        server.vec_env.step_slots = step_slots
+        observation, _, _, _ = env.step(action=0)
+        assert observation.shape == env.observation_space.shape
+        env.close()
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    test_env_server()
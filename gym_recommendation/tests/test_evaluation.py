@@ -0,0 +1,127 @@
+import tempfile
+from datetime import datetime as dt
+
+import numpy as np
+import pytest
+
+from gym_recommendation import RecoEnv, evaluate_batched
+from gym_recommendation.envs.features import RecoFeatures, get_reward
+from gym_recommendation.evaluation import evaluate_sharded, get_shard_rows, \
+    print_evaluation_results
+from gym_recommendation.tests.dummy_data import get_dummy_data
+
+
+class GenreModel(object):
+    """
+    Deterministic stand-in for a trained agent, which predicts a rating from
+    the movie genre features of an observation
+    """
+
+    def predict(self, observation: np.ndarray, deterministic: bool = True) -> tuple:
+        return np.argmax(observation[..., 2:7], axis=-1), None
+
+
+def step_rewards(model: GenreModel, env: RecoEnv, num_steps: int) -> list:
+    """
+    Step a clone of the environment with the model and collect every reward
+    """
+    env = env.clone()
+    observation = env.reset()
+    rewards = []
+    while len(rewards) < num_steps:
+        observation, reward, done, _ = env.step(model.predict(observation)[0])
+        rewards.append(reward)
+        if done:
+            observation = env.reset()
+    return rewards
+
+
+def test_evaluate_batched() -> None:
+    """
+    Test case to validate the batched evaluation matches stepping through the
+    environment, including running features and steps beyond one episode.
+    """
+    env = RecoEnv(sampling='permutation', **get_dummy_data(num_of_ratings=5000))
+    model = GenreModel()
+
+    results = evaluate_batched(model=model, env=env, batch_size=512)
+    print_evaluation_results(results=results)
+
+    rows = env.get_episode_rows()
+    assert results['num_of_rows'] == rows.shape[0] - 1 == env.max_step + 1
+    actions = np.array([model.predict(env._get_row_observation(row=row))[0]
+                        for row in np.concatenate([rows[:1], rows[:-2]])])
+    ratings = env.data[rows[:-1], 2]
+    rewards = np.array([get_reward(action=action, rating=rating)
+                        for action, rating in zip(actions, ratings)])
+    assert results['total_correct_predictions'] == int((actions + 1 == ratings).sum())
+    assert np.isclose(results['mean_reward'], rewards.mean())
+    assert np.isclose(results['total_reward'],
+                      sum(step_rewards(model=model, env=env, num_steps=rows.shape[0] - 1)))
+    for rating in range(1, 6):
+        assert results['per_rating'][rating]['count'] == int((ratings == rating).sum())
+        assert results['confusion_matrix'][rating - 1].sum() == (ratings == rating).sum()
+
+    head = evaluate_batched(model=model, env=env, num_steps=100, batch_size=32)
+    assert head['num_of_rows'] == 100
+
+    for kwargs in (dict(), dict(online_stats=True), dict(history_length=3)):
+        env = RecoEnv(episode_length=300, **kwargs, **get_dummy_data(num_of_ratings=1000))
+        results = evaluate_batched(model=model, env=env, num_steps=700, batch_size=64)
+        assert results['num_of_rows'] == 700
+        assert np.isclose(results['total_reward'],
+                          sum(step_rewards(model=model, env=env, num_steps=700)))
+        assert env.local_step_number == 0
+
+
+def test_evaluation_throughput() -> None:
+    """
+    Test case to report rows/sec of the batched evaluation.
+    """
+    env = RecoEnv(precompute=True, **get_dummy_data(num_of_ratings=200000))
+    start_time = dt.now()
+    results = evaluate_batched(model=GenreModel(), env=env)
+    elapsed = (dt.now() - start_time).total_seconds()
+    print(f"Evaluated {results['num_of_rows']} rows in {elapsed:.3f} seconds "
+          f"({results['rows_per_second']:,.2f} rows/sec)")
+    assert results['num_of_rows'] == env.max_step + 1 == 199999
+
+
+def test_evaluate_sharded() -> None:
+    """
+    Test case to validate the sharded evaluation merges into the results of the
+    serial evaluation, whether the rows are split by range or by user.
+    """
+    kwargs = get_dummy_data(num_of_ratings=5000)
+    features = RecoFeatures.from_dataframes(**kwargs)
+    env = RecoEnv(features=features, sampling='permutation', seed=3)
+    serial = evaluate_batched(model=GenreModel(), env=env, num_steps=4000, batch_size=512)
+
+    rows = env.get_episode_rows()[:4000]
+    for shard_by in ('rows', 'user'):
+        shards = [get_shard_rows(env=env, shard=shard, num_of_shards=3, shard_by=shard_by,
+                                 num_steps=4000) for shard in range(3)]
+        assert np.array_equal(np.sort(np.concatenate([rated_rows for _, rated_rows in shards])),
+                              np.sort(rows))
+
+    with tempfile.TemporaryDirectory() as directory:
+        features.save(directory=directory)
+        for shard_by in ('rows', 'user'):
+            results = evaluate_sharded(model=GenreModel, features_directory=directory,
+                                       num_workers=2, shard_by=shard_by, num_steps=4000,
+                                       batch_size=512,
+                                       env_kwargs=dict(sampling='permutation', seed=3))
+            print_evaluation_results(results=results)
+            assert np.array_equal(results['confusion_matrix'], serial['confusion_matrix'])
+            for key in ('num_of_rows', 'total_correct_predictions', 'accuracy',
+                        'total_reward', 'mean_reward', 'per_rating'):
+                assert results[key] == serial[key], f"test_evaluate_sharded failed ({key})."
+        for env_kwargs in (dict(online_stats=True), dict(history_length=5)):
+            with pytest.raises(ValueError):
+                evaluate_sharded(model=GenreModel, features_directory=directory,
+                                 num_workers=2, env_kwargs=env_kwargs)
+
+
+if __name__ == '__main__':
+    test_evaluate_batched()
+    test_evaluation_throughput()
@@ -0,0 +1,100 @@
+import os
+import pathlib
+import tempfile
+import zipfile
+from multiprocessing.pool import ThreadPool
+
+import pytest
+
+from gym_recommendation.fetch import fetch_dataset, get_md5
+from gym_recommendation.tests.dummy_data import SAMPLE_DIRECTORY
+
+FILE_NAMES = ['u.data', 'u.item', 'u.user']
+
+
+def write_mirror(mirror: str) -> str:
+    """
+    Create a mirror with `ml-100k.zip` (holding the bundled sample data set)
+    and its `.md5` checksum file
+
+    :return: path of the zip file
+    """
+    zip_file_path = os.path.join(mirror, 'ml-100k.zip')
+    with zipfile.ZipFile(zip_file_path, 'w') as f_zip:
+        for file_name in FILE_NAMES:
+            f_zip.write(os.path.join(SAMPLE_DIRECTORY, file_name),
+                        arcname=f'ml-100k/{file_name}')
+    with open(zip_file_path + '.md5', 'w') as f:
+        f.write(f'MD5 (ml-100k.zip) = {get_md5(zip_file_path)}\n')
+    return zip_file_path
+
+
+def assert_fetched(target: str) -> None:
+    for file_name in FILE_NAMES:
+        with open(os.path.join(target, file_name), 'rb') as f, \
+                open(os.path.join(SAMPLE_DIRECTORY, file_name), 'rb') as expected:
+            assert f.read() == expected.read(), "test_fetch failed."
+
+
+def test_fetch_from_local_mirror() -> None:
+    """
+    Test case to validate fetching from a local directory and a file:// URL,
+    including resuming a partial download
+    """
+    with tempfile.TemporaryDirectory() as mirror, \
+            tempfile.TemporaryDirectory() as data_directory:
+        write_mirror(mirror=mirror)
+        target = fetch_dataset(dataset='ml-100k', data_directory=data_directory,
+                               directory='ml-100k', mirror=mirror, progress=None)
+        assert_fetched(target=target)
+
+    with tempfile.TemporaryDirectory() as mirror, \
+            tempfile.TemporaryDirectory() as data_directory:
+        zip_file_path = write_mirror(mirror=mirror)
+        with open(zip_file_path, 'rb') as f:
+            content = f.read()
+        # a partial download left behind by an interrupted fetch
+        with open(os.path.join(data_directory, 'ml-100k.zip.part'), 'wb') as f:
+            f.write(content[:len(content) // 2])
+        target = fetch_dataset(dataset='ml-100k', data_directory=data_directory,
+                               directory='ml-100k', mirror=pathlib.Path(mirror).as_uri(),
+                               progress=None)
+        assert_fetched(target=target)
+        assert not os.path.exists(os.path.join(data_directory, 'ml-100k.zip.part'))
+
+
+def test_fetch_checksum_mismatch() -> None:
+    """
+    Test case to validate a corrupt download is rejected without leaving a
+    directory that looks like a fetched data set
+    """
+    with tempfile.TemporaryDirectory() as mirror, \
+            tempfile.TemporaryDirectory() as data_directory:
+        write_mirror(mirror=mirror)
+        with pytest.raises(ValueError):
+            fetch_dataset(dataset='ml-100k', data_directory=data_directory,
+                          directory='ml-100k', mirror=mirror, checksum='0' * 32,
+                          progress=None)
+        assert not os.path.exists(os.path.join(data_directory, 'ml-100k'))
+        assert not os.path.exists(os.path.join(data_directory, 'ml-100k.zip.part'))
+
+
+def test_fetch_concurrent_callers() -> None:
+    """
+    Test case to validate concurrent callers wait for one fetch
+    """
+    with tempfile.TemporaryDirectory() as mirror, \
+            tempfile.TemporaryDirectory() as data_directory:
+        write_mirror(mirror=mirror)
+        with ThreadPool(processes=4) as pool:
+            targets = pool.map(lambda _: fetch_dataset(
+                dataset='ml-100k', data_directory=data_directory, directory='ml-100k',
+                mirror=mirror, progress=None), range(8))
+        assert len(set(targets)) == 1
+        assert_fetched(target=targets[0])
+        assert sorted(os.listdir(data_directory)) == ['.ml-100k.lock', 'ml-100k',
+                                                      'ml-100k.zip']
+
+
+if __name__ == '__main__':
+    test_fetch_from_local_mirror()
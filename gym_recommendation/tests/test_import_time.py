@@ -0,0 +1,52 @@
+import subprocess
+import sys
+
+# Maximum time (in seconds) `import gym_recommendation` may add on top of importing
+# its core dependencies (numpy, pandas and gym)
+MAX_IMPORT_SECONDS = 0.5
+# Modules that must not be imported until a helper that needs them is used
+HEAVY_MODULES = ['tensorflow', 'stable_baselines', 'requests']
+
+IMPORT_SCRIPT = """
+import sys
+import time
+start_time = time.perf_counter()
+import numpy, pandas, gym
+dependencies_time = time.perf_counter() - start_time
+start_time = time.perf_counter()
+import gym_recommendation
+package_time = time.perf_counter() - start_time
+heavy_modules = [name for name in {heavy_modules} if name in sys.modules]
+print(dependencies_time, package_time, ','.join(heavy_modules))
+"""
+
+
+def measure_import_time() -> tuple:
+    """
+    Measure a cold import of gym_recommendation in a new Python process
+
+    :return: (dependencies_time, package_time, heavy_modules)
+    """
+    output = subprocess.run(
+        [sys.executable, '-c', IMPORT_SCRIPT.format(heavy_modules=HEAVY_MODULES)],
+        check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+        universal_newlines=True).stdout.split()
+    heavy_modules = output[2].split(',') if len(output) > 2 else []
+    return float(output[0]), float(output[1]), heavy_modules
+
+
+def test_import_time() -> None:
+    """
+    Test case to guard the cold import time of gym_recommendation.
+    """
+    dependencies_time, package_time, heavy_modules = min(
+        [measure_import_time() for _ in range(3)], key=lambda result: result[1])
+    print(f"import numpy, pandas, gym: {dependencies_time:.3f} seconds")
+    print(f"import gym_recommendation: {package_time:.3f} seconds")
+    assert heavy_modules == [], f"heavy modules imported: {heavy_modules}"
+    assert package_time < MAX_IMPORT_SECONDS, \
+        f"import gym_recommendation took {package_time:.3f} seconds"
+
+
+if __name__ == '__main__':
+    test_import_time()
@@ -0,0 +1,98 @@
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from gym_recommendation import Instrumentation, JsonLinesSink, RecoEnv, RecoVecEnv
+from gym_recommendation.envs.features import get_reward
+from gym_recommendation.envs.instrumentation import MetricsSink
+from gym_recommendation.tests.dummy_data import get_dummy_data
+
+
+class ListSink(MetricsSink):
+    """
+    Keep records in memory for test cases
+    """
+
+    def __init__(self):
+        self.records = list()
+        self.closed = False
+
+    def write(self, record: dict) -> None:
+        self.records.append(record)
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def test_instrumented_env_matches_env() -> None:
+    """
+    Test case to validate instrumentation does not change the environment and its
+    episode records match the environment's own counters.
+    """
+    kwargs = get_dummy_data(num_of_ratings=300)
+    sink = ListSink()
+    instrumented_env = RecoEnv(**kwargs, instrumentation=Instrumentation(sinks=[sink]))
+    env = RecoEnv(**kwargs)
+    assert np.array_equal(instrumented_env.reset(), env.reset())
+
+    random_state = np.random.RandomState(seed=1)
+    total_correct_predictions = list()
+    for _ in range(2 * env.data.shape[0]):
+        action = random_state.randint(env.action_space.n)
+        done = env.done
+        if done:
+            total_correct_predictions.append(env.total_correct_predictions)
+        for expected, actual in zip(env.step(action), instrumented_env.step(action)):
+            assert np.array_equal(expected, actual)
+
+    episodes = [record for record in sink.records if record['event'] == 'episode']
+    assert [episode['total_correct_predictions'] for episode in episodes] == \
+        total_correct_predictions
+    assert all(episode['steps'] == env.max_step + 1 for episode in episodes)
+    assert sum(episodes[0]['reward_histogram']) == episodes[0]['steps']
+
+    metrics = instrumented_env.instrumentation.get_metrics()
+    assert metrics['episodes'] == len(episodes)
+    assert set(metrics['phases'].keys()) == {'reward', 'observation', 'bookkeeping', 'reset'}
+    instrumented_env.close()
+    assert sink.closed and sink.records[-1]['event'] == 'summary'
+
+
+def test_reward_histogram() -> None:
+    """
+    Test case to validate rewards are counted in the bin of their prediction error
+    """
+    instrumentation = Instrumentation()
+    for action in range(5):
+        instrumentation.record_step(reward=get_reward(action=action, rating=1))
+    assert instrumentation.episode_reward_histogram.tolist() == [1] * 5
+    instrumentation.record_steps(rewards=np.array([get_reward(action=0, rating=1)] * 3))
+    record = instrumentation.end_episode()
+    assert record['total_correct_predictions'] == 1 and record['steps'] == 5
+    assert instrumentation.reward_histogram.tolist() == [4, 1, 1, 1, 1]
+
+
+def test_json_lines_sink() -> None:
+    """
+    Test case to validate records are written as one JSON object per line
+    """
+    kwargs = get_dummy_data(num_of_ratings=100)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'metrics.jsonl')
+        vec_env = RecoVecEnv(num_envs=4, instrumentation=Instrumentation(
+            sinks=[JsonLinesSink(path=path)]), **kwargs)
+        vec_env.reset()
+        for _ in range(10):
+            vec_env.step(np.zeros(vec_env.num_envs, dtype=np.int64))
+        vec_env.close()
+        with open(path) as f:
+            records = [json.loads(line) for line in f]
+    assert records[-1]['event'] == 'summary'
+    assert records[-1]['total_steps'] == 40
+    assert records[-1]['phases']['observation']['calls'] == 40
+
+
+if __name__ == '__main__':
+    test_instrumented_env_matches_env()
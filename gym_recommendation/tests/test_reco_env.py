@@ -1,9 +1,15 @@
+import os
+import pickle
+import tempfile
 from datetime import datetime as dt
 
 import gym
 import numpy as np
+import pandas as pd
 
 from gym_recommendation import RecoEnv, import_data_for_env
+from gym_recommendation.envs.features import RecoFeatures, get_reward
+from gym_recommendation.tests.dummy_data import get_dummy_data
 
 
 def test_recommendation_environment() -> None:
@@ -39,5 +45,267 @@ def test_recommendation_environment() -> None:
     print(f'total_rewards: {total_rewards}')
 
 
+def test_precomputed_observations() -> None:
+    """
+    Test case to validate the precomputed observation table is identical
+    to the observations created step-by-step.
+    """
+    kwargs = get_dummy_data()
+    env = RecoEnv(**kwargs)
+    precomputed_env = RecoEnv(precompute=True, **kwargs)
+
+    for step_number in range(env.data.shape[0]):
+        expected = env._get_observation(step_number=step_number)
+        actual = precomputed_env._get_observation(step_number=step_number)
+        assert expected.dtype == actual.dtype
+        assert np.array_equal(expected, actual), \
+            f"observation mismatch at step {step_number}"
+
+    assert precomputed_env.reset().shape == env.observation_space.shape
+    for _ in range(100):
+        action = np.random.randint(env.action_space.n)
+        assert np.array_equal(env.step(action)[0], precomputed_env.step(action)[0])
+
+
+def test_mean_rating_features() -> None:
+    """
+    Test case to validate the mean rating features are bit-identical to the
+    per-user and per-movie means of the DataFrame divided by 5.
+    """
+    kwargs = get_dummy_data(num_of_ratings=2000)
+    data = kwargs['data']
+    user_mean = data.groupby('user_id').mean().to_dict()['rating']
+    movie_mean = data.groupby('item_id').mean().to_dict()['rating']
+    expected = np.array([[np.float32(user_mean[user_id] / 5.),
+                          np.float32(movie_mean[movie_id] / 5.)]
+                         for user_id, movie_id in data[['user_id', 'item_id']].values])
+    for env in (RecoEnv(**kwargs), RecoEnv(precompute=True, **kwargs)):
+        observations = env.get_observations(rows=np.arange(data.shape[0]))
+        assert np.array_equal(observations[:, :2], expected)
+        for row in range(0, data.shape[0], 97):
+            assert np.array_equal(env._get_observation(step_number=row)[:2], expected[row])
+
+
+def test_shared_features() -> None:
+    """
+    Test case to validate RecoEnv attaches to memory-mapped features without
+    copying them, and produces the same observations as the DataFrame version.
+    """
+    kwargs = get_dummy_data()
+    env = RecoEnv(**kwargs)
+
+    with tempfile.TemporaryDirectory() as tmp_directory:
+        directory = os.path.join(tmp_directory, 'features')
+        features = RecoFeatures.from_dataframes(**kwargs)
+        features.precompute_observations()
+        features.save(directory=directory)
+
+        for shared_features in [RecoFeatures.load(directory=directory),
+                                RecoFeatures.load(directory=directory)]:
+            shared_env = RecoEnv(features=shared_features)
+            assert isinstance(shared_env.data, np.memmap)
+            assert isinstance(shared_env.observations, np.memmap)
+            assert shared_env.item is None and shared_env.user is None
+            assert shared_env.observation_space.shape == env.observation_space.shape
+            for step_number in range(env.data.shape[0]):
+                assert np.array_equal(env._get_observation(step_number=step_number),
+                                      shared_env._get_observation(step_number=step_number))
+        del shared_env, shared_features
+
+
+def test_online_stats() -> None:
+    """
+    Test case to validate running statistics only include earlier ratings.
+    """
+    kwargs = get_dummy_data(num_of_ratings=500)
+    env = RecoEnv(online_stats=True, **kwargs)
+    static_env = RecoEnv(**kwargs)
+    data = kwargs['data'].sort_values('timestamp', kind='stable').values
+
+    observation = env.reset()
+    assert observation.shape == env.observation_space.shape
+    assert observation.shape[0] == static_env.observation_space.shape[0] + 3
+    for step_number in range(data.shape[0] - 1):
+        observation, reward, done, _ = env.step(0)
+        user_id, movie_id, rating, _ = data[step_number]
+        past = data[:step_number]
+        user_ratings = past[past[:, 0] == user_id, 2]
+        movie_ratings = past[past[:, 1] == movie_id, 2]
+        expected_user_mean = user_ratings.mean() if user_ratings.size else 3.
+        expected_movie_mean = movie_ratings.mean() if movie_ratings.size else 3.
+        assert np.isclose(observation[0], expected_user_mean / 5.)
+        assert np.isclose(observation[1], expected_movie_mean / 5.)
+        assert np.isclose(observation[-3], np.log1p(user_ratings.size) / 10.)
+        assert np.isclose(observation[-2], (user_ratings.var() if user_ratings.size
+                                            else 0.) / 4., atol=1e-6)
+        assert reward == get_reward(action=0, rating=rating)
+        if done:
+            break
+
+    env.reset()
+    assert env.stats.user_count.sum() == 0
+
+
+def test_history_features() -> None:
+    """
+    Test case to validate user histories only include the user's earlier ratings,
+    newest first, for both the DataFrame and precomputed environments.
+    """
+    kwargs = get_dummy_data(num_of_ratings=500)
+    history_length = 4
+    data = kwargs['data'].sort_values('timestamp', kind='stable').values
+    genres = RecoFeatures.from_dataframes(**kwargs).movie_genre
+    for env_kwargs in [dict(), dict(precompute=True, online_stats=True)]:
+        env = RecoEnv(history_length=history_length, **kwargs, **env_kwargs)
+        num_of_features = 2 * history_length + genres.shape[1] + 1
+        assert env.reset().shape[0] == \
+            RecoEnv(**kwargs, **env_kwargs).observation_space.shape[0] + num_of_features
+        for step_number in range(data.shape[0] - 1):
+            observation, _, done, _ = env.step(0)
+            history = observation[-num_of_features:]
+            user_id, _, _, timestamp = data[step_number]
+            past = data[:step_number][data[:step_number, 0] == user_id][::-1]
+            recent = past[:history_length]
+            assert np.array_equal(history[:recent.shape[0]], recent[:, 1])
+            assert np.allclose(history[history_length:history_length + recent.shape[0]],
+                               recent[:, 2] / 5.)
+            assert not history[recent.shape[0]:history_length].any()
+            if past.shape[0] == 0:
+                assert history[-1] == 1. and not history[2 * history_length:-1].any()
+                continue
+            weights = 0.9 ** np.arange(past.shape[0])
+            affinity = (weights[:, None] * genres[past[:, 1]] * past[:, 2:3] / 5.).sum(axis=0)
+            assert np.allclose(history[2 * history_length:-1], affinity / weights.sum())
+            assert np.isclose(history[-1], np.log1p(timestamp - past[0, 3]) / 20.)
+            if done:
+                break
+
+
+def test_compact_observations() -> None:
+    """
+    Test case to validate compact observations hold the ids of the rating rows and
+    expand into the dense observations (with and without online_stats).
+    """
+    kwargs = get_dummy_data()
+    for env_kwargs in [dict(), dict(precompute=True), dict(online_stats=True)]:
+        env = RecoEnv(**kwargs, **env_kwargs)
+        compact_env = RecoEnv(**kwargs, observation_mode='compact', **env_kwargs)
+        assert compact_env.observation_space.shape[0] < env.observation_space.shape[0]
+
+        observations = [env.reset()]
+        compact_observations = [compact_env.reset()]
+        done = False
+        while not done:
+            observation, reward, done, _ = env.step(action=1)
+            compact_observation, compact_reward, _, _ = compact_env.step(action=1)
+            assert reward == compact_reward
+            observations.append(observation)
+            compact_observations.append(compact_observation)
+        compact_observations = np.stack(compact_observations)
+        assert np.array_equal(compact_env.expand_observations(compact_observations),
+                              np.stack(observations))
+
+    rows = compact_env.get_episode_rows()
+    assert np.array_equal(compact_observations[1:, 2:4], env.data[rows[:-1], :2])
+    assert np.array_equal(RecoEnv(**kwargs, observation_mode='compact').get_observations(
+        rows=rows), RecoEnv(**kwargs, observation_mode='compact',
+                            precompute=True).get_observations(rows=rows))
+
+
+def test_memory_footprint() -> None:
+    """
+    Test case to validate RecoEnv keeps compact lookup tables instead of the
+    DataFrames, and reports its memory usage.
+    """
+    kwargs = get_dummy_data(num_of_ratings=2000)
+    env = RecoEnv(online_stats=True, sampling='permutation', **kwargs)
+    assert env.item is None and env.user is None
+    assert not [name for name, value in vars(env).items()
+                if isinstance(value, (dict, pd.DataFrame))]
+    features = env.features
+    assert env.data.dtype == np.int32
+    assert features.user_mean.dtype == features.movie_mean.dtype == np.float64
+    for table in (features.movie_genre, features.age_bucket, features.occupation_id,
+                  features.gender_id):
+        assert table.dtype == np.uint8
+
+    usage = env.get_memory_usage()
+    assert usage['features.data'] == env.data.nbytes == 2000 * 4 * 4
+    assert usage['stats.user_count'] == env.stats.user_count.nbytes
+    assert usage['sampler.order'] == env.sampler.order.nbytes
+    assert usage['total'] == sum(nbytes for name, nbytes in usage.items() if name != 'total')
+
+    # ids outside of the tables get the default features in both code paths
+    user_ids = np.array([1, features.age_bucket.shape[0] + 5])
+    movie_ids = np.array([features.movie_genre.shape[0] + 5, 1])
+    observations = features.get_pair_observations(user_ids=user_ids, movie_ids=movie_ids)
+    for user_id, movie_id, observation in zip(user_ids, movie_ids, observations):
+        assert np.array_equal(features.get_observation(user_id=user_id, movie_id=movie_id),
+                              observation)
+
+    with tempfile.TemporaryDirectory() as tmp_directory:
+        directory = os.path.join(tmp_directory, 'features')
+        features.save(directory=directory)
+        shared_env = RecoEnv(features=RecoFeatures.load(directory=directory))
+        assert shared_env.get_memory_usage()['features.data'] == env.data.nbytes
+        assert shared_env.get_memory_usage(include_shared=False)['total'] == 0
+        del shared_env
+
+
+def rollout(env: RecoEnv, num_of_steps: int) -> list:
+    """
+    Step with a fixed policy and collect every transition
+    """
+    transitions = []
+    for step_number in range(num_of_steps):
+        observation, reward, done, _ = env.step(action=step_number % 5)
+        transitions.append((observation.copy(), reward, done))
+    return transitions
+
+
+def assert_same_rollouts(expected: list, transitions: list) -> None:
+    for (observation, reward, done), (other_observation, other_reward, other_done) in \
+            zip(expected, transitions):
+        assert np.array_equal(observation, other_observation), "test_env_state failed."
+        assert reward == other_reward and done == other_done, "test_env_state failed."
+
+
+def test_env_state() -> None:
+    """
+    Test case to validate restoring a (pickled) snapshot and cloning replay the
+    same transitions, across episode boundaries, while sharing the data.
+    """
+    kwargs = get_dummy_data(num_of_ratings=1000)
+    for env_kwargs in [dict(sampling='permutation', episode_length=64),
+                       dict(sampling='permutation', episode_length=300),
+                       dict(sampling='user', online_stats=True, history_length=3),
+                       dict(precompute=True), dict(observation_mode='compact',
+                                                   sampling='window', episode_length=50)]:
+        env = RecoEnv(**kwargs, **env_kwargs)
+        env.reset()
+        rollout(env=env, num_of_steps=100)
+        state = pickle.loads(pickle.dumps(env.get_state()))
+        # the sampler's state is a cursor, not an index array over every rating row
+        assert not [value for value in (state['sampler'] or dict()).values()
+                    if isinstance(value, np.ndarray)]
+        clone = env.clone()
+        assert clone.data is env.data and clone.features is env.features
+        expected = rollout(env=env, num_of_steps=300)
+        total_correct_predictions = env.total_correct_predictions
+
+        assert_same_rollouts(expected=expected, transitions=rollout(env=clone,
+                                                                    num_of_steps=300))
+        assert clone.total_correct_predictions == total_correct_predictions
+
+        restored = RecoEnv(**kwargs, **env_kwargs)
+        restored.set_state(state=state)
+        assert_same_rollouts(expected=expected, transitions=rollout(env=restored,
+                                                                    num_of_steps=300))
+        env.set_state(state=state)
+        assert_same_rollouts(expected=expected, transitions=rollout(env=env,
+                                                                    num_of_steps=300))
+        assert env.total_correct_predictions == total_correct_predictions
+
+
 if __name__ == '__main__':
     test_recommendation_environment()
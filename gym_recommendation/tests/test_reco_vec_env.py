@@ -0,0 +1,106 @@
+from datetime import datetime as dt
+
+import numpy as np
+import pytest
+
+from gym_recommendation import RecoEnv, RecoVecEnv
+from gym_recommendation.tests.dummy_data import get_dummy_data
+
+
+def test_vec_env_matches_reco_env() -> None:
+    """
+    Test case to validate each RecoVecEnv slot reproduces a RecoEnv that is
+    automatically reset at the end of every episode (i.e., like SubprocVecEnv).
+    """
+    kwargs = get_dummy_data(num_of_ratings=300)
+    num_envs = 3
+    vec_env = RecoVecEnv(num_envs=num_envs, stagger=False, **kwargs)
+    env = RecoEnv(**kwargs)
+
+    observations = vec_env.reset()
+    observation = env.reset()
+    assert observations.shape == (num_envs,) + vec_env.observation_space.shape
+    assert np.array_equal(observations[0], observation)
+
+    random_state = np.random.RandomState(seed=1)
+    for _ in range(2 * env.data.shape[0]):
+        actions = random_state.randint(vec_env.action_space.n, size=num_envs)
+        observations, rewards, dones, infos = vec_env.step(actions)
+        observation, reward, done, _ = env.step(actions[0])
+        if done:
+            assert np.array_equal(infos[0]['terminal_observation'], observation)
+            assert infos[0]['total_correct_predictions'] == env.total_correct_predictions
+            observation = env.reset()
+        assert np.array_equal(observations[0], observation)
+        assert rewards[0] == reward
+        assert dones[0] == done
+    assert vec_env.get_attr('episode_number') == [2] * num_envs
+
+
+def test_vec_env_compact_observations() -> None:
+    """
+    Test case to validate compact RecoVecEnv observations expand into the dense ones
+    """
+    kwargs = get_dummy_data(num_of_ratings=300)
+    vec_env = RecoVecEnv(num_envs=4, **kwargs)
+    compact_vec_env = RecoVecEnv(num_envs=4, observation_mode='compact', **kwargs)
+    assert np.array_equal(compact_vec_env.expand_observations(compact_vec_env.reset()),
+                          vec_env.reset())
+    for _ in range(400):
+        actions = np.ones(vec_env.num_envs, dtype=np.int64)
+        observations, rewards, _, _ = vec_env.step(actions)
+        compact_observations, compact_rewards, _, _ = compact_vec_env.step(actions)
+        assert np.array_equal(compact_vec_env.expand_observations(compact_observations),
+                              observations)
+        assert np.array_equal(compact_rewards, rewards)
+
+
+def test_vec_env_reset_slots() -> None:
+    """
+    Test case to validate only the first episode of a slot is staggered, whether
+    a slot is reset automatically at the end of an episode or with `reset_slots()`.
+    """
+    vec_env = RecoVecEnv(num_envs=4, stagger=True, **get_dummy_data(num_of_ratings=40))
+    vec_env.reset()
+    offset = vec_env.max_step // 4
+    assert np.array_equal(vec_env.local_step_number, np.arange(4) * offset)
+    slots = np.array([3])
+    # the last slot reaches the end of its first episode first
+    for _ in range(vec_env.max_step - 3 * offset + 1):
+        _, _, dones, _ = vec_env.step_slots(slots=slots, actions=np.zeros(1, dtype=np.int64))
+    assert dones[0] and vec_env.local_step_number[3] == 0
+    vec_env.step_slots(slots=slots, actions=np.zeros(1, dtype=np.int64))
+    assert np.array_equal(vec_env.reset_slots(slots=slots),
+                          vec_env.reset_slots(slots=np.array([0])))
+    assert vec_env.local_step_number[3] == 0
+    vec_env.reset()
+    assert vec_env.local_step_number[3] == 3 * offset
+
+    vec_env.step(np.zeros(4, dtype=np.int64))
+    observations = vec_env.env_method('reset', indices=[1, 3])
+    assert np.array_equal(vec_env.local_step_number, [1, offset, 2 * offset + 1, 3 * offset])
+    assert np.array_equal(observations, vec_env.reset_slots(slots=np.array([1, 3])))
+    with pytest.raises(NotImplementedError):
+        vec_env.env_method('seed', 1)
+
+
+def test_vec_env_throughput() -> None:
+    """
+    Test case to report the steps/sec of the batched environment.
+    """
+    vec_env = RecoVecEnv(num_envs=64, **get_dummy_data(num_of_ratings=20000))
+    vec_env.reset()
+    actions = np.zeros(vec_env.num_envs, dtype=np.int64)
+    number_of_steps = 1000
+
+    start_time = dt.now()
+    for _ in range(number_of_steps):
+        vec_env.step(actions)
+    elapsed = (dt.now() - start_time).total_seconds()
+    print(f"RecoVecEnv completed {number_of_steps * vec_env.num_envs} env steps "
+          f"at a rate of {number_of_steps * vec_env.num_envs / elapsed:.2f} steps/sec")
+
+
+if __name__ == '__main__':
+    test_vec_env_matches_reco_env()
+    test_vec_env_throughput()
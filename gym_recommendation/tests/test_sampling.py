@@ -0,0 +1,70 @@
+import numpy as np
+
+from gym_recommendation import RecoEnv
+from gym_recommendation.envs.features import get_reward
+from gym_recommendation.envs.sampling import SAMPLERS, get_sampler
+from gym_recommendation.tests.dummy_data import get_dummy_data
+
+
+def test_samplers() -> None:
+    """
+    Test case to validate every sampling strategy returns reproducible index
+    views over the data instead of copies.
+    """
+    data = get_dummy_data(num_of_ratings=1000)['data'].values
+    episode_length = 50
+
+    for sampling in SAMPLERS.keys():
+        sampler = get_sampler(sampling=sampling, data=data, episode_length=episode_length)
+        other_sampler = get_sampler(sampling=sampling, data=data,
+                                    episode_length=episode_length)
+        random_state = np.random.RandomState(seed=1)
+        other_random_state = np.random.RandomState(seed=1)
+        for _ in range(50):
+            rows = sampler.sample(random_state=random_state)
+            assert np.array_equal(rows, other_sampler.sample(random_state=other_random_state))
+            assert rows.base is not None, f"{sampling} episode is not a view"
+            assert 2 <= rows.shape[0] <= episode_length
+            if sampling == 'window':
+                assert np.array_equal(np.diff(rows), np.ones(rows.shape[0] - 1))
+            elif sampling == 'user':
+                assert np.unique(data[rows, 0]).shape[0] == 1
+                assert np.all(np.diff(data[rows, 3]) >= 0)
+            elif sampling == 'timestamp':
+                assert np.all(np.diff(data[rows, 3]) >= 0)
+
+    # every epoch of the permutation sampler visits each row once
+    sampler = get_sampler(sampling='permutation', data=data, episode_length=100)
+    random_state = np.random.RandomState(seed=1)
+    epochs = [np.concatenate([sampler.sample(random_state=random_state)
+                              for _ in range(10)]) for _ in range(2)]
+    for epoch in epochs:
+        assert np.array_equal(np.sort(epoch), np.arange(data.shape[0]))
+    assert not np.array_equal(epochs[0], epochs[1])
+
+
+def test_env_sampling() -> None:
+    """
+    Test case to validate RecoEnv episodes follow the sampled rating rows.
+    """
+    kwargs = get_dummy_data(num_of_ratings=1000)
+    env = RecoEnv(sampling='window', episode_length=20, **kwargs)
+    static_env = RecoEnv(**kwargs)
+
+    for episode in range(3):
+        observation = env.reset()
+        rows = env.episode_rows
+        assert np.array_equal(observation, static_env._get_observation(step_number=rows[0]))
+        for step_number in range(rows.shape[0]):
+            observation, reward, done, _ = env.step(1)
+            assert np.array_equal(observation,
+                                  static_env._get_observation(step_number=rows[step_number]))
+            assert reward == get_reward(action=1, rating=env.data[rows[step_number], 2])
+            assert done == (step_number == rows.shape[0] - 2)
+            if done:
+                break
+
+
+if __name__ == '__main__':
+    test_samplers()
+    test_env_sampling()
@@ -0,0 +1,119 @@
+from datetime import datetime as dt
+
+import numpy as np
+import pytest
+
+from gym_recommendation import Instrumentation, SlateEnv
+from gym_recommendation.envs.features import RecoFeatures
+from gym_recommendation.envs.slate_env import (CandidateSampler, METRICS, get_hit_rate, get_ndcg,
+                                                get_top_candidates)
+from gym_recommendation.tests.dummy_data import get_dummy_data
+from gym_recommendation.tests.test_instrumentation import ListSink
+
+
+def test_candidate_sampler() -> None:
+    """
+    Test case to validate every candidate set holds distinct movies, with the
+    requested number of relevant movies and unrated movies for the user.
+    """
+    # MovieLens users rate every movie at most once
+    data = get_dummy_data(num_of_users=50, num_of_movies=200)['data'] \
+        .drop_duplicates(['user_id', 'item_id']).values
+    sampler = CandidateSampler(data=data, num_of_candidates=50, num_of_positives=3)
+    rated = set(map(tuple, data[:, :2].tolist()))
+    ratings = dict(((user_id, item_id), rating) for user_id, item_id, rating, _ in data)
+
+    user_ids = np.repeat(sampler.user_ids, 4)
+    candidates, relevance = sampler.sample(user_ids=user_ids,
+                                           random_state=np.random.RandomState(seed=1))
+    assert candidates.shape == relevance.shape == (user_ids.shape[0], 50)
+    for user_id, items, item_relevance in zip(user_ids, candidates, relevance):
+        assert np.unique(items).shape[0] == items.shape[0]
+        assert (item_relevance > 0).sum() == 3
+        for item_id, value in zip(items, item_relevance):
+            if value > 0:
+                assert ratings[(user_id, item_id)] == value >= 4
+            else:
+                assert (user_id, item_id) not in rated
+
+
+def test_ranking_metrics() -> None:
+    """
+    Test case to validate NDCG and hit rate against hand-computed values
+    """
+    relevance = np.array([[0., 5., 0., 4.]])
+    perfect = np.array([[0., 2., 0., 1.]])
+    assert np.allclose(get_ndcg(scores=perfect, relevance=relevance, slate_size=2), 1.)
+    worst = np.array([[2., 0., 1., 0.]])
+    assert np.allclose(get_ndcg(scores=worst, relevance=relevance, slate_size=2), 0.)
+    swapped = np.array([[0., 1., 0., 2.]])
+    expected = (15. + 31. / np.log2(3)) / (31. + 15. / np.log2(3))
+    assert np.allclose(get_ndcg(scores=swapped, relevance=relevance, slate_size=2), expected)
+    assert get_hit_rate(scores=worst, relevance=relevance, slate_size=2)[0] == 0.
+    assert get_hit_rate(scores=worst, relevance=relevance, slate_size=3)[0] == 1.
+
+
+def test_top_candidates_ties() -> None:
+    """
+    Test case to validate that tied scores are ranked like a stable sort, both by
+    `get_top_candidates()` and by the SlateEnv reward
+    """
+    scores = np.random.RandomState(seed=1).randint(3, size=(100, 20)).astype(np.float64)
+    for slate_size in (1, 5, 20):
+        assert np.array_equal(get_top_candidates(scores=scores, slate_size=slate_size),
+                              np.argsort(-scores, axis=1, kind='stable')[:, :slate_size])
+
+    kwargs = get_dummy_data(num_of_users=50, num_of_movies=300, num_of_ratings=3000)
+    for metric in ('ndcg', 'hit_rate'):
+        env = SlateEnv(num_of_candidates=20, slate_size=5, metric=metric, **kwargs)
+        with pytest.raises(ValueError):
+            env.step(action=np.zeros(20))
+        env.reset()
+        for action in (np.zeros(20), scores[0], scores[1]):
+            expected = METRICS[metric](scores=action[None], relevance=env.relevance[None],
+                                       slate_size=5)
+            assert np.isclose(env._get_reward(scores=action), expected[0])
+
+
+def test_slate_env() -> None:
+    """
+    Test case to validate SlateEnv observations and rewards: an agent that scores
+    the relevant candidates first always earns a reward of 1.
+    """
+    kwargs = get_dummy_data(num_of_users=50, num_of_movies=300, num_of_ratings=3000)
+    features = RecoFeatures.from_dataframes(**kwargs)
+    env = SlateEnv(num_of_candidates=200, slate_size=5, **kwargs)
+    compact_env = SlateEnv(num_of_candidates=200, slate_size=5, observation_mode='compact',
+                           **kwargs)
+    observation = env.reset()
+    compact_observation = compact_env.reset()
+    assert observation.shape == env.observation_space.shape == (200, features.observation_size)
+    assert np.array_equal(compact_env.expand_observations(compact_observation), observation)
+
+    done = False
+    num_of_steps = 0
+    start_time = dt.now()
+    while not done:
+        user_id = env.episode_users[env.local_step_number]
+        assert np.array_equal(observation, features.get_pair_observations(
+            user_ids=np.full(200, user_id), movie_ids=env.candidates))
+        scores = np.random.RandomState(seed=num_of_steps).rand(200)
+        expected = get_ndcg(scores=scores[None], relevance=env.relevance[None], slate_size=5)
+        assert np.isclose(env._get_reward(scores=scores), expected[0])
+        observation, reward, done, info = env.step(action=env.relevance)
+        assert reward == 1. and info['user_id'] == user_id
+        num_of_steps += 1
+    elapsed = (dt.now() - start_time).total_seconds()
+    assert num_of_steps == env.sampler.user_ids.shape[0]
+    print(f"SlateEnv steps/sec with 200 candidates = {num_of_steps / elapsed:,.0f}")
+
+    sink = ListSink()
+    env = SlateEnv(num_of_candidates=20, instrumentation=Instrumentation(sinks=[sink]),
+                   **kwargs)
+    env.reset()
+    env.render(mode='logger')
+    assert sink.records[-1]['message'].startswith('Env candidates at step 0')
+
+
+if __name__ == '__main__':
+    test_slate_env()
@@ -0,0 +1,219 @@
+import json
+import os
+import queue
+import socket
+import tempfile
+import threading
+from time import perf_counter
+
+import numpy as np
+
+from gym_recommendation import Instrumentation, RecoEnv, StreamEnv
+from gym_recommendation.envs.events import FileSource, IteratorSource, QueueSource, \
+    SocketSource, iterate_events
+from gym_recommendation.tests.dummy_data import get_dummy_data
+from gym_recommendation.tests.test_instrumentation import ListSink
+
+
+def get_events(num_of_events: int, num_of_users: int = 40, num_of_movies: int = 60,
+               seed: int = 1):
+    """
+    Generate an endless-looking feed of random rating events
+    """
+    random_state = np.random.RandomState(seed=seed)
+    for timestamp in range(num_of_events):
+        yield dict(user_id=int(random_state.randint(1, num_of_users + 1)),
+                   item_id=int(random_state.randint(1, num_of_movies + 1)),
+                   rating=int(random_state.randint(1, 6)),
+                   timestamp=timestamp)
+
+
+def test_stream_env_observations() -> None:
+    """
+    Test case to validate the streamed observations and rewards match the
+    in-memory environment with online statistics, and the window holds the
+    latest events.
+    """
+    kwargs = get_dummy_data(num_of_ratings=600)
+    data = kwargs['data'].values
+    env = RecoEnv(online_stats=True, sampling='sequential', **kwargs)
+    stream_env = StreamEnv(events=iter(data.tolist()), item=kwargs['item'],
+                           user=kwargs['user'], batch_size=64, window_size=100)
+    assert stream_env.observation_space.shape == env.observation_space.shape
+    assert np.array_equal(stream_env.reset(), env.reset())
+    _, reward, _, _ = env.step(action=0)
+    stream_observation, stream_reward, _, _ = stream_env.step(action=0)
+    assert stream_reward == reward
+    for step_number in range(1, data.shape[0] - 2):
+        action = step_number % 5
+        observation, reward, done, _ = env.step(action=action)
+        assert np.array_equal(stream_observation, observation)
+        stream_observation, stream_reward, stream_done, _ = stream_env.step(action=action)
+        assert stream_reward == reward and not stream_done
+    assert np.array_equal(stream_env.get_window(), data[data.shape[0] - 100:])
+
+    # ends with the feed, and episodes keep the running statistics
+    stream_env = StreamEnv(events=iter(data.tolist()), item=kwargs['item'],
+                           user=kwargs['user'], batch_size=64, episode_length=250)
+    num_of_steps = []
+    for _ in range(4):
+        stream_env.reset()
+        done = stream_env.done
+        num_of_steps.append(0)
+        while not done:
+            _, _, done, _ = stream_env.step(action=2)
+            num_of_steps[-1] += 1
+    assert num_of_steps == [250, 250, 100, 0] and stream_env.exhausted
+    assert stream_env.stats.user_count.sum() == data.shape[0]
+
+
+def test_event_sources() -> None:
+    """
+    Test case to validate files (including tailed files), queues and sockets
+    produce the same events.
+    """
+    events = list(get_events(num_of_events=500))
+    expected = np.array([list(event.values()) for event in events])
+
+    def read(source) -> np.ndarray:
+        batches = list(iterate_events(source=source, batch_size=64))
+        source.close()
+        assert all(batch.shape[0] <= 64 for batch in batches)
+        return np.concatenate(batches)
+
+    assert np.array_equal(read(IteratorSource(events=events)), expected)
+    with tempfile.TemporaryDirectory() as tmp_directory:
+        csv_path = os.path.join(tmp_directory, 'ratings.csv')
+        with open(csv_path, 'w') as f:
+            f.write('user_id,item_id,rating,timestamp\n')
+            f.writelines(','.join(str(value) for value in event.values()) + '\n'
+                         for event in events)
+        source = FileSource(path=csv_path, block_size=100)
+        assert np.array_equal(read(source), expected)
+        assert source.num_of_dropped == 1  # the header
+
+        # lines (and parts of lines) appended while the file is tailed
+        json_path = os.path.join(tmp_directory, 'ratings.jsonl')
+        open(json_path, 'w').close()
+        source = FileSource(path=json_path, follow=True, poll_interval=0.01, timeout=0.5)
+
+        def write() -> None:
+            with open(json_path, 'a') as f_json:
+                for event in events:
+                    line = json.dumps(event) + '\n'
+                    f_json.write(line[:5])
+                    f_json.flush()
+                    f_json.write(line[5:])
+                    f_json.flush()
+
+        thread = threading.Thread(target=write)
+        thread.start()
+        assert np.array_equal(read(source), expected)
+        thread.join()
+
+    events_queue = queue.Queue()
+    for event in events:
+        events_queue.put(event)
+    events_queue.put(None)
+    assert np.array_equal(read(QueueSource(events=events_queue)), expected)
+
+    sender, receiver = socket.socketpair()
+
+    def send() -> None:
+        for event in events:
+            sender.sendall(('\t'.join(str(value) for value in event.values()) +
+                            '\n').encode())
+        sender.close()
+
+    thread = threading.Thread(target=send)
+    thread.start()
+    assert np.array_equal(read(SocketSource(address=receiver, block_size=50)), expected)
+    thread.join()
+
+
+def test_stream_env_instrumentation() -> None:
+    """
+    Test case to validate StreamEnv renders, records its episodes and reports
+    dropped events through its instrumentation.
+    """
+    events = ['1\t2\t3\t4', 'not an event', '2\t3\t5\t6', '3\t4\t1\t7']
+    sink = ListSink()
+    instrumentation = Instrumentation(sinks=[sink])
+    kwargs = get_dummy_data(num_of_ratings=100)
+    env = StreamEnv(events=events, item=kwargs['item'], user=kwargs['user'],
+                    instrumentation=instrumentation)
+    env.reset()
+    assert env.source.num_of_dropped == env.num_of_dropped == 1
+    assert sink.records[-1]['message'] == 'Dropped 1 unparsable events from the feed'
+    env.render(mode='logger')
+    assert sink.records[-1]['message'].startswith('Env observation at step 0')
+    done = False
+    while not done:
+        _, _, done, _ = env.step(action=2)
+    env.reset()
+    assert instrumentation.num_of_episodes == 1 and instrumentation.total_steps == 3
+
+
+def test_stream_env_invalid_ids() -> None:
+    """
+    Test case to validate StreamEnv drops events with negative or too large ids,
+    without growing its running statistics for them.
+    """
+    events = [(1, 2, 3, 4), (-1, 2, 3, 5), (2, 1000, 3, 6), (2, 3, 5, 7), (5000, 1, 1, 8)]
+    sink = ListSink()
+    kwargs = get_dummy_data(num_of_ratings=100)
+    env = StreamEnv(events=events, item=kwargs['item'], user=kwargs['user'], max_id=1000,
+                    instrumentation=Instrumentation(sinks=[sink]))
+    env.reset()
+    assert env.num_of_dropped == 3
+    assert sink.records[-1]['message'] == 'Dropped 3 events with ids out of [0, 1000) ' \
+                                          'from the feed'
+    assert np.array_equal(env.get_window(), [[1, 2, 3, 4], [2, 3, 5, 7]])
+    assert env.stats.user_count.shape[0] < 1000 and env.stats.movie_count.shape[0] < 1000
+
+    env = StreamEnv(events=[(-1, 2, 3, 4), (1, -2, 3, 5)], item=kwargs['item'],
+                    user=kwargs['user'])
+    assert env.reset().shape == env.observation_space.shape
+    assert env.done and env.exhausted and env.num_of_dropped == 2
+
+
+def test_stream_env_bounded_memory() -> None:
+    """
+    Test case to validate memory stays constant over a long feed, and stepping
+    runs at the speed of the in-memory environment.
+    """
+    kwargs = get_dummy_data(num_of_ratings=2000)
+    num_of_events = 40000
+    env = StreamEnv(events=get_events(num_of_events=num_of_events), item=kwargs['item'],
+                    user=kwargs['user'], batch_size=512, window_size=1024,
+                    episode_length=1000)
+    memory_usage = []
+    start_time = perf_counter()
+    num_of_steps = 0
+    while not env.exhausted:
+        env.reset()
+        done = env.done
+        while not done:
+            _, _, done, _ = env.step(action=2)
+            num_of_steps += 1
+        memory_usage.append(env.get_memory_usage()['total'])
+    stream_steps_per_second = num_of_steps / (perf_counter() - start_time)
+    assert num_of_steps == num_of_events and env.num_of_events == num_of_events
+    # every batch but the last one is full
+    assert max(memory_usage) == memory_usage[0]
+    assert env.get_window().shape == (1024, 4)
+
+    reco_env = RecoEnv(online_stats=True, **kwargs)
+    reco_env.reset()
+    start_time = perf_counter()
+    for _ in range(kwargs['data'].shape[0] - 1):
+        reco_env.step(action=2)
+    reco_steps_per_second = (kwargs['data'].shape[0] - 1) / (perf_counter() - start_time)
+    print(f'StreamEnv: {stream_steps_per_second:,.0f} steps/sec | '
+          f'RecoEnv(online_stats=True): {reco_steps_per_second:,.0f} steps/sec')
+    # loose bound, since timings are noisy on shared machines
+    assert stream_steps_per_second > 0.5 * reco_steps_per_second
+
+
+if __name__ == '__main__':
+    test_stream_env_observations()
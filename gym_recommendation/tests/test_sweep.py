@@ -0,0 +1,80 @@
+import json
+import os
+import tempfile
+from functools import partial
+
+from gym_recommendation.sweep import get_trial_id, get_trials, load_results, run_sweep
+
+
+def flaky_trial(fail_path: str, params: dict) -> dict:
+    """
+    Stand-in for a training run, which fails for x=2 while `fail_path` exists
+    """
+    if params['x'] == 2 and os.path.exists(fail_path):
+        raise RuntimeError('trial interrupted')
+    return dict(accuracy=params['x'] * params['y'], pid=os.getpid())
+
+
+def test_get_trials() -> None:
+    """
+    Test case to validate grid searches take every combination and random
+    searches are reproducible and within bounds.
+    """
+    grid = get_trials(spec=dict(search='grid', parameters=dict(x=[1, 2, 3], y=[0.1, 0.2])))
+    assert len(grid) == 6 and len(set(get_trial_id(params) for params in grid)) == 6
+    assert dict(x=3, y=0.2) in grid
+
+    spec = dict(search='random', num_of_trials=20, seed=3,
+                parameters=dict(learning_rate=dict(low=1e-5, high=1e-2, log=True),
+                                n_steps=dict(low=16, high=256), width=[32, 64]))
+    trials = get_trials(spec=spec)
+    assert trials == get_trials(spec=json.loads(json.dumps(spec)))
+    for params in trials:
+        assert 1e-5 <= params['learning_rate'] <= 1e-2
+        assert isinstance(params['n_steps'], int) and 16 <= params['n_steps'] <= 256
+        assert params['width'] in (32, 64)
+
+
+def test_run_sweep_resume() -> None:
+    """
+    Test case to validate an interrupted sweep reruns only the trials that did
+    not finish, and keeps one results table.
+    """
+    trials = get_trials(spec=dict(parameters=dict(x=[1, 2, 3], y=[1, 10])))
+    with tempfile.TemporaryDirectory() as directory:
+        results_path = os.path.join(directory, 'results.jsonl')
+        fail_path = os.path.join(directory, 'fail')
+        open(fail_path, 'w').close()
+        results = run_sweep(trial_function=partial(flaky_trial, fail_path), trials=trials,
+                            results_path=results_path, num_workers=2)
+        assert (results['status'] == 'ok').sum() == 4
+        assert set(results.loc[results['status'] == 'failed', 'x']) == {2}
+        # a record cut off by an interruption
+        with open(results_path, 'a') as f:
+            f.write('{"trial_id": "cut')
+
+        os.remove(fail_path)
+        results = run_sweep(trial_function=partial(flaky_trial, fail_path), trials=trials,
+                            results_path=results_path, num_workers=2)
+        finished = results[results['status'] == 'ok']
+        assert len(results) == 8 and len(finished) == 6
+        assert sorted(finished['trial_id']) == sorted(get_trial_id(params) for params in trials)
+        assert (finished['accuracy'] == finished['x'] * finished['y']).all()
+        assert len(load_results(results_path=results_path)) == 8
+
+        results = run_sweep(trial_function=partial(flaky_trial, fail_path), trials=trials,
+                            results_path=results_path, num_workers=2)
+        assert len(results) == 8
+
+        # trials with other fixed settings are not the finished ones
+        fixed_params = dict(training_steps=1000, y=5)
+        assert get_trial_id(trials[0], fixed_params=fixed_params) != get_trial_id(trials[0])
+        assert get_trial_id(trials[0], fixed_params=dict(y=5)) == get_trial_id(trials[0])
+        results = run_sweep(trial_function=partial(flaky_trial, fail_path), trials=trials,
+                            results_path=results_path, num_workers=2,
+                            fixed_params=fixed_params)
+        assert len(results) == 14 and (results['status'] == 'ok').sum() == 12
+
+
+if __name__ == '__main__':
+    test_run_sweep_resume()
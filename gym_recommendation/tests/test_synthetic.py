@@ -0,0 +1,87 @@
+import os
+import tempfile
+
+import numpy as np
+
+from gym_recommendation import RecoEnv
+from gym_recommendation.envs.features import RecoFeatures
+from gym_recommendation.synthetic import BLOCK_SIZE, OCCUPATIONS, SyntheticLoader, \
+    generate_data_for_env, generate_features
+from gym_recommendation.tests.dummy_data import get_sample_data
+
+
+def test_generate_data_for_env() -> None:
+    """
+    Test case to validate synthetic data has the schema of MovieLens 100k, is
+    reproducible from its seed and has power-law popularity.
+    """
+    kwargs = generate_data_for_env(num_of_ratings=50000, seed=3)
+    sample = get_sample_data()
+    for label in ['data', 'item', 'user']:
+        assert list(kwargs[label].columns) == list(sample[label].columns)
+    data = kwargs['data']
+    assert data.shape == (50000, 4)
+    assert set(data['rating'].unique()) == {1, 2, 3, 4, 5}
+    assert data['user_id'].between(1, 943).all() and data['item_id'].between(1, 1682).all()
+    assert data['timestamp'].is_monotonic_increasing
+    assert kwargs['item'].iloc[:, 5:].values.sum(axis=1).min() >= 1
+    assert set(kwargs['user']['occupation']) <= set(OCCUPATIONS)
+    assert set(kwargs['user']['gender']) == {'M', 'F'}
+
+    # the 10% most popular movies get most of the ratings
+    counts = np.sort(np.bincount(data['item_id']))[::-1]
+    assert counts[:168].sum() > 0.5 * counts.sum()
+    uniform = SyntheticLoader(num_of_ratings=50000, movie_exponent=0.).generate_ratings()
+    counts = np.sort(np.bincount(uniform[:, 1]))[::-1]
+    assert counts[:168].sum() < 0.15 * counts.sum()
+
+    again = generate_data_for_env(num_of_ratings=50000, seed=3)
+    for label in ['data', 'item', 'user']:
+        assert kwargs[label].equals(again[label])
+    assert not kwargs['data'].equals(generate_data_for_env(num_of_ratings=50000,
+                                                           seed=4)['data'])
+    env = RecoEnv(**kwargs)
+    assert env.observation_space.contains(env.reset())
+
+
+def test_generate_ratings_in_chunks() -> None:
+    """
+    Test case to validate any range of rating rows is generated on its own.
+    """
+    loader = SyntheticLoader(num_of_ratings=2 * BLOCK_SIZE + 100, num_of_users=50,
+                             num_of_movies=30)
+    ratings = loader.generate_ratings()
+    for start, end in [(0, 10), (5, BLOCK_SIZE + 7), (BLOCK_SIZE - 3, 2 * BLOCK_SIZE + 100),
+                       (2 * BLOCK_SIZE + 99, 2 * BLOCK_SIZE + 100), (10, 10)]:
+        assert np.array_equal(loader.generate_ratings(start=start, end=end),
+                              ratings[start:end])
+    chunks = [chunk.values for chunk in loader.read_ratings(chunksize=300000)]
+    assert np.array_equal(np.concatenate(chunks), ratings)
+
+
+def test_generate_features() -> None:
+    """
+    Test case to validate features generated into memory-mapped files match the
+    features derived from the DataFrames.
+    """
+    kwargs = dict(num_of_ratings=30000, num_of_users=200, num_of_movies=300, seed=2)
+    expected = generate_features(**kwargs)
+    with tempfile.TemporaryDirectory() as tmp_directory:
+        directory = os.path.join(tmp_directory, 'synthetic-features')
+        features = generate_features(directory=directory, chunksize=7000, **kwargs)
+        assert isinstance(features.data, np.memmap)
+        for name in RecoFeatures.ARRAYS[:-1]:
+            assert getattr(features, name).dtype == getattr(expected, name).dtype, name
+            assert np.array_equal(getattr(features, name), getattr(expected, name)), name
+        env, expected_env = RecoEnv(features=features), RecoEnv(features=expected)
+        assert np.array_equal(env.reset(), expected_env.reset())
+        for action in range(5):
+            observation, reward, _, _ = env.step(action=action)
+            expected_observation, expected_reward, _, _ = expected_env.step(action=action)
+            assert np.array_equal(observation, expected_observation)
+            assert reward == expected_reward
+        del env, features
+
+
+if __name__ == '__main__':
+    test_generate_data_for_env()
@@ -0,0 +1,74 @@
+import os
+import tempfile
+
+import numpy as np
+
+from gym_recommendation import RecoEnv
+from gym_recommendation.envs.features import get_reward
+from gym_recommendation.tests.dummy_data import get_dummy_data
+from gym_recommendation.transitions import export_transitions, iterate_transitions, \
+    load_transitions
+
+
+def test_iterate_transitions() -> None:
+    """
+    Test case to validate the batched transitions match a rollout of
+    `RecoEnv.step()`: every observation is the one the agent acts on, and the
+    rewards are the ones of stepping with each action, following the sampling,
+    without moving the environment.
+    """
+    kwargs = get_dummy_data(num_of_ratings=600)
+    for env_kwargs in [dict(), dict(sampling='permutation', episode_length=100),
+                       dict(online_stats=True, history_length=3, episode_length=200),
+                       dict(observation_mode='compact', sampling='window',
+                            episode_length=150)]:
+        env = RecoEnv(**kwargs, **env_kwargs)
+        batches = list(iterate_transitions(env=env, batch_size=64, num_of_episodes=2))
+        assert env.local_step_number == 0 and env.get_state()['episode_is_new']
+        observations = np.concatenate([batch[0] for batch in batches])
+        ratings = np.concatenate([batch[1] for batch in batches])
+        rewards = np.concatenate([batch[2] for batch in batches])
+        assert all(batch[1].shape[0] <= 64 for batch in batches)
+
+        stepped_env = RecoEnv(**kwargs, **env_kwargs)
+        index = 0
+        for _ in range(2):
+            observation = stepped_env.reset()
+            rows = stepped_env.get_episode_rows()
+            done = False
+            while not done:
+                action = index % 5
+                assert np.array_equal(observation, observations[index])
+                observation, reward, done, _ = stepped_env.step(action=action)
+                assert reward == rewards[index, action] == \
+                    get_reward(action=action, rating=ratings[index])
+                index += 1
+            assert stepped_env.local_step_number == rows.shape[0] - 1
+        assert index == ratings.shape[0]
+
+
+def test_export_transitions() -> None:
+    """
+    Test case to validate exported transitions are loaded as memory maps holding
+    the batched transitions.
+    """
+    kwargs = get_dummy_data(num_of_ratings=600)
+    env = RecoEnv(sampling='permutation', episode_length=250, **kwargs)
+    with tempfile.TemporaryDirectory() as tmp_directory:
+        directory = os.path.join(tmp_directory, 'transitions')
+        export_transitions(env=env, directory=directory, batch_size=100, num_of_episodes=3)
+        transitions = load_transitions(directory=directory)
+        assert isinstance(transitions['observations'], np.memmap)
+        batches = list(iterate_transitions(env=env, batch_size=100, num_of_episodes=3))
+        for index, name in enumerate(['observations', 'ratings', 'rewards']):
+            assert np.array_equal(transitions[name],
+                                  np.concatenate([batch[index] for batch in batches]))
+        assert np.array_equal(transitions['ratings'], env.data[transitions['rows'], 2])
+        # the last rating row of every episode is never stepped
+        assert np.array_equal(transitions['episode_starts'], [0, 249, 498])
+        assert transitions['ratings'].shape[0] == 747
+        del transitions
+
+
+if __name__ == '__main__':
+    test_iterate_transitions()
@@ -1,5 +1,6 @@
 import os
 
+from gym_recommendation.tests.dummy_data import SAMPLE_DIRECTORY
 from gym_recommendation.utils import CWD, download_data, import_data, import_data_for_env
 
 
@@ -29,5 +30,16 @@ def test_import_data_for_env() -> None:
     print(f"user peak:\n{kwargs['user'].head()}")
 
 
+def test_import_sample_data() -> None:
+    print("test_import_sample_data\n*****")
+    data, item, user = import_data(use_cache=False, directory=SAMPLE_DIRECTORY)
+    cached_data, cached_item, cached_user = import_data(directory=SAMPLE_DIRECTORY)
+    assert data.shape == (10000, 4), "test_import_sample_data() failed."
+    assert data.equals(cached_data), "test_import_sample_data() failed."
+    assert item.shape[0] == 500 and user.shape[0] == 300, "test_import_sample_data() failed."
+    assert item.equals(cached_item) and user.equals(cached_user), \
+        "test_import_sample_data() failed."
+
+
 if __name__ == '__main__':
     test_import_data_for_env()
@@ -0,0 +1,191 @@
+import json
+import os
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .cache import atomic_directory
+from .envs.features import REWARD_TABLE
+from .envs.reco_env import RecoEnv
+
+# Reward of every action (columns) for every rating (rows = rating - 1)
+ACTION_REWARDS = np.ascontiguousarray(REWARD_TABLE.T)
+# Arrays written by `export_transitions()`
+TRANSITION_ARRAYS = ('observations', 'ratings', 'rewards', 'rows', 'episode_starts')
+
+
+def get_episodes(env: RecoEnv,
+                 num_of_episodes: Optional[int] = 1) -> Iterator[Tuple[RecoEnv, np.ndarray]]:
+    """
+    Play the next `num_of_episodes` episodes of the environment (i.e., the
+    episodes that follow `reset()` calls) on a clone, so the environment itself
+    does not move
+
+    :param num_of_episodes: number of episodes (None = until the caller stops)
+    :return: iterator of (environment at the start of the episode, rating rows
+        that are stepped through, i.e., up to `max_step`; the last rating row of
+        an episode is never stepped)
+    """
+    env = env.unwrapped.clone()
+    num_of_played_episodes = 0
+    while num_of_episodes is None or num_of_played_episodes < num_of_episodes:
+        env.reset()
+        yield env, env.get_episode_rows()[:max(env.max_step + 1, 1)]
+        num_of_played_episodes += 1
+
+
+def iterate_steps(env: RecoEnv,
+                  batch_size: int = 8192,
+                  num_of_episodes: Optional[int] = 1,
+                  num_steps: Optional[int] = None) -> Iterator[Tuple[np.ndarray, np.ndarray,
+                                                                     np.ndarray]]:
+    """
+    Create the steps of the environment's next episodes in batches, without
+    stepping through the environment: the observation the agent acts on and the
+    rating its action is scored against.
+
+    Like `RecoEnv.step()`, the first step of an episode acts on the observation of
+    `reset()` (i.e., of its own rating row), and every later step on the
+    observation returned by the step before (i.e., of the previous rating row).
+    With `online_stats` or `history_length`, the running features are replayed in
+    episode order. Batches do not span episodes.
+
+    :param env: environment to create the steps of (played on a clone, see
+        `get_episodes()`)
+    :param batch_size: maximum number of steps per batch
+    :param num_of_episodes: number of episodes (None = as many as `num_steps` need)
+    :param num_steps: maximum number of steps (None = every step of the episodes)
+    :return: iterator of (observations, ratings, rows), where `rows` are the
+        indices in `env.data` of the ratings
+    """
+    if num_of_episodes is None and num_steps is None:
+        raise ValueError('num_of_episodes or num_steps is needed.')
+    for episode_env, rows in get_episodes(env=env, num_of_episodes=num_of_episodes):
+        if num_steps is not None:
+            rows = rows[:num_steps]
+            num_steps -= rows.shape[0]
+        for start in range(0, rows.shape[0], batch_size):
+            end = min(start + batch_size, rows.shape[0])
+            observations = get_step_observations(env=episode_env, rows=rows,
+                                                 start=start, end=end)
+            yield observations, episode_env.data[rows[start:end], 2], rows[start:end]
+        if num_steps == 0:
+            return
+
+
+def iterate_transitions(env: RecoEnv,
+                        batch_size: int = 8192,
+                        num_of_episodes: int = 1) -> Iterator[Tuple[np.ndarray, np.ndarray,
+                                                                    np.ndarray]]:
+    """
+    Create the transitions of the environment's next episodes in batches, without
+    stepping through the environment.
+
+    There is one transition per step of `RecoEnv.step()`, following the
+    environment's sampling (see `iterate_steps()`): the observation the agent acts
+    on, and the rating (and the reward of every action) of the step. Rolling out
+    the environment and picking `rewards[i, action]` gives the rewards of `step()`.
+
+    :param env: environment to create the transitions of (gym wrappers are removed)
+    :param batch_size: maximum number of steps per batch
+    :param num_of_episodes: number of episodes to create the transitions of
+    :return: iterator of (observations, ratings, rewards), where `rewards[i, action]`
+        is the reward of `action` for the i-th rating (a row of `REWARD_TABLE.T`)
+    """
+    for observations, ratings, _ in iterate_steps(env=env, batch_size=batch_size,
+                                                  num_of_episodes=num_of_episodes):
+        yield observations, ratings, ACTION_REWARDS[ratings.astype(np.int64) - 1]
+
+
+def export_transitions(env: RecoEnv,
+                       directory: str,
+                       batch_size: int = 65536,
+                       num_of_episodes: int = 1) -> None:
+    """
+    Write the transitions of `iterate_transitions()` into `directory` as `.npy`
+    files, which are memory-mapped by `load_transitions()`.
+
+    Arrays are filled batch by batch through memory maps, so the export never
+    holds the whole transition set in memory, and the directory is moved into
+    place once complete (see `atomic_directory()`).
+
+    Files=
+      observations.npy: observation the agent acts on in every step
+      ratings.npy: rating of every step (1-5)
+      rewards.npy: reward of every action for every step (see `iterate_transitions()`)
+      rows.npy: index of the rated row of every step in the environment's `data`
+      episode_starts.npy: index of the first transition of every episode
+      meta.json: number of transitions and the environment's settings
+    """
+    # copied, since samplers may reuse the arrays of earlier episodes (e.g., reshuffle)
+    episode_rows = [rows.copy() for _, rows in get_episodes(env=env,
+                                                            num_of_episodes=num_of_episodes)]
+    num_of_rows = int(sum(rows.shape[0] for rows in episode_rows))
+    env = env.unwrapped
+    with atomic_directory(directory=directory, overwrite=True) as tmp_directory:
+        arrays = dict(
+            observations=_open_memmap(tmp_directory, 'observations', np.float32,
+                                      (num_of_rows,) + env.observation_space.shape),
+            ratings=_open_memmap(tmp_directory, 'ratings', env.data.dtype, (num_of_rows,)),
+            rewards=_open_memmap(tmp_directory, 'rewards', ACTION_REWARDS.dtype,
+                                 (num_of_rows, ACTION_REWARDS.shape[1])),
+            rows=_open_memmap(tmp_directory, 'rows', np.int64, (num_of_rows,)))
+        arrays['rows'][:] = np.concatenate(episode_rows) if episode_rows else []
+        np.save(os.path.join(tmp_directory, 'episode_starts.npy'),
+                np.cumsum([0] + [rows.shape[0] for rows in episode_rows[:-1]],
+                          dtype=np.int64))
+        position = 0
+        for observations, ratings, rewards in iterate_transitions(
+                env=env, batch_size=batch_size, num_of_episodes=num_of_episodes):
+            end = position + ratings.shape[0]
+            arrays['observations'][position:end] = observations
+            arrays['ratings'][position:end] = ratings
+            arrays['rewards'][position:end] = rewards
+            position = end
+        for array in arrays.values():
+            array.flush()
+        del arrays
+        with open(os.path.join(tmp_directory, 'meta.json'), 'w') as f:
+            json.dump(dict(num_of_rows=num_of_rows,
+                           num_of_episodes=num_of_episodes,
+                           sampling=env.sampling,
+                           observation_mode=env.observation_mode,
+                           online_stats=env.online_stats,
+                           history_length=env.history_length), f)
+
+
+def load_transitions(directory: str, mmap_mode: Optional[str] = 'r') -> Dict[str, np.ndarray]:
+    """
+    Load transitions written by `export_transitions()` as read-only memory maps
+
+    :return: arrays by name (see `TRANSITION_ARRAYS`)
+    """
+    return dict((name, np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode))
+                for name in TRANSITION_ARRAYS)
+
+
+def _open_memmap(directory: str, name: str, dtype: type, shape: Tuple) -> np.memmap:
+    return np.lib.format.open_memmap(os.path.join(directory, f'{name}.npy'), mode='w+',
+                                     dtype=dtype, shape=shape)
+
+
+def get_step_observations(env: RecoEnv, rows: np.ndarray, start: int,
+                          end: int) -> np.ndarray:
+    """
+    Observations the agent acts on in steps `start` to `end` - 1 of an episode
+    (see `iterate_steps()`). With running features, batches must be created in
+    episode order.
+
+    :param env: environment at the start of the episode (see `get_episodes()`)
+    :param rows: rating rows of the episode
+    """
+    observation_steps = np.maximum(np.arange(start, end) - 1, 0)
+    if env.stats is None and env.history is None:
+        return env.get_observations(rows=rows[observation_steps])
+    observations = []  # type: List[np.ndarray]
+    for step_number, observation_step in zip(range(start, end), observation_steps):
+        observations.append(env._get_observation(step_number=int(observation_step)))
+        if step_number > 0:
+            # the first two steps act on the observation of the first rating row
+            env._update_running_features(step_number=int(observation_step))
+    return np.stack(observations)
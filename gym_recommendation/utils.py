@@ -1,13 +1,16 @@
 import os
-import zipfile
 from datetime import datetime as dt
-from typing import Dict, List, Tuple
+from typing import TYPE_CHECKING, Dict, List, Tuple
 
 import pandas as pd
-import requests
-from stable_baselines.common.base_class import ActorCriticRLModel
 
-from . import RecoEnv
+from .cache import read_csv_cached
+from .envs.reco_env import RecoEnv
+from .evaluation import evaluate_batched, print_evaluation_results
+from .fetch import fetch_dataset
+
+if TYPE_CHECKING:
+    from stable_baselines.common.base_class import ActorCriticRLModel
 
 DATA_HEADER = "user id | item id | rating | timestamp"
 ITEM_HEADER = "movie id | movie title | release date | video release date | IMDb URL | " \
@@ -19,41 +22,40 @@ USER_HEADER = "user id | age | gender | occupation | zip code"
 # Static file path for saving and importing data set
 # `gym_recommendation/data/...`
 CWD = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'data')
-
-
-def download_data() -> None:
+# Directories created when extracting the MovieLens zip files
+# `gym_recommendation/data/<directory>/...`
+DATASET_DIRECTORIES = {
+    'ml-100k': 'ml-100k',
+    'ml-1m': 'ml-1m',
+    'ml-10m': 'ml-10M100K',
+    'ml-20m': 'ml-20m',
+    'ml-25m': 'ml-25m',
+}
+
+
+def download_data(dataset: str = 'ml-100k', mirror: str = None,
+                  data_directory: str = CWD) -> None:
     """
-    Helper function to download MovieLens 100k data set and save to the `ml-100k`
-    directory within the `/data` folder.
+    Helper function to download a MovieLens data set (100k by default) and save
+    it to its directory (e.g., `ml-100k`) within the `/data` folder.
+
+    :param dataset: name of the data set (see `DATASET_DIRECTORIES`)
+    :param mirror: local directory, `file://` URL or HTTP(S) URL to fetch the
+        zip file from (defaults to the `GYM_RECOMMENDATION_MIRROR` environment
+        variable or the GroupLens server; see `fetch.fetch_dataset`)
+    :param data_directory: directory the zip file is extracted into
     """
     start_time = dt.now()
-    print("Starting data download. Saving to {}".format(CWD))
-
-    if not os.path.exists(CWD):
-        print('download_data() --> Making ./data/* directory...')
-        os.mkdir(CWD)
-
-    if not os.path.exists(os.path.join(CWD, 'ml-100k')):
-        print('download_data() --> Making ./data/ml-100k/* directory...')
-        os.mkdir(os.path.join(CWD, 'ml-100k'))
-
-        url = 'http://files.grouplens.org/datasets/movielens/ml-100k.zip'
-        r = requests.get(url)
-
-        if r.status_code != 200:
-            print('download_data() --> Error: could not download ml100k')
-
-        zip_file_path = os.path.join(CWD, 'ml-100k.zip')
-        with open(zip_file_path, 'wb') as f:
-            f.write(r.content)
-
-        with zipfile.ZipFile(zip_file_path, 'r') as f_zip:
-            f_zip.extractall(path=CWD)
+    directory = os.path.join(data_directory, DATASET_DIRECTORIES[dataset])
+    print("Starting data download. Saving to {}".format(data_directory))
 
+    if not os.path.exists(directory):
+        fetch_dataset(dataset=dataset, data_directory=data_directory,
+                      directory=DATASET_DIRECTORIES[dataset], mirror=mirror)
         elapsed = (dt.now() - start_time).seconds
         print('download_data() --> completed in {} seconds.'.format(elapsed))
     else:
-        print('Using cached data located at {}.'.format(os.path.join(CWD, 'ml-100k')))
+        print('Using cached data located at {}.'.format(directory))
 
 
 def convert_header_to_camel_case(headers: str) -> List[str]:
@@ -66,31 +68,39 @@ def convert_header_to_camel_case(headers: str) -> List[str]:
     return headers.replace(' ', '_').split('_|_')
 
 
-def import_data() -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+def import_data(use_cache: bool = True,
+                directory: str = None) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
     """
     Helper function to import MovieLens 100k data set into Panda DataFrames.
 
+    :param directory: directory with the `u.data`, `u.item` and `u.user` files
+        (defaults to `gym_recommendation/data/ml-100k/`)
+    :param use_cache: if True, load the data from a binary columnar cache, which is
+        created from the text files on the first call (see `cache.read_csv_cached`)
     :return: Three DataFrames:
         (1) Movie rating data
         (2) Movie reference data
         (3) User reference data
     """
-    data = pd.read_csv(
-        os.path.join(CWD, 'ml-100k', 'u.data'),
+    read_csv = read_csv_cached if use_cache else pd.read_csv
+    directory = directory or os.path.join(CWD, 'ml-100k')
+
+    data = read_csv(
+        os.path.join(directory, 'u.data'),
         delimiter='\t',
         names=convert_header_to_camel_case(DATA_HEADER),
         encoding='latin-1'
     )
 
-    item = pd.read_csv(
-        os.path.join(CWD, 'ml-100k', 'u.item'),
+    item = read_csv(
+        os.path.join(directory, 'u.item'),
         delimiter='|',
         names=convert_header_to_camel_case(ITEM_HEADER),
         encoding='latin-1'
     )
 
-    user = pd.read_csv(
-        os.path.join(CWD, 'ml-100k', 'u.user'),
+    user = read_csv(
+        os.path.join(directory, 'u.user'),
         delimiter='|',
         names=convert_header_to_camel_case(USER_HEADER),
         encoding='latin-1'
@@ -98,43 +108,33 @@ def import_data() -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
     return data, item, user
 
 
-def import_data_for_env() -> Dict[str, pd.DataFrame]:
+def import_data_for_env(directory: str = None) -> Dict[str, pd.DataFrame]:
     """
     Helper function to download and import MovieLens 100k data set into Panda DataFrames.
 
     Function first checks if the data is already downloaded in the
     `gym_recommendation/data/` directory, and if not, downloads the data set.
 
+    :param directory: directory with MovieLens 100k formatted files to import
+        instead (e.g., a local copy or test data), which skips the download
+
     :return: Three DataFrames:
         (1) Movie rating data
         (2) Movie reference data
         (3) User reference data
     """
-    download_data()
+    if directory is None:
+        download_data()
     kwargs = dict([(label, data) for label, data
-                   in zip(['data', 'item', 'user'], import_data())])
+                   in zip(['data', 'item', 'user'], import_data(directory=directory))])
     return kwargs
 
 
-def evaluate(model: ActorCriticRLModel, env: RecoEnv, num_steps: int = 1000) -> None:
+def evaluate(model: 'ActorCriticRLModel', env: RecoEnv, num_steps: int = 1000) -> Dict:
     """
-    Evaluate a RL agent
+    Evaluate a RL agent on the environment's next `num_steps` steps, continuing
+    into further episodes (see `evaluation.evaluate_batched()`), and print the results
     """
-    start_time = dt.now()
-    obs = env.reset()
-    step_count = 0
-    episode_number = 1
-    for i in range(num_steps):
-        step_count += 1
-        action, _states = model.predict(obs)
-        obs, reward, done, info = env.step(action)
-        if done:
-            elapsed = (dt.now() - start_time).seconds
-            print(f"**************EPISODE #{episode_number}****************")
-            print(f"Total steps = {step_count} | steps/second = {step_count / elapsed}")
-            print(f"Total correct predictions = {env.total_correct_predictions}")
-            print(f"Prediction accuracy = {env.total_correct_predictions / step_count}")
-            obs = env.reset()
-            step_count = 0
-            episode_number += 1
-            start_time = dt.now()
+    results = evaluate_batched(model=model, env=env, num_steps=num_steps)
+    print_evaluation_results(results=results)
+    return results
@@ -1,6 +1,12 @@
 import argparse
+import json
 import os
+import shutil
+import tempfile
 from datetime import datetime as dt
+from functools import partial
+from time import perf_counter
+from typing import Dict, Optional
 
 import gym
 from stable_baselines import PPO2
@@ -8,6 +14,22 @@ from stable_baselines.common.policies import MlpPolicy
 from stable_baselines.common.vec_env import SubprocVecEnv
 
 import gym_recommendation
+from gym_recommendation.datasets import get_features_directory
+from gym_recommendation.evaluation import print_evaluation_results
+from gym_recommendation.sweep import get_num_of_workers, get_trial_id, get_trials, run_sweep
+
+
+def parse_bool(value: str) -> bool:
+    """
+    Parse a boolean flag (argparse's `type=bool` treats every non-empty string,
+    including 'False', as True)
+    """
+    if value.lower() in ('true', 'yes', '1'):
+        return True
+    if value.lower() in ('false', 'no', '0'):
+        return False
+    raise argparse.ArgumentTypeError(f'Expected True or False, got {value}.')
+
 
 parser = argparse.ArgumentParser()
 parser.add_argument('--learning_rate',
@@ -25,7 +47,7 @@ parser.add_argument('--tensorboard_log',
 parser.add_argument('--save_model',
                     default=True,
                     help="Save model after training (True = yes | False = no)",
-                    type=bool)
+                    type=parse_bool)
 parser.add_argument('--training_steps',
                     default=int(1e6),
                     help="Number of steps to performing training",
@@ -34,6 +56,11 @@ parser.add_argument('--evaluation_steps',
                     default=int(1e5),
                     help="Number of steps to performing on evaluation",
                     type=int)
+parser.add_argument('--evaluation_workers',
+                    default=1,
+                    help="Number of processes to evaluate with (1 = evaluate in this "
+                         "process | N = split the rating rows between N processes)",
+                    type=int)
 parser.add_argument('--seed',
                     default=1,
                     help="Random number seed for evaluation",
@@ -50,21 +77,80 @@ parser.add_argument('--nminibatches',
                     default=4,
                     help="Number of mini-batches in PPO",
                     type=int)
-user_args = vars(parser.parse_args())
+parser.add_argument('--dataset',
+                    default='ml-100k',
+                    choices=['ml-100k', 'ml-1m', 'ml-10m', 'ml-20m', 'ml-25m'],
+                    help="MovieLens data set to train and evaluate on",
+                    type=str)
+parser.add_argument('--num_envs',
+                    default=os.cpu_count(),
+                    help="Number of environments to train with (per trial in sweeps)",
+                    type=int)
+parser.add_argument('--vec_env',
+                    default='subproc',
+                    choices=['subproc', 'reco'],
+                    help="Vectorized environment to train with (subproc = SubprocVecEnv "
+                         "of RecoEnv | reco = batched RecoVecEnv)",
+                    type=str)
+parser.add_argument('--sweep',
+                    default=None,
+                    help="JSON file with a grid or random search over the flags above "
+                         "(see gym_recommendation.sweep.get_trials)",
+                    type=str)
+parser.add_argument('--sweep_workers',
+                    default=None,
+                    help="Number of trials to run at the same time (default = as many "
+                         "as fit on the CPUs)",
+                    type=int)
+parser.add_argument('--sweep_results',
+                    default='sweep_results.jsonl',
+                    help="File with one line of results per trial; finished trials "
+                         "are skipped when a sweep is resumed",
+                    type=str)
 
 
-def main(kwargs: dict):
-    start_time = dt.now()
-    number_of_cpu = os.cpu_count()
-    envs = SubprocVecEnv([lambda: gym.make(gym_recommendation.RecoEnv.id,
-                                           **gym_recommendation.import_data_for_env())
-                          for _ in range(number_of_cpu)])
+# data set of a sweep worker, loaded once and shared by all of its trials
+_shared_data = dict()
+# flags that control the sweep itself instead of its trials
+SWEEP_FLAGS = ('sweep', 'sweep_workers', 'sweep_results')
+
+
+def get_cores_per_trial(kwargs: dict) -> int:
+    """
+    CPU cores used by one trial: one per environment process with SubprocVecEnv,
+    and one for the batched RecoVecEnv
+    """
+    return kwargs['num_envs'] if kwargs['vec_env'] == 'subproc' else 1
+
+
+def run_trial(kwargs: dict, shared_data: Dict, save_name: Optional[str] = None,
+              n_cpu_tf_sess: Optional[int] = None) -> Dict:
+    """
+    Train and evaluate one PPO2 configuration
+
+    :param shared_data: memory-mapped data set (see `import_shared_data_for_env()`)
+    :param save_name: path to save the model to (None = not saved)
+    :param n_cpu_tf_sess: number of threads of the TensorFlow session (None = all)
+    :return: training throughput and evaluation results
+    """
+    start_time = perf_counter()
+    num_envs = kwargs['num_envs']
+    if kwargs['vec_env'] == 'reco':
+        envs = gym_recommendation.RecoVecEnv(num_envs=num_envs,
+                                             seed=kwargs['seed'],
+                                             **shared_data)
+    else:
+        # workers attach to the same memory-mapped features instead of copying them
+        envs = SubprocVecEnv([lambda: gym.make(
+            gym_recommendation.RecoEnv.id,
+            **gym_recommendation.import_shared_data_for_env(dataset=kwargs['dataset']))
+            for _ in range(num_envs)])
     ppo_configs = {
         'learning_rate': kwargs['learning_rate'],  # lambda f: f * float(3e-4),
         'n_steps': kwargs['n_steps'],
         'tensorboard_log': kwargs['tensorboard_log'],
-        'nminibatches': min(number_of_cpu, kwargs['nminibatches']),
-        'noptepochs': number_of_cpu,
+        'nminibatches': min(num_envs, kwargs['nminibatches']),
+        'noptepochs': num_envs,
         'policy_kwargs': dict(net_arch=[kwargs['num_of_neurons']] *
                                        kwargs['num_of_layers']),
         'gamma': 0.0,
@@ -75,7 +161,8 @@ def main(kwargs: dict):
         'cliprange': 0.3,
         'verbose': 0,
         '_init_setup_model': True,
-        'seed': kwargs['seed']
+        'seed': kwargs['seed'],
+        'n_cpu_tf_sess': n_cpu_tf_sess
     }
     print('*********************************')
     print("ppo_configs:", ppo_configs)
@@ -83,22 +170,107 @@ def main(kwargs: dict):
 
     model = PPO2(policy=MlpPolicy, env=envs, **ppo_configs)
     model.learn(total_timesteps=kwargs['training_steps'])
-    elapsed = (dt.now() - start_time).seconds
-    print(f"Finished training in {elapsed} seconds")
+    training_seconds = perf_counter() - start_time
+    envs.close()
+    print(f"Finished training in {training_seconds:.1f} seconds")
 
-    if kwargs['save_model']:
-        save_name = 'PPO2_Recommendations'
+    if save_name is not None:
         print(f'Saving PPO model as {save_name}')
         model.save(save_name)
 
-    gym_recommendation.evaluate(model=model,
-                                env=gym.make(gym_recommendation.RecoEnv.id,
-                                             **gym_recommendation.import_data_for_env()),
-                                num_steps=kwargs['evaluation_steps'])
+    if kwargs['evaluation_workers'] > 1:
+        # worker processes load the saved model, or a temporary copy of it
+        tmp_directory = tempfile.mkdtemp(prefix='PPO2_Recommendations_') \
+            if save_name is None else None
+        try:
+            if tmp_directory is not None:
+                save_name = os.path.join(tmp_directory, 'model.zip')
+                model.save(save_name)
+            results = gym_recommendation.evaluate_sharded(
+                model=save_name,
+                features_directory=get_features_directory(dataset=kwargs['dataset']),
+                num_workers=kwargs['evaluation_workers'],
+                num_steps=kwargs['evaluation_steps'])
+        finally:
+            if tmp_directory is not None:
+                shutil.rmtree(tmp_directory, ignore_errors=True)
+        print_evaluation_results(results=results)
+    else:
+        results = gym_recommendation.evaluate(
+            model=model, env=gym.make(gym_recommendation.RecoEnv.id, **shared_data),
+            num_steps=kwargs['evaluation_steps'])
+    return dict(training_seconds=training_seconds,
+                training_steps_per_second=kwargs['training_steps'] / training_seconds,
+                evaluation_seconds=results['elapsed_seconds'],
+                evaluation_rows_per_second=results['rows_per_second'],
+                accuracy=results['accuracy'],
+                mean_reward=results['mean_reward'])
+
+
+def init_sweep_worker(dataset: str) -> None:
+    """
+    Attach a sweep worker to the memory-mapped data set once, for all of its trials
+    """
+    _shared_data.update(gym_recommendation.import_shared_data_for_env(dataset=dataset))
+
+
+def get_fixed_params(kwargs: dict) -> Dict:
+    """
+    Flags shared by every trial of a sweep, which are part of the trial ids
+    """
+    return dict((name, value) for name, value in kwargs.items() if name not in SWEEP_FLAGS)
+
+
+def run_sweep_trial(kwargs: dict, params: Dict) -> Dict:
+    """
+    Run one trial of a sweep in a worker process (see `run_sweep()`)
+    """
+    trial_kwargs = dict(kwargs, **params)
+    trial_id = get_trial_id(params, fixed_params=get_fixed_params(kwargs=kwargs))
+    # concurrent trials write their TensorBoard logs and models to their own paths
+    if trial_kwargs['tensorboard_log']:
+        trial_kwargs['tensorboard_log'] = os.path.join(trial_kwargs['tensorboard_log'],
+                                                       trial_id)
+    save_name = f'PPO2_Recommendations_{trial_id}' if trial_kwargs['save_model'] else None
+    return run_trial(kwargs=trial_kwargs, shared_data=_shared_data, save_name=save_name,
+                     n_cpu_tf_sess=get_cores_per_trial(kwargs=trial_kwargs))
+
+
+def main(kwargs: dict):
+    start_time = dt.now()
+    # load the data set once; workers attach to the same memory-mapped features
+    shared_data = gym_recommendation.import_shared_data_for_env(dataset=kwargs['dataset'])
+    if kwargs['sweep'] is None:
+        run_trial(kwargs=kwargs, shared_data=shared_data,
+                  save_name='PPO2_Recommendations' if kwargs['save_model'] else None)
+        elapsed = (dt.now() - start_time).seconds
+        print(f"Finished training AND evaluation in {elapsed} seconds")
+        return
+
+    with open(kwargs['sweep']) as f:
+        trials = get_trials(spec=json.load(f))
+    for params in trials:
+        unknown = set(params.keys()) - set(kwargs.keys())
+        if unknown:
+            raise ValueError(f'Unknown sweep parameters {sorted(unknown)}.')
+    num_workers = get_num_of_workers(
+        cores_per_trial=max(get_cores_per_trial(kwargs=dict(kwargs, **params))
+                            for params in trials),
+        num_workers=kwargs['sweep_workers'])
+    results = run_sweep(trial_function=partial(run_sweep_trial, kwargs),
+                        trials=trials,
+                        results_path=kwargs['sweep_results'],
+                        num_workers=num_workers,
+                        initializer=init_sweep_worker,
+                        initargs=(kwargs['dataset'],),
+                        fixed_params=get_fixed_params(kwargs=kwargs))
+    if 'accuracy' in results:
+        results = results.sort_values('accuracy', ascending=False)
+    print(results.to_string(index=False))
     elapsed = (dt.now() - start_time).seconds
-    print(f"Finished training AND evaluation in {elapsed} seconds")
+    print(f"Finished sweep of {len(trials)} trials in {elapsed} seconds")
 
 
 if __name__ == "__main__":
     print(f"Starting experiment with PPO2 at {dt.now()}")
-    main(kwargs=user_args)
+    main(kwargs=vars(parser.parse_args()))
@@ -14,6 +14,12 @@ setup(
     author='Jonathan Sadighian',
     author_email='jonathan.m.sadighian@gmail.com',
     description='POMDP recommendation system framework for MovieLens data set',
+    python_requires='>=3.7',
     install_requires=dependencies,
-    packages=['gym_recommendation'],
+    extras_require={
+        # training and evaluating agents (e.g., `ppo_experiment.py`)
+        'train': ['tensorflow-gpu', 'stable-baselines'],
+        'test': ['pytest'],
+    },
+    packages=['gym_recommendation', 'gym_recommendation.envs'],
 )